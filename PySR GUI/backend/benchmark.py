@@ -0,0 +1,301 @@
+"""
+benchmark.py
+
+Reproducible timing of the expression evaluators.
+
+Every engine in `ENGINES` is run on every equation of the stored
+hall-of-fame files (in order of complexity) against every dataset – each
+CSV in `data/` plus synthetic data with 10 … 10**7 rows.  Per case it
+records
+
+    parse_s, compile_s   one-off cost of preparing the equation
+    eval_s               best of --repeat evaluations
+    rows_per_s           throughput of one evaluation
+    peak_bytes           peak memory allocated during one evaluation
+                         (tracemalloc; NumPy reports its buffers to it)
+
+Hall-of-fame equations name the variables of the dataset they were found
+on; on other datasets those names are bound to the dataset's columns in
+order, so every equation runs everywhere with realistic values.
+
+Results are written as JSON (``--output``).  With ``--baseline`` the run
+is compared to an earlier result file: every case whose throughput fell by
+more than ``--tolerance`` is listed and the exit status is 1, so the
+script can gate a change before it ships.
+
+    python benchmark.py --quick
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.2
+"""
+from __future__ import annotations
+import argparse
+import glob
+import json
+import os
+import platform
+import re
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from evaluate_tree import (parse_expression, evaluate_tree, compile_tree, compile_forest,
+                           optimize_trees, _FUNCTIONS)
+from evaluator_cache import eval_with_numexpr
+
+try:                                    # optional, for the SymPy baseline
+    import sympy
+except ImportError:
+    sympy = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "..", "..", "data")
+HOF_GLOBS = [
+    os.path.join(HERE, "..", "models", "**", "hall_of_fame.csv"),
+    os.path.join(HERE, "temp", "**", "hall_of_fame.csv"),
+]
+ROW_COUNTS = (10, 10**3, 10**5, 10**7)
+QUICK_ROW_COUNTS = (10, 10**3, 10**5)
+
+# Names in an equation (variables, unless evaluate_tree knows them as functions)
+_IDENTIFIER = re.compile(r"(?<![\w.])[A-Za-z_]\w*")
+
+
+def equation_variables(expr: str) -> list[str]:
+    """Variable names of *expr*, in order of first appearance."""
+    names = []
+    for name in _IDENTIFIER.findall(expr):
+        if name not in _FUNCTIONS and name not in names:
+            names.append(name)
+    return names
+
+
+# ------------------------------------------------------------
+#  Engines: prepare(expr) -> (parse_s, compile_s, run(columns, frame))
+# ------------------------------------------------------------
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def _prepare_tree(expr):
+    tree, parse_s = _timed(parse_expression, expr)
+    return parse_s, 0.0, lambda columns, frame: evaluate_tree(tree, columns)
+
+
+def _prepare_compiled(expr):
+    tree, parse_s = _timed(parse_expression, expr)
+    program, compile_s = _timed(compile_tree, tree)
+    return parse_s, compile_s, lambda columns, frame: program.run(columns)
+
+
+def _prepare_chunked(expr):
+    tree, parse_s = _timed(parse_expression, expr)
+    program, compile_s = _timed(compile_tree, tree)
+    return parse_s, compile_s, lambda columns, frame: program.run_chunked(columns)
+
+
+def _prepare_parallel(expr):
+    tree, parse_s = _timed(parse_expression, expr)
+    program, compile_s = _timed(compile_tree, tree)
+    return parse_s, compile_s, lambda columns, frame: program.run_parallel(columns)
+
+
+def _prepare_optimized(expr):
+    # compiled as /evaluate_all compiles it: constants folded, trees merged
+    tree, parse_s = _timed(parse_expression, expr)
+    program, compile_s = _timed(lambda: compile_forest(optimize_trees([tree])))
+    return parse_s, compile_s, lambda columns, frame: program.run(columns)
+
+
+def _prepare_numexpr(expr):
+    # pandas parses and compiles on every call; all of it counts as eval
+    return 0.0, 0.0, lambda columns, frame: eval_with_numexpr(frame, expr)
+
+
+def _prepare_sympy(expr):
+    names = equation_variables(expr)
+    symbols = sympy.symbols(names) if names else []
+    local = {name: sym for name, sym in zip(names, symbols)}
+    parsed, parse_s = _timed(sympy.sympify, expr, local)
+    fn, compile_s = _timed(sympy.lambdify, symbols, parsed, "numpy")
+    return parse_s, compile_s, lambda columns, frame: fn(*(columns[n] for n in names))
+
+
+ENGINES = {
+    "tree": _prepare_tree,
+    "compiled": _prepare_compiled,
+    "chunked": _prepare_chunked,
+    "parallel": _prepare_parallel,
+    "optimized": _prepare_optimized,
+    "numexpr": _prepare_numexpr,
+}
+if sympy is not None:
+    ENGINES["sympy"] = _prepare_sympy
+
+
+# ------------------------------------------------------------
+#  Inputs
+# ------------------------------------------------------------
+def load_equations(patterns: list[str]) -> list[dict]:
+    """Unique hall-of-fame equations, ordered by complexity."""
+    seen, equations = set(), []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            for row in pd.read_csv(path).to_dict(orient="records"):
+                expr = str(row["Equation"])
+                if expr not in seen:
+                    seen.add(expr)
+                    equations.append({"equation": expr,
+                                      "complexity": int(row["Complexity"]),
+                                      "source": os.path.relpath(path, HERE)})
+    return sorted(equations, key=lambda e: (e["complexity"], e["equation"]))
+
+
+def load_datasets(data_dir: str, row_counts, seed: int = 0) -> list[tuple[str, dict]]:
+    """(name, numeric columns) of every CSV in *data_dir* and of one
+    synthetic dataset per row count (uniform values in [0.5, 2))."""
+    datasets = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+        df = pd.read_csv(path, encoding="utf-8-sig")
+        columns = {str(c): pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+                   for c in df.columns}
+        columns = {c: v for c, v in columns.items() if np.isfinite(v).any()}
+        if columns:
+            datasets.append((os.path.basename(path), columns))
+    rng = np.random.default_rng(seed)
+    for n in row_counts:
+        datasets.append((f"synthetic-{n}", {f"c{i}": rng.uniform(0.5, 2.0, n)
+                                            for i in range(4)}))
+    return datasets
+
+
+def bind(variables: list[str], columns: dict) -> dict:
+    """Columns for *variables*: same-named ones where the dataset has them,
+    otherwise the dataset's columns in order."""
+    pool = list(columns.values())
+    return {name: columns[name] if name in columns else pool[i % len(pool)]
+            for i, name in enumerate(variables)}
+
+
+# ------------------------------------------------------------
+#  Measurement
+# ------------------------------------------------------------
+def measure(run, columns, frame, repeat: int, budget_s: float) -> tuple[float, int]:
+    """(best wall time of *run*, peak traced bytes of one run)."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    run(columns, frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best, spent = float("inf"), 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run(columns, frame)
+        elapsed = time.perf_counter() - t0
+        best, spent = min(best, elapsed), spent + elapsed
+        if spent > budget_s:
+            break
+    return best, peak
+
+
+def run_benchmarks(engines, equations, datasets, repeat=5, budget_s=2.0, log=None) -> list[dict]:
+    results = []
+    for dataset, columns in datasets:
+        n_rows = len(next(iter(columns.values())))
+        for eq in equations:
+            bound = bind(equation_variables(eq["equation"]), columns)
+            frame = pd.DataFrame(bound, copy=False) if bound else pd.DataFrame(index=range(n_rows))
+            for engine in engines:
+                case = {"engine": engine, "dataset": dataset, "rows": n_rows,
+                        "complexity": eq["complexity"], "equation": eq["equation"]}
+                try:
+                    parse_s, compile_s, run = ENGINES[engine](eq["equation"])
+                    eval_s, peak = measure(run, bound, frame, repeat, budget_s)
+                except Exception as err:          # engine cannot handle it
+                    case["error"] = f"{type(err).__name__}: {err}"
+                else:
+                    case.update(parse_s=parse_s, compile_s=compile_s, eval_s=eval_s,
+                                rows_per_s=n_rows / eval_s if eval_s > 0 else None,
+                                peak_bytes=peak)
+                results.append(case)
+                if log is not None:
+                    log(case)
+    return results
+
+
+def case_key(case: dict) -> tuple:
+    return (case["engine"], case["dataset"], case["rows"], case["equation"])
+
+
+def regressions(results: list[dict], baseline: list[dict], tolerance: float) -> list[dict]:
+    """Cases whose throughput fell by more than *tolerance* (a fraction)."""
+    before = {case_key(c): c for c in baseline if c.get("rows_per_s")}
+    slower = []
+    for case in results:
+        old = before.get(case_key(case))
+        if old is None or not case.get("rows_per_s"):
+            continue
+        ratio = case["rows_per_s"] / old["rows_per_s"]
+        if ratio < 1.0 - tolerance:
+            slower.append({**case, "baseline_rows_per_s": old["rows_per_s"], "ratio": ratio})
+    return slower
+
+
+def _log_case(case: dict) -> None:
+    if "error" in case:
+        line = f"{'unsupported':>14}"
+    else:
+        line = (f"{case['rows_per_s']:>14.3e} rows/s  eval {case['eval_s'] * 1e3:9.3f} ms"
+                f"  peak {case['peak_bytes'] / 2**20:8.2f} MiB")
+    print(f"{case['engine']:>9} {case['dataset'][:22]:>22} {case['rows']:>9} "
+          f"c={case['complexity']:<3} {line}", file=sys.stderr)
+
+
+# ------------------------------------------------------------
+#  CLI
+# ------------------------------------------------------------
+if __name__ == "__main__":                        # pragma: no cover
+    p = argparse.ArgumentParser(description="Benchmark the expression evaluators.")
+    p.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    p.add_argument("--data-dir", default=DATA_DIR, help="Directory of CSV datasets")
+    p.add_argument("--hof", nargs="+", default=HOF_GLOBS, help="hall_of_fame.csv globs")
+    p.add_argument("--rows", nargs="+", type=int, help="Synthetic row counts")
+    p.add_argument("--quick", action="store_true", help="Synthetic rows up to 10**5 only")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--budget", type=float, default=2.0, help="Seconds per case at most")
+    p.add_argument("--output", help="Write results as JSON to this file")
+    p.add_argument("--baseline", help="Earlier --output file to compare against")
+    p.add_argument("--tolerance", type=float, default=0.25,
+                   help="Allowed throughput loss vs. the baseline (fraction)")
+    ns = p.parse_args()
+
+    row_counts = ns.rows or (QUICK_ROW_COUNTS if ns.quick else ROW_COUNTS)
+    equations = load_equations(ns.hof)
+    datasets = load_datasets(ns.data_dir, row_counts)
+    results = run_benchmarks(ns.engines, equations, datasets, ns.repeat, ns.budget, _log_case)
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    if ns.output:
+        with open(ns.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+
+    if ns.baseline:
+        with open(ns.baseline) as f:
+            slower = regressions(results, json.load(f)["results"], ns.tolerance)
+        for case in slower:
+            print(f"REGRESSION {case['engine']} {case['dataset']} {case['rows']} rows "
+                  f"{case['equation']!r}: {case['ratio']:.2f}x baseline", file=sys.stderr)
+        sys.exit(1 if slower else 0)
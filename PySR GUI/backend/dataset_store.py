@@ -0,0 +1,352 @@
+"""
+dataset_store.py
+
+Upload-once registry of CSV datasets.
+
+A CSV is parsed a single time on upload; every column is written as its
+own `.npy` file named after the hash of its contents (identical columns of
+different uploads are stored once) and the dataset itself is identified by
+the hash of the raw CSV bytes.  Later requests only send the returned
+`dataset_id`; the columns are opened with `np.load(..., mmap_mode="r")`,
+so reading them is zero-copy and shared between processes through the OS
+page cache.
+
+Uploads are streamed: the CSV is spooled to disk while it is hashed and
+then parsed `CHUNK_ROWS` rows at a time, each chunk appended to the
+column files, so memory use does not grow with the file.  Cells that are
+empty or not numbers become NaN and are counted per column
+(`n_missing` / `n_invalid` in the metadata).  `finite_rows` and
+`stratified_sample` pick the rows a search is run on, and
+`write_training_data` lays the input columns out as one C-contiguous
+matrix file a search process can memory-map without copying.  That file
+is named after its columns and rows, so the searches of a multi-target
+run share it; each search gets its own small target file.
+
+Layout under *root*::
+
+    columns/<column-hash>.npy
+    matrices/<matrix-hash>.npy  X of running searches (deleted after the last,
+                                leftovers swept at start-up)
+    <dataset_id>.json           headers, row count, column → hash
+"""
+from __future__ import annotations
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+_NUMERIC_HEADER = re.compile(r"^-?\d+(\.\d+)?$")
+_DATASET_ID = re.compile(r"^[0-9a-f]{16,64}$")
+
+# Rows parsed per chunk when ingesting a CSV, bytes per read when spooling
+CHUNK_ROWS = 100_000
+_BLOCK = 1 << 20
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def clean_headers(headers: list[str]) -> list[str]:
+    """Same rule as the frontend: if every header is a number the file has
+    no header row, so the columns are called v1, v2, …"""
+    headers = [str(h).strip() for h in headers]
+    if headers and all(_NUMERIC_HEADER.match(h) for h in headers):
+        return [f"v{i + 1}" for i in range(len(headers))]
+    return headers
+
+
+def finite_rows(columns: list[np.ndarray]) -> np.ndarray:
+    """Boolean mask of the rows that are finite in every one of *columns*."""
+    mask = np.ones(len(columns[0]), dtype=bool)
+    for col in columns:
+        mask &= np.isfinite(col)
+    return mask
+
+
+def stratified_sample(y: np.ndarray, n: int, seed: int = 0) -> np.ndarray:
+    """Sorted indices of *n* rows, one drawn from each of *n* equally sized
+    strata of *y*, so the sample covers the whole range of the target."""
+    if n >= len(y):
+        return np.arange(len(y))
+    order = np.argsort(y, kind="stable")
+    edges = (np.arange(n + 1) * len(y)) // n
+    rng = np.random.default_rng(seed)
+    picks = edges[:-1] + (rng.random(n) * np.diff(edges)).astype(int)
+    return np.sort(order[picks])
+
+
+class _ColumnWriter:
+    """Appends the chunks of one column to a part file, hashing as it goes."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._part = tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False)
+        self._hash = hashlib.sha256()
+        self.n_rows = self.n_missing = self.n_invalid = 0
+
+    def append(self, series: pd.Series) -> None:
+        values = np.ascontiguousarray(pd.to_numeric(series, errors="coerce").to_numpy(dtype=float))
+        missing = series.isna().to_numpy()
+        self.n_rows += len(values)
+        self.n_missing += int(missing.sum())
+        self.n_invalid += int((np.isnan(values) & ~missing).sum())
+        data = values.tobytes()
+        self._hash.update(data)
+        self._part.write(data)
+
+    def finish(self) -> str:
+        """Turn the part file into `columns/<hash>.npy`; returns the hash."""
+        self._part.close()
+        col_hash = self._hash.hexdigest()[:32]
+        path = os.path.join(self.directory, f"{col_hash}.npy")
+        try:
+            if not os.path.exists(path):
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as out, open(self._part.name, "rb") as src:
+                    np.lib.format.write_array_header_1_0(out, {
+                        "descr": np.lib.format.dtype_to_descr(np.dtype(float)),
+                        "fortran_order": False,
+                        "shape": (self.n_rows,),
+                    })
+                    shutil.copyfileobj(src, out, _BLOCK)
+                os.replace(tmp, path)
+        finally:
+            os.remove(self._part.name)
+        return col_hash
+
+    def discard(self) -> None:
+        self._part.close()
+        if os.path.exists(self._part.name):
+            os.remove(self._part.name)
+
+
+class DatasetStore:
+    """Content-addressed, memory-mapped column store (see module docstring)."""
+
+    def __init__(self, root: str, sweep: bool = True):
+        """*sweep* deletes the X files left in `matrices/` (their users are
+        only counted in memory, so none of them can be in use by this
+        store); a process that only reads the store passes False."""
+        self.root = os.path.abspath(root)
+        self.column_dir = os.path.join(self.root, "columns")
+        self.matrix_dir = os.path.join(self.root, "matrices")
+        os.makedirs(self.column_dir, exist_ok=True)
+        os.makedirs(self.matrix_dir, exist_ok=True)
+        self._open: dict[str, dict[str, np.ndarray]] = {}
+        self._matrix_users: dict[str, int] = {}
+        self._matrix_writes: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        if sweep:
+            for name in os.listdir(self.matrix_dir):
+                if name.endswith((".npy", ".tmp")):
+                    os.remove(os.path.join(self.matrix_dir, name))
+
+    # ------------------------------------------------------------------
+    #  Registration
+    # ------------------------------------------------------------------
+    def add_csv(self, raw: bytes, name: str | None = None) -> dict:
+        """Register the CSV in *raw* and return its metadata."""
+        return self.add_csv_stream(io.BytesIO(raw), name)
+
+    def add_csv_stream(self, stream, name: str | None = None) -> dict:
+        """Register the CSV read from the binary file object *stream*
+        (e.g. an upload) without holding the whole file in memory."""
+        digest = hashlib.sha256()
+        with tempfile.TemporaryFile(dir=self.root) as spool:
+            for block in iter(lambda: stream.read(_BLOCK), b""):
+                digest.update(block)
+                spool.write(block)
+            dataset_id = digest.hexdigest()[:32]
+            if self.exists(dataset_id):
+                return self.meta(dataset_id)
+            spool.seek(0)
+            chunks = pd.read_csv(spool, encoding="utf-8-sig", chunksize=CHUNK_ROWS)
+            return self._write(dataset_id, chunks, name)
+
+    def add_frame(self, df: pd.DataFrame, name: str | None = None) -> dict:
+        """Register an in-memory frame (e.g. rows sent as JSON)."""
+        digest = hashlib.sha256()
+        for col in df.columns:
+            digest.update(str(col).encode())
+            digest.update(pd.to_numeric(df[col], errors="coerce")
+                          .to_numpy(dtype=float).tobytes())
+        dataset_id = digest.hexdigest()[:32]
+        if self.exists(dataset_id):
+            return self.meta(dataset_id)
+        return self._write(dataset_id, [df], name)
+
+    def _write(self, dataset_id: str, chunks, name: str | None) -> dict:
+        """Append each frame of *chunks* to the column files, then write
+        the dataset's metadata."""
+        columns, writers = None, []
+        try:
+            for chunk in chunks:
+                if columns is None:
+                    columns = list(chunk.columns)
+                    writers = [_ColumnWriter(self.column_dir) for _ in columns]
+                for writer, col in zip(writers, columns):
+                    writer.append(chunk[col])
+            if columns is None:
+                raise ValueError("CSV has no columns")
+            hashes = [writer.finish() for writer in writers]
+        except BaseException:
+            for writer in writers:
+                writer.discard()
+            raise
+
+        headers = clean_headers(columns)
+        meta = {
+            "dataset_id": dataset_id,
+            "name": name,
+            "headers": headers,
+            "n_rows": writers[0].n_rows if writers else 0,
+            "columns": dict(zip(headers, hashes)),
+            "n_missing": {h: w.n_missing for h, w in zip(headers, writers)},
+            "n_invalid": {h: w.n_invalid for h, w in zip(headers, writers)},
+        }
+        _atomic_write(self._meta_path(dataset_id), json.dumps(meta).encode())
+        return meta
+
+    # ------------------------------------------------------------------
+    #  Lookup
+    # ------------------------------------------------------------------
+    def _meta_path(self, dataset_id: str) -> str:
+        if not _DATASET_ID.match(str(dataset_id)):
+            raise KeyError(f"Invalid dataset id {dataset_id!r}")
+        return os.path.join(self.root, f"{dataset_id}.json")
+
+    def exists(self, dataset_id: str) -> bool:
+        try:
+            return os.path.exists(self._meta_path(dataset_id))
+        except KeyError:
+            return False
+
+    def meta(self, dataset_id: str) -> dict:
+        try:
+            with open(self._meta_path(dataset_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(f"Unknown dataset {dataset_id!r}") from None
+
+    def columns(self, dataset_id: str, names: list[str] | None = None) -> dict[str, np.ndarray]:
+        """Read-only memory maps of the dataset's columns."""
+        with self._lock:
+            cols = self._open.get(dataset_id)
+            if cols is None:
+                meta = self.meta(dataset_id)
+                cols = {
+                    header: np.load(os.path.join(self.column_dir, f"{col_hash}.npy"),
+                                    mmap_mode="r")
+                    for header, col_hash in meta["columns"].items()
+                }
+                self._open[dataset_id] = cols
+        if names is None:
+            return dict(cols)
+        missing = [n for n in names if n not in cols]
+        if missing:
+            raise KeyError(f"Columns not in dataset: {missing}")
+        return {n: cols[n] for n in names}
+
+    def frame(self, dataset_id: str, names: list[str] | None = None) -> pd.DataFrame:
+        """DataFrame view over the memory-mapped columns (no copy)."""
+        return pd.DataFrame(self.columns(dataset_id, names), copy=False)
+
+    # ------------------------------------------------------------------
+    #  Training data
+    # ------------------------------------------------------------------
+    def write_training_data(self, dataset_id: str, inputs: list[str], output: str,
+                            y_path: str) -> dict:
+        """Training data of a search: the rows finite in all of *inputs*
+        and *output*, X as a C-contiguous float64 ``(rows × len(inputs))``
+        `.npy` and y as its own `.npy` at *y_path*.
+
+        X goes to `matrices/`, named after the hash of its columns and
+        rows, so searches on the same inputs and rows (the targets of a
+        multi-target run) share one file.  It is written once,
+        `CHUNK_ROWS` rows at a time and outside the store's lock (a
+        concurrent caller for the same file waits for it), and kept until
+        every caller has called `release_matrix`; if this raises, there is
+        nothing to release.  `np.load(..., mmap_mode="r")` gives both
+        without a copy.  Returns their paths, columns and row counts.
+        """
+        cols = self.columns(dataset_id, inputs + [output])
+        keep = finite_rows([cols[n] for n in inputs + [output]])
+        column_hashes = self.meta(dataset_id)["columns"]
+        digest = hashlib.sha256(json.dumps([column_hashes[n] for n in inputs]).encode())
+        digest.update(keep.tobytes())
+        x_path = os.path.join(self.matrix_dir, f"{digest.hexdigest()[:32]}.npy")
+        with self._lock:
+            self._matrix_users[x_path] = self._matrix_users.get(x_path, 0) + 1
+        try:
+            self._ensure_matrix(x_path, [cols[n] for n in inputs], keep)
+            tmp = f"{y_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(cols[output][keep], dtype=np.float64))
+            os.replace(tmp, y_path)
+        except BaseException:
+            self.release_matrix(x_path)
+            raise
+        n_rows = int(keep.sum())
+        return {"X": x_path, "y": y_path, "columns": list(inputs), "output": output,
+                "n_rows": n_rows, "dropped_rows": int(len(keep) - n_rows)}
+
+    def release_matrix(self, x_path: str) -> None:
+        """A search is done with the X file *x_path* (see
+        `write_training_data`); the last one deletes it."""
+        with self._lock:
+            users = self._matrix_users.get(x_path, 0) - 1
+            if users > 0:
+                self._matrix_users[x_path] = users
+                return
+            self._matrix_users.pop(x_path, None)
+            try:
+                os.remove(x_path)
+            except OSError:
+                pass
+
+    def _ensure_matrix(self, path: str, cols: list[np.ndarray], keep: np.ndarray) -> None:
+        """Write the X file *path* unless it exists; while one thread
+        writes it, the others wait for that write."""
+        while True:
+            with self._lock:
+                if os.path.exists(path):
+                    return
+                pending = self._matrix_writes.get(path)
+                if pending is None:
+                    pending = self._matrix_writes[path] = threading.Event()
+                    break
+            pending.wait()          # if that write failed, try it here
+        try:
+            self._write_rows(cols, keep, path)
+        finally:
+            with self._lock:
+                del self._matrix_writes[path]
+            pending.set()
+
+    @staticmethod
+    def _write_rows(cols: list[np.ndarray], keep: np.ndarray, path: str) -> None:
+        """The *keep* rows of *cols* as one C-contiguous matrix `.npy`."""
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64,
+                                        shape=(int(keep.sum()), len(cols)))
+        pos = 0
+        for lo in range(0, len(keep), CHUNK_ROWS):
+            block = keep[lo:lo + CHUNK_ROWS]
+            count = int(block.sum())
+            for j, col in enumerate(cols):
+                out[pos:pos + count, j] = col[lo:lo + CHUNK_ROWS][block]
+            pos += count
+        out.flush()
+        del out
+        os.replace(tmp, path)
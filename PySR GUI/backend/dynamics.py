@@ -0,0 +1,325 @@
+"""
+dynamics.py
+
+Rollout validation of discovered dynamical systems.
+
+A search on `lorenz system.csv` or `rossler system.csv` finds one equation
+per derivative (``dx``, ``dy``, ``dz`` as functions of ``x, y, z``) and is
+scored on one-step fits.  Whether the equations reproduce the recorded
+dynamics only shows when they are integrated: `simulate_ode` compiles the
+right-hand sides into one `Program` (shared subexpressions computed once)
+and integrates many initial conditions at once with classical RK4, the
+state held as a ``(state × n_ics)`` array so every stage is a single
+vectorised program run into preallocated buffers.
+
+Discrete maps such as `henon map.csv` (``x_tt``, ``y_tt`` as functions
+of ``x_t``, ``y_t``) are validated the same way by `iterate_map`, which
+advances the whole ensemble in lockstep for N iterations and also reports
+how well the iterated points cover the recorded attractor.
+
+Trajectories that become non-finite or leave a bounding box are dropped
+from the ensemble as soon as they do, so a blown-up rollout stops costing
+time.  Against the recorded series the rollout reports when every initial
+condition diverged from it (normalised distance above a tolerance) and the
+error curve over time; full trajectories only if asked for.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from evaluate_tree import Program, compile_expressions
+
+BLOWUP = 1e8                     # |state| beyond this counts as diverged
+
+
+# ------------------------------------------------------------
+#  1.  Systems
+# ------------------------------------------------------------
+def compile_system(equations: dict[str, str], state: list[str],
+                   time_name: str | None = None) -> Program:
+    """One program computing the equation of every state variable, in the
+    order of *state*.
+
+    *equations* is keyed by state variable (``"x"``), by its derivative
+    column (``"dx"``) or by its next-step column (``"x_tt"`` for
+    ``"x_t"``), as in the datasets.  Equations may use the state variables
+    and *time_name*.
+    """
+    exprs = []
+    for name in state:
+        expr = equations.get(name, equations.get(f"d{name}", equations.get(f"{name}t")))
+        if expr is None:
+            raise KeyError(f"No equation for {name!r}")
+        exprs.append(str(expr))
+    program = compile_expressions(exprs)
+    unknown = set(program.variables) - set(state) - {time_name}
+    if unknown:
+        raise KeyError(f"Equations use unknown variables {sorted(unknown)}")
+    return program
+
+
+def state_names(equations) -> list[str]:
+    """State variables of *equations* keyed as in `compile_system`
+    (``dx`` -> ``x``, ``x_tt`` -> ``x_t``)."""
+    names = []
+    for key in equations:
+        if key.endswith("_tt"):
+            names.append(key[:-1])
+        elif key.startswith("d") and len(key) > 1:
+            names.append(key[1:])
+        else:
+            names.append(key)
+    return names
+
+
+def _rhs(program: Program, state: list[str], x: np.ndarray, out: np.ndarray,
+         time_name: str | None = None, t: float = 0.0) -> None:
+    """Evaluate *program* on the columns of *x* (state × n) into *out*."""
+    variables = {name: x[j] for j, name in enumerate(state)}
+    if time_name is not None:
+        variables[time_name] = t
+    program.run(variables, out=out if program.n_outputs > 1 else out[0])
+
+
+# ------------------------------------------------------------
+#  2.  Initial conditions
+# ------------------------------------------------------------
+def ensemble(x0, n_ics: int, spread: float = 1e-3, scale=None, seed: int = 0) -> np.ndarray:
+    """(n_ics × state) initial conditions: *x0* itself, then *x0* perturbed
+    by Gaussian noise of *spread* × *scale* (per state variable, default
+    1)."""
+    x0 = np.asarray(x0, dtype=float)
+    scale = np.ones_like(x0) if scale is None else np.asarray(scale, dtype=float)
+    rng = np.random.default_rng(seed)
+    ics = np.repeat(x0[None, :], max(1, n_ics), axis=0)
+    ics[1:] += spread * scale * rng.standard_normal(ics[1:].shape)
+    return ics
+
+
+# ------------------------------------------------------------
+#  3.  Divergence from a recorded series
+# ------------------------------------------------------------
+class _Tracker:
+    """Running divergence statistics of an ensemble against *reference*
+    (steps × state), normalised per state variable by *scale*."""
+
+    def __init__(self, reference, scale, n_ics: int, tolerance: float, record: bool):
+        self.reference = None if reference is None else np.asarray(reference, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.tolerance = tolerance
+        n_steps = 0 if self.reference is None else len(self.reference)
+        self.error = np.full(n_steps, np.nan)              # RMS distance over live ICs
+        self.diverged_step = np.full(n_ics, -1)            # first step beyond tolerance
+        self.blowup_step = np.full(n_ics, -1)              # first non-finite / unbounded step
+        self.trajectories = [] if record else None
+
+    def observe(self, step: int, x: np.ndarray, idx: np.ndarray) -> None:
+        """State *x* (state × live) of the live ICs *idx* at *step*."""
+        if self.trajectories is not None:
+            frame = np.full((len(self.diverged_step), x.shape[0]), np.nan)
+            frame[idx] = x.T
+            self.trajectories.append(frame)
+        if self.reference is None or step >= len(self.reference):
+            return
+        dist = np.sqrt(np.mean(((x - self.reference[step][:, None]) / self.scale[:, None]) ** 2,
+                               axis=0))
+        self.error[step] = np.sqrt(np.mean(dist ** 2)) if len(dist) else np.nan
+        newly = idx[(dist > self.tolerance) & (self.diverged_step[idx] < 0)]
+        self.diverged_step[newly] = step
+
+    def blew_up(self, step: int, idx: np.ndarray) -> None:
+        self.blowup_step[idx] = step
+        still = idx[self.diverged_step[idx] < 0]
+        self.diverged_step[still] = step
+
+    def summary(self, times) -> dict:
+        times = np.asarray(times, dtype=float)
+        diverged = self.diverged_step >= 0
+        horizon = np.where(diverged, times[np.maximum(self.diverged_step, 0)], np.inf)
+        result = {
+            "n_ics": len(self.diverged_step),
+            "n_diverged": int(diverged.sum()),
+            "n_blown_up": int((self.blowup_step >= 0).sum()),
+            "divergence_time": {
+                "reference": _finite_or_none(horizon[0]),
+                "median": _finite_or_none(np.median(horizon)),
+                "min": _finite_or_none(horizon.min()),
+                "max": _finite_or_none(horizon.max()),
+            },
+            "divergence_times": [_finite_or_none(h) for h in horizon],
+        }
+        if self.reference is not None:
+            result["error"] = self.error
+        if self.trajectories is not None:
+            result["trajectories"] = np.stack(self.trajectories)   # steps × ics × state
+        return result
+
+
+class _Occupancy:
+    """Histogram of visited states on a grid over the bounding box of the
+    recorded *reference* (steps × state), to compare attractors."""
+
+    def __init__(self, reference, bins: int):
+        reference = np.asarray(reference, dtype=float)
+        reference = reference[np.isfinite(reference).all(axis=1)]
+        bins = min(bins, int(2 ** (22 / reference.shape[1])))   # at most 4M cells
+        self.lo = reference.min(axis=0)
+        self.width = np.where(np.ptp(reference, axis=0) > 0, np.ptp(reference, axis=0), 1.0) / bins
+        self.bins = bins
+        self.counts = np.zeros(bins ** reference.shape[1])
+        self.outside = 0
+        self.reference = self._histogram(reference.T)[0]
+
+    def _cells(self, x: np.ndarray) -> tuple[np.ndarray, int]:
+        cell = np.floor((x - self.lo[:, None]) / self.width[:, None]).astype(np.int64)
+        cell[cell == self.bins] = self.bins - 1            # upper edge belongs to the box
+        inside = ((cell >= 0) & (cell < self.bins)).all(axis=0)
+        flat = np.ravel_multi_index(tuple(cell[:, inside]), (self.bins,) * len(cell))
+        return flat, int((~inside).sum())
+
+    def _histogram(self, x: np.ndarray) -> tuple[np.ndarray, int]:
+        flat, outside = self._cells(x)
+        return np.bincount(flat, minlength=len(self.counts)).astype(float), outside
+
+    def add(self, x: np.ndarray) -> None:
+        flat, outside = self._cells(x)
+        self.counts += np.bincount(flat, minlength=len(self.counts))
+        self.outside += outside
+
+    def summary(self) -> dict:
+        total = self.counts.sum() + self.outside
+        if total == 0:
+            return {"attractor_overlap": None, "outside_fraction": None}
+        # histogram intersection of the two visit distributions (1 = same)
+        p = self.counts / total
+        q = self.reference / self.reference.sum()
+        return {"attractor_overlap": float(np.minimum(p, q).sum()),
+                "outside_fraction": float(self.outside / total)}
+
+
+def _finite_or_none(x):
+    return float(x) if np.isfinite(x) else None
+
+
+# ------------------------------------------------------------
+#  4.  ODE rollout (RK4)
+# ------------------------------------------------------------
+def simulate_ode(program: Program, state: list[str], ics, times, reference=None,
+                 scale=None, tolerance: float = 0.5, substeps: int = 1,
+                 time_name: str | None = None, blowup: float = BLOWUP,
+                 record: bool = False) -> dict:
+    """Integrate ``d state/dt = program(state)`` from every row of *ics*
+    (n_ics × state) over *times* with RK4 (*substeps* steps per interval).
+
+    With a *reference* series (len(times) × state) the distance of every
+    trajectory from it, normalised per state variable by *scale* (default:
+    the reference's standard deviation), is tracked; a trajectory has
+    diverged once it exceeds *tolerance*.  Returns `divergence_time`
+    statistics, per-IC `divergence_times`, the RMS `error` over time and,
+    with *record*, the `trajectories` (steps × n_ics × state).
+    """
+    times = np.asarray(times, dtype=float)
+    x = np.array(ics, dtype=float).T.copy()               # state × n_ics
+    d, n = x.shape
+    if d != len(state) or program.n_outputs != d:
+        raise ValueError(f"Expected {program.n_outputs} state variables, got {d}")
+    if scale is None:
+        scale = np.ones(d) if reference is None else np.std(reference, axis=0)
+    scale = np.where(np.asarray(scale, dtype=float) > 0, scale, 1.0)
+    tracker = _Tracker(reference, scale, n, tolerance, record)
+
+    idx = np.arange(n)                                    # live ICs
+    k1, k2, k3, k4, tmp = (np.empty_like(x) for _ in range(5))
+    tracker.observe(0, x, idx)
+    for step in range(1, len(times)):
+        h = (times[step] - times[step - 1]) / substeps
+        t = times[step - 1]
+        for _ in range(substeps):
+            _rhs(program, state, x, k1, time_name, t)
+            np.multiply(k1, h / 2, out=tmp)
+            tmp += x
+            _rhs(program, state, tmp, k2, time_name, t + h / 2)
+            np.multiply(k2, h / 2, out=tmp)
+            tmp += x
+            _rhs(program, state, tmp, k3, time_name, t + h / 2)
+            np.multiply(k3, h, out=tmp)
+            tmp += x
+            _rhs(program, state, tmp, k4, time_name, t + h)
+            k2 += k3
+            k2 *= 2.0
+            k1 += k2
+            k1 += k4
+            k1 *= h / 6
+            x += k1
+            t += h
+
+        x, idx, dropped = _drop_blown_up(x, idx, step, tracker, blowup)
+        if dropped:
+            k1, k2, k3, k4, tmp = (np.empty_like(x) for _ in range(5))
+        tracker.observe(step, x, idx)
+        if not len(idx):
+            for rest in range(step + 1, len(times)):
+                tracker.observe(rest, x, idx)
+            break
+
+    return {"time": times, **tracker.summary(times)}
+
+
+def _drop_blown_up(x, idx, step: int, tracker: _Tracker, blowup: float):
+    """Remove the trajectories that became non-finite or unbounded."""
+    with np.errstate(invalid="ignore"):
+        ok = np.isfinite(x).all(axis=0) & (np.abs(x).max(axis=0) < blowup)
+    if ok.all():
+        return x, idx, False
+    tracker.blew_up(step, idx[~ok])
+    return x[:, ok].copy(), idx[ok], True
+
+
+# ------------------------------------------------------------
+#  5.  Iterated maps
+# ------------------------------------------------------------
+def iterate_map(program: Program, state: list[str], ics, n_steps: int, reference=None,
+                scale=None, tolerance: float = 0.5, burn_in: int = 100, bins: int = 64,
+                blowup: float = BLOWUP, record: bool = False) -> dict:
+    """Iterate ``state <- program(state)`` *n_steps* times from every row
+    of *ics* (n_ics × state), all trajectories in lockstep.
+
+    With a *reference* orbit (steps × state) the result has the divergence
+    statistics of `simulate_ode` (in iterations) and the overlap of the
+    visited states after *burn_in* iterations with the recorded attractor:
+    the intersection of both visit histograms on a *bins*-per-axis grid
+    over the recorded bounding box (1 = same distribution), and the
+    fraction of points that fell outside that box.
+    """
+    x = np.array(ics, dtype=float).T.copy()               # state × n_ics
+    d, n = x.shape
+    if d != len(state) or program.n_outputs != d:
+        raise ValueError(f"Expected {program.n_outputs} state variables, got {d}")
+    if scale is None:
+        scale = np.ones(d) if reference is None else np.std(reference, axis=0)
+    scale = np.where(np.asarray(scale, dtype=float) > 0, scale, 1.0)
+    tracker = _Tracker(reference, scale, n, tolerance, record)
+    occupancy = None if reference is None else _Occupancy(reference, bins)
+
+    idx = np.arange(n)
+    nxt = np.empty_like(x)
+    tracker.observe(0, x, idx)
+    for step in range(1, n_steps + 1):
+        _rhs(program, state, x, nxt)
+        x, nxt = nxt, x
+        x, idx, dropped = _drop_blown_up(x, idx, step, tracker, blowup)
+        if dropped:
+            nxt = np.empty_like(x)
+        tracker.observe(step, x, idx)
+        if occupancy is not None and step >= burn_in:
+            occupancy.add(x)
+        if not len(idx):
+            for rest in range(step + 1, n_steps + 1):
+                tracker.observe(rest, x, idx)
+            break
+
+    steps = np.arange(n_steps + 1)
+    result = {"step": steps, **tracker.summary(steps)}
+    if occupancy is not None:
+        result.update(occupancy.summary())
+    return result
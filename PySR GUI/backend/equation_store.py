@@ -0,0 +1,258 @@
+"""
+equation_store.py
+
+Persistent, indexed store of every equation from every PySR run.
+
+A run's `hall_of_fame.csv` is rewritten while it runs and gone once the
+job directory is cleaned up.  When a job finishes its hall of fame is
+copied into an SQLite database (one file, no server), together with what
+identifies the search:
+
+    runs        run_id (the job id), dataset_id (content hash of the
+                data), target, operator configuration (and its key),
+                input variables, search key, status, timestamps
+    equations   run_id, dataset_id, target, operators_key, complexity,
+                loss, equation
+
+Equations are indexed by (dataset_id, target) with complexity and loss,
+so the cross-run Pareto front of a dataset and target and its best
+equation are single indexed queries instead of re-reading CSVs.
+Connections are opened per call (SQLite in WAL mode), so the store can be
+used from request threads and the job monitor thread at the same time.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import pandas as pd
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        TEXT PRIMARY KEY,
+    dataset_id    TEXT,
+    target        TEXT,
+    operators_key TEXT,
+    operators     TEXT,
+    inputs        TEXT,
+    search_key    TEXT,
+    status        TEXT,
+    created       REAL,
+    finished      REAL,
+    n_equations   INTEGER
+);
+CREATE TABLE IF NOT EXISTS equations (
+    id            INTEGER PRIMARY KEY,
+    run_id        TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    dataset_id    TEXT,
+    target        TEXT,
+    operators_key TEXT,
+    complexity    INTEGER NOT NULL,
+    loss          REAL,
+    equation      TEXT NOT NULL,
+    UNIQUE (run_id, complexity, equation)
+);
+CREATE INDEX IF NOT EXISTS equations_complexity
+    ON equations (dataset_id, target, complexity, loss);
+CREATE INDEX IF NOT EXISTS equations_loss
+    ON equations (dataset_id, target, loss);
+CREATE INDEX IF NOT EXISTS equations_operators
+    ON equations (operators_key, dataset_id, target);
+CREATE INDEX IF NOT EXISTS equations_run ON equations (run_id);
+CREATE INDEX IF NOT EXISTS runs_dataset ON runs (dataset_id, target);
+"""
+
+EQUATION_FIELDS = ("run_id", "dataset_id", "target", "operators_key",
+                   "complexity", "loss", "equation")
+
+
+def operators_key(operators, functions) -> str:
+    """Key of an operator configuration (the enabled binary operators and
+    unary functions, order-insensitive)."""
+    config = {"operators": sorted(operators or []), "functions": sorted(functions or [])}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def pareto_front(rows: list[dict]) -> list[dict]:
+    """Rows that no other row beats on both complexity and loss, by
+    increasing complexity (rows are dicts with both fields)."""
+    front, best = [], float("inf")
+    for row in sorted(rows, key=lambda r: (r["complexity"], r["loss"])):
+        if row["loss"] is not None and row["loss"] < best:
+            front.append(row)
+            best = row["loss"]
+    return front
+
+
+class EquationStore:
+    """SQLite-backed equation history (see module docstring)."""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as db, db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA foreign_keys=ON")
+        return db
+
+    def _query(self, sql: str, params=()) -> list[dict]:
+        with closing(self._connect()) as db:
+            return [dict(row) for row in db.execute(sql, params)]
+
+    # ------------------------------------------------------------------
+    #  Writing
+    # ------------------------------------------------------------------
+    def add_run(self, run_id: str, rows: list[dict], dataset_id: str | None = None,
+                target: str | None = None, operators=None, functions=None,
+                inputs=None, search_key: str | None = None, status: str | None = None,
+                created: float | None = None, finished: float | None = None) -> int:
+        """Store (or replace) run *run_id* and its hall-of-fame *rows*
+        (dicts with Complexity, Loss and Equation).  Returns the number of
+        equations stored."""
+        key = operators_key(operators, functions)
+        equations = []
+        for row in rows:
+            loss = pd.to_numeric(row.get("Loss"), errors="coerce")
+            equations.append((run_id, dataset_id, target, key, int(row["Complexity"]),
+                              None if pd.isna(loss) else float(loss), str(row["Equation"])))
+        with closing(self._connect()) as db, db:
+            db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            db.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, dataset_id, target, key,
+                 json.dumps({"operators": sorted(operators or []),
+                             "functions": sorted(functions or [])}),
+                 json.dumps(list(inputs or [])), search_key, status,
+                 created, finished if finished is not None else time.time(), len(equations)))
+            db.executemany(
+                "INSERT OR IGNORE INTO equations "
+                "(run_id, dataset_id, target, operators_key, complexity, loss, equation) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", equations)
+        return len(equations)
+
+    def add_job(self, meta: dict, hof_path: str) -> int:
+        """Store a finished job from its `job.json` contents and hall of
+        fame; 0 if it has no hall of fame."""
+        if not os.path.exists(hof_path):
+            return 0
+        try:
+            rows = pd.read_csv(hof_path).to_dict(orient="records")
+        except (OSError, ValueError, pd.errors.ParserError):
+            return 0
+        data = meta.get("data", {})
+        return self.add_run(
+            meta["job_id"], rows,
+            dataset_id=data.get("dataset_id"),
+            target=data.get("output_variable"),
+            operators=enabled_names(data.get("operators")),
+            functions=enabled_names(data.get("functions")),
+            inputs=data.get("input_variables"),
+            search_key=meta.get("search_key"),
+            status=meta.get("status"),
+            created=meta.get("created"),
+            finished=meta.get("finished"))
+
+    def backfill(self, jobs_root: str) -> int:
+        """Store the finished jobs under *jobs_root* that are not stored
+        yet (e.g. from before the store existed).  Returns how many."""
+        if not os.path.isdir(jobs_root):
+            return 0
+        known = {r["run_id"] for r in self._query("SELECT run_id FROM runs")}
+        added = 0
+        for job_id in sorted(os.listdir(jobs_root)):
+            if job_id in known:
+                continue
+            try:
+                with open(os.path.join(jobs_root, job_id, "job.json")) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get("status") in ("queued", "running"):
+                continue
+            hof = os.path.join(jobs_root, job_id, "hall of fame", "hall_of_fame.csv")
+            added += self.add_job(meta, hof) > 0
+        return added
+
+    def delete_run(self, run_id: str) -> bool:
+        with closing(self._connect()) as db, db:
+            return db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,)).rowcount > 0
+
+    # ------------------------------------------------------------------
+    #  Queries
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _where(dataset_id=None, target=None, operators_key=None, run_id=None,
+               max_complexity=None) -> tuple[str, list]:
+        clauses, params = [], []
+        for column, value in (("dataset_id", dataset_id), ("target", target),
+                              ("operators_key", operators_key), ("run_id", run_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if max_complexity is not None:
+            clauses.append("complexity <= ?")
+            params.append(int(max_complexity))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def has_run(self, run_id: str) -> bool:
+        return bool(self._query("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)))
+
+    def runs(self, dataset_id=None, target=None) -> list[dict]:
+        where, params = self._where(dataset_id, target)
+        rows = self._query(f"SELECT * FROM runs{where} ORDER BY finished DESC", params)
+        for row in rows:
+            row["operators"] = json.loads(row["operators"] or "{}")
+            row["inputs"] = json.loads(row["inputs"] or "[]")
+        return rows
+
+    def equations(self, dataset_id=None, target=None, operators_key=None, run_id=None,
+                  max_complexity=None, order: str = "loss", limit: int | None = None) -> list[dict]:
+        """Stored equations matching the filters, by *order* ("loss" or
+        "complexity")."""
+        where, params = self._where(dataset_id, target, operators_key, run_id, max_complexity)
+        order_by = "complexity, loss" if order == "complexity" else "loss IS NULL, loss, complexity"
+        sql = f"SELECT {', '.join(EQUATION_FIELDS)} FROM equations{where} ORDER BY {order_by}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self._query(sql, params)
+
+    def pareto(self, dataset_id: str, target: str, operators_key=None,
+               max_complexity=None) -> list[dict]:
+        """Pareto front (complexity vs. loss) over all stored runs."""
+        where, params = self._where(dataset_id, target, operators_key, None, max_complexity)
+        # lowest loss per complexity (SQLite takes the bare columns from
+        # the row that has the MIN), then the front in Python
+        rows = self._query(
+            f"SELECT run_id, dataset_id, target, operators_key, complexity, "
+            f"MIN(loss) AS loss, equation FROM equations{where} "
+            f"{'AND' if where else 'WHERE'} loss IS NOT NULL GROUP BY complexity", params)
+        return pareto_front(rows)
+
+    def best(self, dataset_id: str, target: str, operators_key=None,
+             max_complexity=None) -> dict | None:
+        """Lowest-loss stored equation (the simplest one on ties)."""
+        rows = self.equations(dataset_id, target, operators_key, None, max_complexity, limit=1)
+        return rows[0] if rows else None
+
+    def stats(self) -> dict:
+        counts = self._query("SELECT (SELECT COUNT(*) FROM runs) AS n_runs, "
+                             "(SELECT COUNT(*) FROM equations) AS n_equations")[0]
+        return {**counts, "path": self.path,
+                "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+
+def enabled_names(spec) -> list[str]:
+    """Operator/function names that are switched on: the frontend sends
+    {"+": true, "-": false, ...}, API clients may send a plain list."""
+    if isinstance(spec, dict):
+        return [name for name, on in spec.items() if on]
+    return list(spec or [])
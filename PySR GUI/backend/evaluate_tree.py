@@ -6,26 +6,29 @@ Utility to evaluate a mathematical expression by (1) parsing it into an
 expression-tree and (2) walking that tree, almost the same way the original
 `evaluate()` in *evaluation2.py* does.
 
-The module is fully self-contained except for the optional import
-of `safe_divide` from *accessory.py* (a 1-line fallback is provided).
+The module is fully self-contained.
 
 Example
 -------
 >>> from evaluation_tree import evaluate_expression
 >>> evaluate_expression("sqrt(x) + y/2", {"x": 9, "y": 4})
 5.0
+
+When the same expression is evaluated over and over (e.g. re-scoring a
+hall of fame), compile it once and reuse the program:
+
+>>> prog = compile_expression("sqrt(x) + y/2")
+>>> prog.run({"x": 9, "y": 4})
+5.0
 """
 from __future__ import annotations
+import os
 import re
 import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
-# Safe division
-def safe_divide(up, down, epsilon=1e-10):
-
-    down_clipped = np.where(np.abs(down) < epsilon, epsilon, down)
-    return up / down_clipped
-
 # ------------------------------------------------------------
 #  Node class – no subclasses, like in expression2.py
 # ------------------------------------------------------------
@@ -46,9 +49,13 @@ class Node:
     # Human‑friendly infix string
     def __str__(self) -> str:                        # noqa: D401
         if self.left is None and self.right is None:
+            if isinstance(self.value, (int, float)) and self.value < 0:
+                return f"({self.value})"             # so "-2" re-parses as a constant
             return str(self.value)
         if self.right is None:                       # unary func
             return f"{self.value}({self.left})"
+        if self.value in _BINARY_FUNCTIONS:          # max(a, b), …
+            return f"{self.value}({self.left}, {self.right})"
         return f"({self.left} {self.value} {self.right})"
 
 
@@ -57,28 +64,43 @@ class Node:
 # ------------------------------------------------------------
 _token_pat = re.compile(
     r"""(?x)                 # verbose
-    (\d+\.\d+|\d+\.|\.\d+|\d+)  # numbers  3.14  3.   .14  3
+    ((?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)  # numbers  3.14  3.  .14  3  1e-5
   | ([A-Za-z_][A-Za-z0-9_]*)    # names    x var_1 sin
-  | ([()+\-*/])                 # operators and parentheses
+  | (\*\*|[()+\-*/^,])          # operators, parentheses and argument commas
     """
 )
+_NUMBER = re.compile(r"\d|\.\d")
 
 
 def _tokenise(expr: str) -> list[str]:
     tokens = [m.group(0) for m in _token_pat.finditer(expr.replace(" ", ""))]
     if "".join(tokens) != expr.replace(" ", ""):
         raise ValueError(f"Invalid token in expression: {expr!r}")
-    return tokens
+    return ["^" if tok == "**" else tok for tok in tokens]
 
 
 # ------------------------------------------------------------
 #  2.  Shunting‑yard → postfix
 # ------------------------------------------------------------
-# precedence (higher number = binds tighter)
-_PRECEDENCE = {"+": 2, "-": 2, "*": 3, "/": 3}
-# functions have precedence 4 but handled separately
-
-_FUNCTIONS = {"sqrt", "sin", "cos"}
+# precedence (higher number = binds tighter); "^" is right-associative
+_PRECEDENCE = {"+": 2, "-": 2, "*": 3, "/": 3, "^": 5}
+_RIGHT_ASSOC = {"^"}
+# unary minus ("u-" on the operator stack, a "neg" node in the tree) binds
+# tighter than * and / but looser than ^, so -x^2 == -(x^2) as in Julia
+_UNARY_MINUS = "u-"
+_UNARY_MINUS_PRECEDENCE = 4
+# functions are handled separately
+
+# Every operator PySR writes into a hall of fame (kernels in section 5)
+_UNARY_FUNCTIONS = {
+    "neg", "square", "cube", "sqrt", "abs", "sign", "inv", "relu",
+    "exp", "log", "log2", "log10", "log1p",
+    "sin", "cos", "tan", "asin", "acos", "atan",
+    "sinh", "cosh", "tanh", "asinh", "acosh", "atanh", "atanh_clip",
+    "floor", "ceil", "round",
+}
+_BINARY_FUNCTIONS = {"pow", "max", "min", "mod"}
+_FUNCTIONS = _UNARY_FUNCTIONS | _BINARY_FUNCTIONS
 
 
 def _infix_to_postfix(tokens: list[str]) -> list[str]:
@@ -88,15 +110,42 @@ def _infix_to_postfix(tokens: list[str]) -> list[str]:
     def is_function(tok: str) -> bool:
         return tok in _FUNCTIONS
 
-    for tok in tokens:
+    def precedence(tok: str) -> int:
+        return _UNARY_MINUS_PRECEDENCE if tok == _UNARY_MINUS else _PRECEDENCE.get(tok, 0)
+
+    prev = None                 # previous token: tells unary from binary minus
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        unary = prev is None or prev in _PRECEDENCE or prev in ("(", ",", _UNARY_MINUS)
+        if tok in ("+", "-") and unary:
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+            after = tokens[i + 2] if i + 2 < len(tokens) else ""
+            if tok == "-" and _NUMBER.match(nxt) and after != "^":
+                output.append("-" + nxt)                      # negative constant
+                prev = nxt
+                i += 2
+                continue
+            if tok == "-":
+                stack.append(_UNARY_MINUS)                    # prefix: never pops
+            prev = tok if tok == "+" else _UNARY_MINUS
+            i += 1
+            continue
+
         if tok.isidentifier() and not is_function(tok):          # variable
             output.append(tok)
-        elif re.match(r"\d|\.\d", tok):                      # number
+        elif _NUMBER.match(tok):                                # number
             output.append(tok)
         elif is_function(tok):
             stack.append(tok)
         elif tok == "(":
             stack.append(tok)
+        elif tok == ",":
+            # argument separator: finish the first argument
+            while stack and stack[-1] != "(":
+                output.append(stack.pop())
+            if not stack:
+                raise ValueError("Misplaced comma")
         elif tok == ")":
             # pop until "(" or function
             while stack and stack[-1] != "(":
@@ -110,9 +159,12 @@ def _infix_to_postfix(tokens: list[str]) -> list[str]:
         else:   # operator
             while (stack and stack[-1] not in ("(") and
                    (stack[-1] in _FUNCTIONS or
-                    _PRECEDENCE.get(stack[-1], 0) >= _PRECEDENCE.get(tok, 0))):
+                    precedence(stack[-1]) > precedence(tok) or
+                    (precedence(stack[-1]) == precedence(tok) and tok not in _RIGHT_ASSOC))):
                 output.append(stack.pop())
             stack.append(tok)
+        prev = tok
+        i += 1
 
     # drain
     while stack:
@@ -129,17 +181,17 @@ def _infix_to_postfix(tokens: list[str]) -> list[str]:
 def _postfix_to_tree(postfix: list[str]) -> Node:
     stack: list[Node] = []
     for tok in postfix:
-        if tok in _FUNCTIONS:
+        if tok == _UNARY_MINUS or tok in _UNARY_FUNCTIONS:
             if not stack:
                 raise ValueError("Function without operand")
             operand = stack.pop()
-            stack.append(Node(tok, left=operand))
-        elif tok in _PRECEDENCE:
+            stack.append(Node("neg" if tok == _UNARY_MINUS else tok, left=operand))
+        elif tok in _PRECEDENCE or tok in _BINARY_FUNCTIONS:
             if len(stack) < 2:
                 raise ValueError("Operator without two operands")
             right = stack.pop()
             left = stack.pop()
-            stack.append(Node(tok, left, right))
+            stack.append(Node("^" if tok == "pow" else tok, left, right))
         else:  # number or variable
             try:
                 value = float(tok)
@@ -162,6 +214,15 @@ def parse_expression(expr: str) -> Node:
 #  4.  Evaluate – stack‑based (mirrors evaluation2.evaluate)
 # ------------------------------------------------------------
 
+def _apply(op: str, a, b=None):
+    """One operator on (array) operands, through the kernels of section 5."""
+    shape = np.shape(a) if b is None else np.broadcast_shapes(np.shape(a), np.shape(b))
+    out = np.empty(shape)
+    with np.errstate(all="ignore"):         # out-of-domain values become NaN / inf
+        _KERNELS[op](a, b, out, _Scratch(shape) if op in _SCRATCH_OPS else None)
+    return out
+
+
 def evaluate_tree(root: Node, variables: dict[str, float]) -> float:
     stack = [root]
     cache: dict[Node, float] = {}
@@ -186,33 +247,18 @@ def evaluate_tree(root: Node, variables: dict[str, float]) -> float:
             continue
 
         # unary function
-        if node.value in _FUNCTIONS:
+        if node.value in _UNARY_FUNCTIONS:
             if node.left in cache:
-                x = cache[node.left]
-                if node.value == "sqrt":
-                    cache[node] = np.sqrt(np.maximum(x, 0))
-                elif node.value == "sin":
-                    cache[node] = np.sin(x)
-                elif node.value == "cos":
-                    cache[node] = np.cos(x)
+                cache[node] = _apply(node.value, cache[node.left])
             else:
                 stack.append(node)
                 stack.append(node.left)
             continue
 
         # binary operator
-        if node.value in _PRECEDENCE:
+        if node.value in _PRECEDENCE or node.value in _BINARY_FUNCTIONS:
             if node.left in cache and node.right in cache:
-                a = cache[node.left]
-                b = cache[node.right]
-                if node.value == "+":
-                    cache[node] = a + b
-                elif node.value == "-":
-                    cache[node] = a - b
-                elif node.value == "*":
-                    cache[node] = a * b
-                elif node.value == "/":
-                    cache[node] = safe_divide(a, b)
+                cache[node] = _apply(node.value, cache[node.left], cache[node.right])
             else:
                 stack.append(node)
                 if node.right:
@@ -226,7 +272,7 @@ def evaluate_tree(root: Node, variables: dict[str, float]) -> float:
     res = cache[root]
 
     # Keep vectorised output intact; unwrap single scalars only.
-    if isinstance(res, np.ndarray):
+    if isinstance(res, np.ndarray) and res.ndim > 0:
         return res
     return float(res)
 
@@ -238,7 +284,694 @@ def evaluate_expression(expr: str, variables: dict[str, float]) -> float:
 
 
 # ------------------------------------------------------------
-#  5.  Quick CLI for ad‑hoc testing
+#  5.  Compile – flat postfix program with reusable buffers
+# ------------------------------------------------------------
+# `evaluate_tree` rebuilds its cache, and one fresh array per node, on
+# every call.  `compile_tree` does the walk once and flattens the tree into
+# a linear list of `(opcode, dst, a, b)` instructions whose operands are
+# indices into a single operand table laid out as
+#
+#     [ constants ... | variables ... | scratch registers ... ]
+#
+# Registers are recycled as soon as the value they hold is dead, so a
+# program needs only as many row-length buffers as the tree is "wide".
+# Every kernel writes into its destination with `out=`, which means running
+# a compiled program allocates nothing per node.
+
+# Rows per block of `Program.run_chunked` (8 registers ≈ 4 MiB at float64)
+CHUNK_ROWS = 65536
+# `Program.run_parallel` stays serial below this many rows
+PARALLEL_MIN_ROWS = 4 * CHUNK_ROWS
+
+
+def _k_add(a, b, out, ws):
+    np.add(a, b, out=out)
+
+
+def _k_sub(a, b, out, ws):
+    np.subtract(a, b, out=out)
+
+
+def _k_mul(a, b, out, ws):
+    np.multiply(a, b, out=out)
+
+
+def _k_div(a, b, out, ws):
+    # plain IEEE division like PySR's "/": x/0 is ±inf, 0/0 is NaN
+    np.divide(a, b, out=out)
+
+
+def _k_sin(a, b, out, ws):
+    np.sin(a, out=out)
+
+
+def _k_cos(a, b, out, ws):
+    np.cos(a, out=out)
+
+
+# The operators follow PySR's safe operators: outside its domain an
+# operator returns NaN (not -inf / an exception), so an equation scores the
+# same here as it did in the search.  Masks are computed before `out` is
+# written, because `out` may be the register that holds `a`.
+
+def _k_pow(a, b, out, ws):
+    # safe_pow: NaN for 0^(negative) and for a negative base with a
+    # non-integer exponent (or x <= 0 with a negative non-integer one)
+    den, nonint, invalid = ws.den, ws.mask, ws.mask2
+    np.floor(b, out=den)
+    np.not_equal(den, b, out=nonint)
+    np.less(a, 0.0, out=nonint, where=nonint)
+    np.less(b, 0.0, out=invalid)
+    np.equal(a, 0.0, out=invalid, where=invalid)
+    np.logical_or(invalid, nonint, out=invalid)
+    np.power(a, b, out=out)
+    np.copyto(out, np.nan, where=invalid)
+
+
+def _k_max(a, b, out, ws):
+    np.maximum(a, b, out=out)
+
+
+def _k_min(a, b, out, ws):
+    np.minimum(a, b, out=out)
+
+
+def _k_mod(a, b, out, ws):
+    np.mod(a, b, out=out)                 # sign of the divisor, like Julia's mod
+
+
+def _k_neg(a, b, out, ws):
+    np.negative(a, out=out)
+
+
+def _k_square(a, b, out, ws):
+    np.multiply(a, a, out=out)
+
+
+def _k_cube(a, b, out, ws):
+    np.multiply(a, a, out=ws.den)
+    np.multiply(ws.den, a, out=out)
+
+
+def _k_inv(a, b, out, ws):
+    np.divide(1.0, a, out=out)
+
+
+def _k_relu(a, b, out, ws):
+    np.maximum(a, 0.0, out=out)
+
+
+def _ufunc_kernel(ufunc):
+    def kernel(a, b, out, ws):
+        ufunc(a, out=out)
+    return kernel
+
+
+def _log_kernel(ufunc, lower: float):
+    # safe_log*: NaN for x <= lower (0, or -1 for log1p)
+    def kernel(a, b, out, ws):
+        np.less_equal(a, lower, out=ws.mask)
+        ufunc(a, out=out)
+        np.copyto(out, np.nan, where=ws.mask)
+    return kernel
+
+
+def _k_atanh_clip(a, b, out, ws):
+    # atanh((x + 1) mod 2 - 1), always inside the domain
+    np.add(a, 1.0, out=out)
+    np.mod(out, 2.0, out=out)
+    np.subtract(out, 1.0, out=out)
+    np.arctanh(out, out=out)
+
+
+def _k_store(a, b, out, ws):
+    np.copyto(out, a)
+
+
+_KERNELS = {
+    "+": _k_add,
+    "-": _k_sub,
+    "*": _k_mul,
+    "/": _k_div,
+    "^": _k_pow,
+    "max": _k_max,
+    "min": _k_min,
+    "mod": _k_mod,
+    "neg": _k_neg,
+    "square": _k_square,
+    "cube": _k_cube,
+    "sqrt": _ufunc_kernel(np.sqrt),           # safe_sqrt: NaN below 0
+    "abs": _ufunc_kernel(np.absolute),
+    "sign": _ufunc_kernel(np.sign),
+    "inv": _k_inv,
+    "relu": _k_relu,
+    "exp": _ufunc_kernel(np.exp),
+    "log": _log_kernel(np.log, 0.0),
+    "log2": _log_kernel(np.log2, 0.0),
+    "log10": _log_kernel(np.log10, 0.0),
+    "log1p": _log_kernel(np.log1p, -1.0),
+    "sin": _k_sin,
+    "cos": _k_cos,
+    "tan": _ufunc_kernel(np.tan),
+    "asin": _ufunc_kernel(np.arcsin),
+    "acos": _ufunc_kernel(np.arccos),
+    "atan": _ufunc_kernel(np.arctan),
+    "sinh": _ufunc_kernel(np.sinh),
+    "cosh": _ufunc_kernel(np.cosh),
+    "tanh": _ufunc_kernel(np.tanh),
+    "asinh": _ufunc_kernel(np.arcsinh),
+    "acosh": _ufunc_kernel(np.arccosh),
+    "atanh": _ufunc_kernel(np.arctanh),
+    "atanh_clip": _k_atanh_clip,
+    "floor": _ufunc_kernel(np.floor),
+    "ceil": _ufunc_kernel(np.ceil),
+    "round": _ufunc_kernel(np.rint),           # half to even, like Julia
+    "store": _k_store,
+}
+
+# Kernels that need the scratch buffers `den` / `mask` / `mask2`
+_SCRATCH_OPS = {"^", "cube", "log", "log2", "log10", "log1p"}
+
+_COMMUTATIVE = {"+", "*", "max", "min"}
+
+
+class _Scratch:
+    """Temporaries of the kernels that need them (see `_SCRATCH_OPS`)."""
+    __slots__ = ("den", "mask", "mask2")
+
+    def __init__(self, shape: tuple, dtype=np.float64):
+        self.den = np.empty(shape, dtype=dtype)
+        self.mask = np.empty(shape, dtype=bool)
+        self.mask2 = np.empty(shape, dtype=bool)
+
+
+class _Workspace:
+    """Scratch buffers of one program for one input shape."""
+    __slots__ = ("shape", "dtype", "table", "den", "mask", "mask2")
+
+    def __init__(self, program: "Program", shape: tuple, dtype=np.float64):
+        registers = [np.empty(shape, dtype=dtype) for _ in range(program.n_registers)]
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.table = (list(program.constants) + [None] * len(program.variables)
+                      + registers + [None] * program.n_outputs)
+        if program.needs_den:
+            scratch = _Scratch(shape, dtype)
+            self.den, self.mask, self.mask2 = scratch.den, scratch.mask, scratch.mask2
+        else:
+            self.den = self.mask = self.mask2 = None
+
+    def head(self, rows: int) -> "_Workspace":
+        """Workspace for the first *rows* rows, sharing this one's buffers
+        (for the last, shorter block of a chunked run)."""
+        ws = object.__new__(_Workspace)
+        ws.shape = (rows,)
+        ws.dtype = self.dtype
+        ws.table = [buf[:rows] if isinstance(buf, np.ndarray) else buf for buf in self.table]
+        ws.den, ws.mask, ws.mask2 = (None if buf is None else buf[:rows]
+                                     for buf in (self.den, self.mask, self.mask2))
+        return ws
+
+
+_pools: dict[int, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _thread_pool(workers: int) -> ThreadPoolExecutor:
+    """Shared pool of *workers* evaluation threads (created on first use)."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ThreadPoolExecutor(workers, thread_name_prefix="evaluate")
+        return pool
+
+
+class Program:
+    """One or more `Node` trees compiled to a flat, reusable postfix program.
+
+    Build one with `compile_tree` / `compile_expression` (single result) or
+    `compile_forest` / `compile_expressions` (one result per tree, shared
+    subexpressions computed once) and call `run` as often as needed;
+    scratch buffers are kept between calls and only reallocated when the
+    row count changes.  `run_chunked` streams long (e.g. memory-mapped)
+    columns through the program in fixed-size row blocks instead, and
+    `run_parallel` spreads those blocks over a thread pool.
+    """
+    __slots__ = ("code", "constants", "variables", "n_registers", "n_outputs",
+                 "needs_den", "_exec", "_workspace")
+
+    def __init__(self, code, constants, variables, n_registers, n_outputs):
+        self.code = code                    # [(opcode, dst, a, b), ...]
+        self.constants = constants          # operand slots 0 .. C-1
+        self.variables = variables          # operand slots C .. C+V-1
+        self.n_registers = n_registers      # then R scratch registers
+        self.n_outputs = n_outputs          # then one slot per result
+        self.needs_den = any(op in _SCRATCH_OPS for op, *_ in code)
+        self._exec = [(_KERNELS[op], dst, a, b) for op, dst, a, b in code]
+        self._workspace: _Workspace | None = None
+
+    def __str__(self) -> str:
+        n_const, n_vars = len(self.constants), len(self.variables)
+
+        def name(i: int) -> str:
+            if i < 0:
+                return ""
+            if i < n_const:
+                return repr(self.constants[i])
+            if i < n_const + n_vars:
+                return self.variables[i - n_const]
+            i -= n_const + n_vars
+            if i < self.n_registers:
+                return f"r{i}"
+            return f"out{i - self.n_registers}"
+
+        return "\n".join(f"{name(dst)} = {op} {name(a)} {name(b)}".rstrip()
+                         for op, dst, a, b in self.code)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the scratch buffers of the last `run`."""
+        ws = self._workspace
+        if ws is None:
+            return 0
+        first_reg = len(self.constants) + len(self.variables)
+        buffers = ws.table[first_reg:first_reg + self.n_registers] + [ws.den, ws.mask, ws.mask2]
+        return sum(buf.nbytes for buf in buffers if buf is not None)
+
+    def _get_workspace(self, shape: tuple) -> _Workspace:
+        ws = self._workspace
+        if ws is None or ws.shape != shape:
+            ws = self._workspace = _Workspace(self, shape)
+        return ws
+
+    def run(self, variables: dict[str, float], out: np.ndarray | None = None):
+        """Evaluate the program; same contract as `evaluate_tree`.
+
+        A single-result program returns one array (a plain float for scalar
+        inputs); a forest returns an array of shape ``(n_outputs, *rows)``.
+        If *out* is given the result is written into it instead.
+        """
+        arrays = []
+        for name in self.variables:
+            if name not in variables:
+                raise KeyError(f"Variable {name!r} not provided")
+            arrays.append(np.asarray(variables[name], dtype=float))
+        shape = np.broadcast_shapes(*(a.shape for a in arrays)) if arrays else ()
+
+        single = self.n_outputs == 1
+        if out is None:
+            out = np.empty(shape if single else (self.n_outputs,) + shape)
+
+        outs = [out] if single else [out[k, ...] for k in range(self.n_outputs)]
+        self._execute(self._get_workspace(shape), arrays, outs)
+        if single and out.ndim == 0:
+            return float(out)
+        return out
+
+    def run_chunked(self, variables: dict[str, np.ndarray], out: np.ndarray | None = None,
+                    chunk_rows: int = CHUNK_ROWS, dtype=np.float64):
+        """Evaluate 1-D columns block by block with bounded memory.
+
+        Row blocks of *chunk_rows* are streamed through one set of
+        block-sized registers, so the memory besides inputs and result is
+        ``registers × chunk_rows`` whatever the row count.  Inputs may be
+        memory-mapped (`np.load(..., mmap_mode="r")`): only the block being
+        computed is paged in, and columns already of *dtype* are used
+        without a copy.  *out* may be memory-mapped too (e.g.
+        `np.lib.format.open_memmap`).  ``dtype=np.float32`` halves memory
+        and bandwidth at single precision.  Returns what `run` returns.
+        """
+        prepared = self._columns(variables)
+        if prepared is None:
+            return self.run(variables, out)
+        columns, n_rows = prepared
+        out = self._output(out, n_rows, dtype)
+        self._run_rows(columns, out, 0, n_rows, chunk_rows, np.dtype(dtype))
+        return out
+
+    def run_parallel(self, variables: dict[str, np.ndarray], out: np.ndarray | None = None,
+                     workers: int | None = None, chunk_rows: int = CHUNK_ROWS,
+                     dtype=np.float64, min_rows: int = PARALLEL_MIN_ROWS):
+        """`run_chunked` with the rows split across *workers* threads.
+
+        NumPy releases the GIL inside the kernels, so contiguous row ranges
+        evaluated by different threads – each with its own block-sized
+        workspace – run on different cores and write into disjoint slices
+        of one preallocated *out*.  *workers* defaults to the CPU count;
+        inputs shorter than *min_rows* (or ``workers=1``) are evaluated
+        serially, where thread hand-off would cost more than it saves.
+        """
+        prepared = self._columns(variables)
+        if prepared is None:
+            return self.run(variables, out)
+        columns, n_rows = prepared
+        out = self._output(out, n_rows, dtype)
+        dtype = np.dtype(dtype)
+        workers = workers or os.cpu_count() or 1
+        chunk = max(1, min(chunk_rows, n_rows))
+        n_parts = min(workers, -(-n_rows // chunk))
+        if n_parts <= 1 or n_rows < min_rows:
+            self._run_rows(columns, out, 0, n_rows, chunk, dtype)
+            return out
+
+        # contiguous ranges of whole blocks, one per thread
+        blocks = -(-n_rows // chunk)
+        bounds = [min(n_rows, (blocks * i // n_parts) * chunk) for i in range(n_parts + 1)]
+        pool = _thread_pool(n_parts)
+        futures = [pool.submit(self._run_rows, columns, out, start, stop, chunk, dtype)
+                   for start, stop in zip(bounds, bounds[1:]) if stop > start]
+        for future in futures:
+            future.result()
+        return out
+
+    def _columns(self, variables: dict) -> tuple[list, int] | None:
+        """Input columns in program order and their length, or None if
+        they are not all 1-D (then `run` has to broadcast)."""
+        columns = []
+        for name in self.variables:
+            if name not in variables:
+                raise KeyError(f"Variable {name!r} not provided")
+            columns.append(np.asarray(variables[name]))
+        if not columns or any(col.ndim != 1 for col in columns):
+            return None
+        n_rows = len(columns[0])
+        if any(len(col) != n_rows for col in columns):
+            raise ValueError("Columns have different lengths")
+        return columns, n_rows
+
+    def _output(self, out: np.ndarray | None, n_rows: int, dtype) -> np.ndarray:
+        if out is not None:
+            return out
+        return np.empty(n_rows if self.n_outputs == 1 else (self.n_outputs, n_rows), dtype=dtype)
+
+    def _run_rows(self, columns: list, out: np.ndarray, start: int, stop: int,
+                  chunk_rows: int, dtype: np.dtype) -> None:
+        """Evaluate rows *start*:*stop* block by block with a workspace of
+        its own (so several ranges can run concurrently)."""
+        chunk = max(1, min(chunk_rows, stop - start))
+        block_ws = _Workspace(self, (chunk,), dtype)
+        buffers = [None if col.dtype == dtype else np.empty(chunk, dtype=dtype) for col in columns]
+        single = self.n_outputs == 1
+
+        for lo in range(start, stop, chunk):
+            hi = min(lo + chunk, stop)
+            ws = block_ws if hi - lo == chunk else block_ws.head(hi - lo)
+            arrays = []
+            for col, buf in zip(columns, buffers):
+                if buf is None:
+                    arrays.append(col[lo:hi])
+                else:
+                    np.copyto(buf[:hi - lo], col[lo:hi], casting="same_kind")
+                    arrays.append(buf[:hi - lo])
+            outs = [out[lo:hi]] if single else [out[k, lo:hi] for k in range(self.n_outputs)]
+            self._execute(ws, arrays, outs)
+
+    def _execute(self, ws: _Workspace, arrays: list, outs: list) -> None:
+        table = ws.table
+        first_var = len(self.constants)
+        first_out = first_var + len(self.variables) + self.n_registers
+        table[first_var:first_var + len(arrays)] = arrays
+        table[first_out:] = outs
+
+        with np.errstate(all="ignore"):     # out-of-domain values become NaN / inf
+            for kernel, dst, a, b in self._exec:
+                kernel(table[a], table[b] if b >= 0 else None, table[dst], ws)
+
+        # drop references to the caller's arrays
+        table[first_var:first_var + len(arrays)] = [None] * len(arrays)
+        table[first_out:] = [None] * self.n_outputs
+
+
+def _postorder(roots: list[Node]) -> list[Node]:
+    """Every node reachable from *roots* exactly once, children first."""
+    order: list[Node] = []
+    seen: set[Node] = set()
+    stack = [(root, False) for root in reversed(roots)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+            continue
+        if node in seen:
+            continue
+        seen.add(node)
+        stack.append((node, True))
+        for child in (node.right, node.left):
+            if child is not None and child not in seen:
+                stack.append((child, False))
+    return order
+
+
+def _is_leaf(node: Node) -> bool:
+    return node.left is None and node.right is None
+
+
+def _is_constant(node: Node | None) -> bool:
+    return node is not None and _is_leaf(node) and isinstance(node.value, (int, float))
+
+
+def merge_trees(roots: list[Node]) -> list[Node]:
+    """Hash-cons *roots* into one DAG – structurally equal subtrees, within
+    or across trees, become a single shared `Node`.
+
+    Operands of ``+`` and ``*`` are put in a canonical order first, so
+    ``x*y`` and ``y*x`` are merged too (exact in IEEE arithmetic).
+    """
+    canon: dict[Node, Node] = {}
+    interned: dict[tuple, Node] = {}
+    for node in _postorder(roots):
+        if _is_leaf(node):
+            value = float(node.value) if isinstance(node.value, (int, float)) else node.value
+            key = (type(value).__name__, value)
+            left = right = None
+        else:
+            left = canon[node.left]
+            right = canon[node.right] if node.right is not None else None
+            if node.value in _COMMUTATIVE and id(left) > id(right):
+                left, right = right, left
+            key = (node.value, id(left), id(right))
+        if key not in interned:
+            interned[key] = node if (left is node.left and right is node.right) \
+                else Node(node.value, left, right)
+        canon[node] = interned[key]
+    return [canon[root] for root in roots]
+
+
+def _constant_value(node: Node | None):
+    return float(node.value) if _is_constant(node) else None
+
+
+def _simplify(node: Node, left: Node, right: Node | None) -> Node:
+    """*node* with its (already simplified) children *left*/*right*,
+    constant-folded or rewritten by an identity where one applies."""
+    op = node.value
+    a, b = _constant_value(left), _constant_value(right)
+
+    # constant folding – through the kernels, so e.g. log(-1) folds to NaN
+    if a is not None and (right is None or b is not None):
+        return Node(float(_apply(op, a, b)))
+
+    # identities that keep NaN and inf; all but x^2 → square(x) are exact
+    if op == "+":
+        if b == 0.0:
+            return left
+        if a == 0.0:
+            return right
+        if right.value == "neg":                        # a + -b → a - b
+            return Node("-", left, right.left)
+        if left.value == "neg":                         # -a + b → b - a
+            return Node("-", right, left.left)
+    elif op == "-":
+        if b == 0.0:
+            return left
+        if right.value == "neg":                        # a - -b → a + b
+            return Node("+", left, right.left)
+    elif op == "*":
+        if b == 1.0:
+            return left
+        if a == 1.0:
+            return right
+    elif op == "/":
+        if b == 1.0:
+            return left
+    elif op == "^":
+        if b == 1.0:
+            return left
+        if b == 2.0:
+            return Node("square", left)
+        if b == 0.0:
+            return Node(1.0)
+    elif op == "neg":
+        if left.value == "neg":                         # --a → a
+            return left.left
+        if left.value == "-" and left.right is not None:   # -(a - b) → b - a
+            return Node("-", left.right, left.left)
+    elif op == "abs":
+        if left.value in ("abs", "square"):
+            return left
+
+    if left is node.left and right is node.right:
+        return node
+    return Node(op, left, right)
+
+
+def optimize_trees(roots: list[Node]) -> list[Node]:
+    """Fold constant subtrees, apply cheap algebraic identities and
+    hash-cons the result (`merge_trees`), so fewer full-length array
+    operations are left to run.
+
+    The results agree with the original trees to within an ulp, not
+    bit for bit: ``x^2`` becomes ``x*x`` and constant subtrees are
+    folded on scalars, while NumPy's vectorised `power` (and other
+    transcendental ufuncs) may round the last bit differently on arrays.
+    ``x + 0`` drops to ``x``, so ``-0.0`` stays ``-0.0`` (not ``+0.0``).
+    NaN and inf come out where they did before.
+    """
+    new: dict[Node, Node] = {}
+    for node in _postorder(roots):
+        if _is_leaf(node):
+            new[node] = node
+        else:
+            right = new[node.right] if node.right is not None else None
+            new[node] = _simplify(node, new[node.left], right)
+    return merge_trees([new[root] for root in roots])
+
+
+def optimize_tree(root: Node) -> Node:
+    """`optimize_trees` for a single tree."""
+    return optimize_trees([root])[0]
+
+
+def free_variables(root: Node) -> set[str]:
+    """Names of the variables *root* reads."""
+    return {node.value for node in _postorder([root])
+            if _is_leaf(node) and isinstance(node.value, str)}
+
+
+def compile_forest(roots: list[Node]) -> Program:
+    """Flatten one or more trees into a single `Program` (section 5 above).
+
+    Nodes shared between trees (see `merge_trees`) are evaluated once.
+    """
+    order = _postorder(roots)
+
+    # Pass 1 – constants and variables get fixed operand slots; count how
+    # often every internal value is used so its register can be recycled.
+    constants: list[float] = []
+    variables: list[str] = []
+    const_slot: dict[float, int] = {}
+    var_slot: dict[str, int] = {}
+    uses: dict[Node, int] = {}
+
+    def add_constant(value: float) -> None:
+        if value not in const_slot:
+            const_slot[value] = len(constants)
+            constants.append(value)
+
+    for node in order:
+        if _is_leaf(node):
+            if isinstance(node.value, (int, float)):
+                add_constant(float(node.value))
+            elif isinstance(node.value, str) and node.value not in _PRECEDENCE \
+                    and node.value not in _FUNCTIONS:
+                if node.value not in var_slot:
+                    var_slot[node.value] = len(variables)
+                    variables.append(node.value)
+            else:
+                raise ValueError(f"Unknown node {node.value!r}")
+            continue
+        if node.value not in _KERNELS:
+            raise ValueError(f"Unknown node {node.value!r}")
+        for child in (node.left, node.right):
+            if child is not None and not _is_leaf(child):
+                uses[child] = uses.get(child, 0) + 1
+    for root in roots:                      # the final store is a use too
+        if not _is_leaf(root):
+            uses[root] = uses.get(root, 0) + 1
+
+    n_fixed = len(constants) + len(variables)
+    register: dict[Node, int] = {}
+    code: list[tuple[str, int, int, int]] = []
+
+    def operand(node: Node) -> int:
+        if node in register:
+            return n_fixed + register[node]
+        if isinstance(node.value, (int, float)):
+            return const_slot[float(node.value)]
+        return len(constants) + var_slot[node.value]
+
+    def release(node: Node) -> None:
+        if node in register:
+            uses[node] -= 1
+            if uses[node] == 0:
+                free.append(register[node])
+
+    # Pass 2 – emit instructions in postfix order; a root is stored to its
+    # output slot(s) as soon as it is computed so its register can be reused.
+    pending_stores: dict[Node, list[int]] = {}
+    for k, root in enumerate(roots):
+        pending_stores.setdefault(root, []).append(k)
+    free: list[int] = []
+    n_registers = 0
+    for node in order:
+        if not _is_leaf(node):
+            op = node.value
+            a = operand(node.left)
+            b = operand(node.right) if node.right is not None else -1
+
+            # operands whose last use is this node hand their register back
+            # first, so the result may overwrite one of them in place
+            release(node.left)
+            if node.right is not None:
+                release(node.right)
+            if free:
+                register[node] = free.pop()
+            else:
+                register[node] = n_registers
+                n_registers += 1
+            code.append((op, n_fixed + register[node], a, b))
+        for k in pending_stores.pop(node, ()):
+            code.append(("store", k, operand(node), -1))
+            release(node)
+
+    # output slots come after the registers, which are only known now
+    first_out = n_fixed + n_registers
+    code = [(op, first_out + dst, a, b) if op == "store" else (op, dst, a, b)
+            for op, dst, a, b in code]
+    return Program(code, constants, variables, n_registers, len(roots))
+
+
+def compile_tree(root: Node) -> Program:
+    """Flatten a single tree into a reusable `Program`."""
+    return compile_forest([root])
+
+
+def compile_expression(expr: str) -> Program:
+    """High‑level helper: *parse*, *optimise* then *compile* the expression."""
+    return compile_tree(optimize_tree(parse_expression(expr)))
+
+
+def compile_expressions(exprs: list[str]) -> Program:
+    """Parse *exprs*, optimise and merge them into one DAG and compile it;
+    `run` then returns one row of predictions per expression."""
+    return compile_forest(optimize_trees([parse_expression(e) for e in exprs]))
+
+
+def evaluate_chunked(expr: str, variables: dict[str, np.ndarray],
+                     chunk_rows: int = CHUNK_ROWS, dtype=np.float64) -> np.ndarray:
+    """High‑level helper: compile *expr* and run it block-wise over
+    (possibly memory-mapped) columns, see `Program.run_chunked`."""
+    return compile_expression(expr).run_chunked(variables, chunk_rows=chunk_rows, dtype=dtype)
+
+
+def evaluate_many(exprs: list[str], variables: dict[str, float]) -> np.ndarray:
+    """High‑level helper: evaluate several expressions in a single pass,
+    computing subexpressions they have in common only once."""
+    return compile_expressions(exprs).run(variables)
+
+
+# ------------------------------------------------------------
+#  6.  Quick CLI for ad‑hoc testing
 # ------------------------------------------------------------
 if __name__ == "__main__":                        # pragma: no cover
     import argparse, json
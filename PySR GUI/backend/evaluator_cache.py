@@ -0,0 +1,166 @@
+"""
+evaluator_cache.py
+
+Bounded LRU cache of compiled equation evaluators for the `/evaluate`
+route, so re-selecting or re-plotting a hall-of-fame row does not parse
+and compile the same equation again.
+
+Entries are keyed by the normalised equation string and the column
+mapping (the data headers) and are bounded both by count and by the
+bytes their scratch buffers hold.  Hit / miss / eviction counters are
+kept for the `/evaluate/cache` route.
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from evaluate_tree import parse_expression, optimize_tree, compile_tree, free_variables, CHUNK_ROWS
+
+
+def normalise_equation(expr: str) -> str:
+    """Whitespace-insensitive cache key for an equation string."""
+    return "".join(str(expr).split())
+
+
+class CompiledEquation:
+    """One equation ready to run on a data frame.
+
+    Uses the compiled tree engine when the equation parses and all its
+    variables are columns, otherwise pandas/numexpr.  Frames longer than
+    *chunk_rows* are evaluated block-wise, spread over *workers* threads,
+    so a cached entry never holds more than one block of scratch buffers.
+    """
+
+    def __init__(self, expr: str, columns: tuple[str, ...],
+                 workers: int | None = None, chunk_rows: int = CHUNK_ROWS):
+        self.expr = expr
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.program = None
+        try:
+            tree = parse_expression(expr)
+        except ValueError:
+            tree = None
+        if tree is not None and free_variables(tree) <= set(columns):
+            self.program = compile_tree(optimize_tree(tree))
+        self._lock = threading.Lock()     # the program's buffers are shared
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self.program is None else self.program.nbytes
+
+    def __call__(self, df: pd.DataFrame) -> np.ndarray:
+        if self.program is None:
+            return eval_with_numexpr(df, self.expr)
+        columns = {name: df[name].to_numpy(dtype=float) for name in self.program.variables}
+        with self._lock:
+            if len(df) > self.chunk_rows:
+                pred = self.program.run_parallel(columns, workers=self.workers,
+                                                 chunk_rows=self.chunk_rows)
+            else:
+                pred = self.program.run(columns)
+        return np.broadcast_to(np.asarray(pred, dtype=float), (len(df),))
+
+
+def eval_with_numexpr(df: pd.DataFrame, expr: str) -> np.ndarray:
+    """Evaluate an equation string on the data frame with pandas/numexpr."""
+    result = df.eval(expr,
+                    # local_dict=safe_locals,
+                    engine="numexpr")          # fast + safe
+
+    if isinstance(result, pd.Series):          # usual case
+        return result.to_numpy(dtype=float)
+
+    if isinstance(result, pd.DataFrame):       # rare: multi-column result
+        # Flatten in column order so the downstream code still sees 1-D.
+        return result.to_numpy(dtype=float).ravel(order="F")
+
+    # scalar (numpy.float64, int, etc.)
+    # Broadcast the single value across the entire time series
+    return np.full(len(df), float(result), dtype=float)
+
+
+class EvaluatorCache:
+    """LRU of `CompiledEquation`s bounded by entry count and bytes.
+
+    *workers* and *chunk_rows* are handed to every compiled equation (see
+    `Program.run_parallel`).
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 256 * 2**20,
+                 workers: int | None = None, chunk_rows: int = CHUNK_ROWS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.hits = self.misses = self.evictions = 0
+        self._entries: OrderedDict[tuple, CompiledEquation] = OrderedDict()
+        self._sizes: dict[tuple, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, expr: str, columns) -> CompiledEquation:
+        """Return the cached evaluator for (*expr*, *columns*), compiling
+        it on a miss."""
+        columns = tuple(columns)
+        key = (normalise_equation(expr), columns)
+        with self._lock:
+            evaluator = self._entries.get(key)
+            if evaluator is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return evaluator
+            self.misses += 1
+
+        evaluator = CompiledEquation(expr, columns, self.workers, self.chunk_rows)
+        with self._lock:
+            self._entries[key] = evaluator
+            self._sizes[key] = 0
+            self._evict()
+        return evaluator
+
+    def update_size(self, expr: str, columns, evaluator: CompiledEquation) -> None:
+        """Re-measure an entry after a run has (re)allocated its buffers."""
+        key = (normalise_equation(expr), tuple(columns))
+        with self._lock:
+            if self._entries.get(key) is not evaluator:
+                return
+            size = evaluator.nbytes
+            self._bytes += size - self._sizes[key]
+            self._sizes[key] = size
+            self._evict(keep=key)
+
+    def _evict(self, keep: tuple | None = None) -> None:
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            if key == keep:
+                # never drop the entry that is being used right now
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            del self._entries[key]
+            self._bytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,179 @@
+"""
+hall_of_fame.py
+
+Cheap change tracking for the files a PySR run keeps rewriting
+(`hall_of_fame.csv` and `progress.json`), used to push updates to the
+browser instead of having it re-download everything every second.
+
+* `HallOfFameFile` keeps a parsed copy of the CSV and only re-reads it when
+  the file's (mtime, size) signature changes; `diff` returns the Pareto
+  rows that are new or changed since a previous snapshot.  Every change
+  gets a version number (the file's mtime in ns, kept monotonic) and each
+  row remembers the version it last changed in, so clients can ask for
+  "rows changed since version v" and revalidate with an ETag.
+* `FileWatcher` wakes waiting streams when something under a directory
+  changes – through watchdog events if the optional *watchdog* package is
+  installed, otherwise by returning after a short poll interval.
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+try:                                    # optional, falls back to polling
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = FileSystemEventHandler = None
+
+
+def file_signature(path: str) -> tuple[int, int] | None:
+    """(mtime_ns, size) of *path*, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class HallOfFameFile:
+    """Parsed copy of a hall_of_fame.csv, re-read only when it changed."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.signature = None
+        self.rows: list[dict] = []
+        self.version = 0
+        self._snapshot: dict = {}
+        self._row_versions: dict = {}       # complexity -> version changed
+        self._removed: dict = {}            # complexity -> version removed
+        self._lock = threading.Lock()
+
+    @property
+    def etag(self) -> str:
+        return f"hof-{self.version}"
+
+    def refresh(self) -> list[dict]:
+        """Current rows (`Complexity`, `Loss`, `Equation`), re-parsing the
+        file only if its signature changed since the last call."""
+        with self._lock:
+            sig = file_signature(self.path)
+            if sig == self.signature:
+                return self.rows
+            if sig is None:
+                rows = []
+            else:
+                try:
+                    rows = pd.read_csv(self.path).to_dict(orient="records")
+                except (OSError, ValueError, pd.errors.ParserError):
+                    # caught PySR half-way through a rewrite – keep the old
+                    # copy and try again on the next change
+                    return self.rows
+            self._record_version(sig, rows)
+            self.signature, self.rows = sig, rows
+            return rows
+
+    def _record_version(self, sig, rows: list[dict]) -> None:
+        version = sig[0] if sig is not None else time.time_ns()
+        version = max(version, self.version + 1)
+        snapshot = self.snapshot(rows)
+        for complexity, value in snapshot.items():
+            if self._snapshot.get(complexity) != value:
+                self._row_versions[complexity] = version
+                self._removed.pop(complexity, None)
+        for complexity in self._snapshot.keys() - snapshot.keys():
+            self._row_versions.pop(complexity, None)
+            self._removed[complexity] = version
+        self._snapshot = snapshot
+        self.version = version
+
+    def changes_since(self, since: int) -> tuple[int, list[dict], list]:
+        """(current version, rows changed after *since*, complexities
+        removed after *since*).  ``since=0`` returns every row."""
+        self.refresh()
+        with self._lock:
+            rows = [row for row in self.rows
+                    if self._row_versions.get(row["Complexity"], 0) > since]
+            removed = [c for c, v in self._removed.items() if v > since]
+            return self.version, rows, removed
+
+    @staticmethod
+    def snapshot(rows: list[dict]) -> dict:
+        """Rows keyed by complexity, as compared by `diff`."""
+        return {row["Complexity"]: (row["Loss"], row["Equation"]) for row in rows}
+
+    @staticmethod
+    def diff(old: dict, rows: list[dict]) -> tuple[list[dict], list]:
+        """Rows of *rows* that are new or changed w.r.t. the snapshot *old*,
+        and the complexities that disappeared."""
+        new = HallOfFameFile.snapshot(rows)
+        changed = [row for row in rows if old.get(row["Complexity"]) != new[row["Complexity"]]]
+        removed = [c for c in old if c not in new]
+        return changed, removed
+
+
+def read_json(path: str) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class FileWatcher:
+    """Lets streams sleep until something under *directories*, or one of
+    *files*, changes (a file's directory is watched non-recursively)."""
+
+    def __init__(self, directories: list[str], files: list[str] = (),
+                 poll_interval: float = 0.25):
+        self.directories = directories
+        self.files = {os.path.abspath(f) for f in files}
+        self.poll_interval = poll_interval
+        self._changed = threading.Condition()
+        self._generation = 0
+        self._observer = None
+
+    def _start(self) -> None:
+        if Observer is None or self._observer is not None:
+            return
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                watcher.notify()
+
+        class _FileHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # written via a tmp file and os.replace: a move onto it
+                paths = {event.src_path, getattr(event, "dest_path", None)}
+                if not watcher.files.isdisjoint(paths):
+                    watcher.notify()
+
+        observer = Observer()
+        for directory in self.directories:
+            os.makedirs(directory, exist_ok=True)
+            observer.schedule(_Handler(), path=directory, recursive=True)
+        for directory in {os.path.dirname(f) for f in self.files}:
+            observer.schedule(_FileHandler(), path=directory, recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+
+    def notify(self) -> None:
+        with self._changed:
+            self._generation += 1
+            self._changed.notify_all()
+
+    def wait(self, timeout: float) -> None:
+        """Return after the next change, or after *timeout* seconds (after
+        `poll_interval` when watchdog is not available)."""
+        if Observer is None:
+            time.sleep(min(timeout, self.poll_interval))
+            return
+        with self._changed:
+            self._start()
+            generation = self._generation
+            self._changed.wait_for(lambda: self._generation != generation, timeout)
@@ -0,0 +1,429 @@
+"""
+jobs.py
+
+Multi-job scheduler for PySR searches.
+
+Every `/run_pysr` request becomes a `Job` with its own id, output
+directory (`<root>/<job_id>/`) and `progress.json`, so concurrent searches
+no longer overwrite each other's hall of fame.  Jobs wait in a FIFO queue
+ordered by priority (higher first, then submission order) and at most
+`max_workers` of them run at the same time; the default splits the
+machine's cores into slots of `cores_per_job`.  A monitor thread reaps
+finished jobs and starts the next queued one.
+
+The jobs of a multi-target run (`submit_group`) are one queue entry and
+start together: the group waits until it can have a slot for every job,
+or every slot if it has more jobs than there are slots, and then all of
+them run at once.  Jobs beyond the slot count run in extra processes, and
+each job of the group gets an equal share of the cores.
+
+Each job directory also gets a `job.json` (the request without its rows,
+plus a search key describing dataset, variables and operators), so
+checkpoints of earlier runs can be found again for resuming and
+warm-starting – also after a server restart.  A job answered from the run
+cache is added already finished (`add_finished`), with the cached hall of
+fame copied into its directory, so every route treats it like any other.
+
+A *prepare* callback runs for every job before it can start (e.g. to
+write the training matrix the worker memory-maps); files it lists in
+`Job.scratch_files` are deleted as soon as the job ends.  If it raises,
+it must leave nothing behind; the jobs of the group it already prepared
+end with an error, so *on_finish* still sees every prepared job.  An *on_finish*
+callback runs before a job's end is published: a worker reports its
+outcome with `report_result`, and the job only shows as done (in
+`Job.status` and its `progress.json`) once *on_finish* has recorded the
+result, e.g. in the run cache.
+
+How a job is executed is up to a *launcher*: `ProcessLauncher` forks one
+fresh process per job, `worker_pool.WarmPool` hands jobs to long-lived
+workers that already have PySR and Julia loaded.
+"""
+from __future__ import annotations
+import heapq
+import itertools
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from multiprocessing import Process
+
+from worker_pool import WarmPool
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, ERROR, STOPPED = "queued", "running", "done", "error", "stopped"
+FINISHED = (DONE, ERROR, STOPPED)
+
+
+def write_progress(path: str, status: str, message: str, **extra) -> None:
+    # the worker and the manager may both write it: one temp file each
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"status": status, "message": message, **extra}, f)
+    os.replace(tmp, path)
+
+
+def report_result(path: str, status: str, message: str, **extra) -> None:
+    """Record the outcome (DONE or ERROR) of a job from inside its worker.
+
+    The job stays RUNNING in *path* until the manager has run its
+    *on_finish* callback; then *status* and *message* are published."""
+    write_progress(path, RUNNING, "Saving results...", result=status,
+                   result_message=message, **extra)
+
+
+class Job:
+    """One PySR search: request data, files and lifecycle timestamps."""
+
+    def __init__(self, job_id: str, data: dict, priority: int, root: str,
+                 search_key: str | None = None, fingerprint: str | None = None):
+        self.job_id = job_id
+        self.data = data
+        self.priority = priority
+        self.search_key = search_key
+        self.fingerprint = fingerprint
+        self.cached_from = None
+        self.scratch_files: list[str] = []
+        self.status = QUEUED
+        self.output_dir = os.path.join(root, job_id)
+        self.progress_file = os.path.join(self.output_dir, "progress.json")
+        self.created = time.time()
+        self.started = self.finished = None
+
+    @property
+    def run_dir(self) -> str:
+        return os.path.join(self.output_dir, "hall of fame")
+
+    @property
+    def hof_file(self) -> str:
+        return os.path.join(self.run_dir, "hall_of_fame.csv")
+
+    @property
+    def meta_file(self) -> str:
+        return os.path.join(self.output_dir, "job.json")
+
+    def meta(self) -> dict:
+        """Contents of `job.json`."""
+        return {
+            "job_id": self.job_id,
+            "search_key": self.search_key,
+            "fingerprint": self.fingerprint,
+            "cached_from": self.cached_from,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "data": {k: v for k, v in self.data.items() if k != "rows"},
+        }
+
+    def save_meta(self) -> None:
+        tmp = f"{self.meta_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.meta(), f)
+        os.replace(tmp, self.meta_file)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "priority": self.priority,
+            "output_variable": self.data.get("output_variable"),
+            "group_id": self.data.get("group_id"),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "cached_from": self.cached_from,
+        }
+
+
+class ProcessLauncher:
+    """Runs every job in a fresh process (no warm-up)."""
+
+    def __init__(self, target, slots: int):
+        self.target = target
+        self.slots = slots
+        self._processes: dict[str, Process] = {}
+
+    def start(self) -> None:
+        pass
+
+    def free_slots(self) -> int:
+        return self.slots - len(self._processes)
+
+    def launch(self, job: Job) -> None:
+        process = Process(target=self.target,
+                          args=(job.data, job.output_dir, job.progress_file))
+        process.start()
+        self._processes[job.job_id] = process
+
+    def stop(self, job: Job) -> None:
+        process = self._processes.pop(job.job_id, None)
+        if process is not None:
+            process.terminate()
+            process.join()
+
+    def poll(self) -> list[tuple[str, str | None]]:
+        finished = []
+        for job_id, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del self._processes[job_id]
+            error = None if process.exitcode == 0 else \
+                f"PySR process exited with code {process.exitcode}"
+            finished.append((job_id, error))
+        return finished
+
+
+class JobManager:
+    """Bounded pool of PySR workers fed from a priority FIFO queue.
+
+    *target* is called in the worker process as
+    ``target(data, output_dir, progress_file)``.  If *warm_up* is given the
+    workers are a `WarmPool` of long-lived processes that run it once at
+    start-up; otherwise every job gets a fresh process.  *prepare* is
+    called with every job before it is queued, *on_finish* as
+    ``on_finish(job, status)`` with every job that ends (done, error or
+    stopped), before that status is published.
+    """
+
+    def __init__(self, root: str, target, max_workers: int | None = None,
+                 cores_per_job: int = 4, poll_interval: float = 0.5, warm_up=None,
+                 prepare=None, on_finish=None):
+        self.root = os.path.abspath(root)
+        self.target = target
+        self.cores_per_job = max(1, min(cores_per_job, os.cpu_count() or 1))
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 1) // self.cores_per_job)
+        self.poll_interval = poll_interval
+        self.prepare = prepare
+        self.on_finish = on_finish
+        if warm_up is not None:
+            self.launcher = WarmPool(target, self.max_workers, warm_up=warm_up)
+        else:
+            self.launcher = ProcessLauncher(target, self.max_workers)
+        self._started = False
+        self.jobs: dict[str, Job] = {}
+        self._queue: list[tuple[int, int, tuple[str, ...]]] = []
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+        self._monitor: threading.Thread | None = None
+        os.makedirs(self.root, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    #  Public API
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Start the workers (warm ones begin compiling right away) and the
+        monitor thread; `submit` does this on first use as well."""
+        with self._lock:
+            if not self._started:
+                self._started = True
+                self.launcher.start()
+            self._ensure_monitor()
+
+    def submit(self, data: dict, priority: int = 0, search_key: str | None = None,
+               fingerprint: str | None = None) -> Job:
+        return self.submit_group([(data, search_key, fingerprint)], priority)[0]
+
+    def submit_group(self, runs: list[tuple[dict, str | None, str | None]],
+                     priority: int = 0) -> list[Job]:
+        """Queue one job per ``(data, search_key, fingerprint)`` of *runs*;
+        they are admitted and started together (see module docstring)."""
+        jobs = []
+        try:
+            for data, search_key, fingerprint in runs:
+                job = Job(uuid.uuid4().hex[:12], data, int(priority), self.root,
+                          search_key, fingerprint)
+                os.makedirs(job.output_dir, exist_ok=True)
+                write_progress(job.progress_file, QUEUED, "Waiting for a free worker...")
+                if self.prepare is not None:
+                    self.prepare(job)
+                jobs.append(job)
+                job.save_meta()
+        except BaseException:
+            # the group is not queued: end the jobs prepared so far, so
+            # on_finish releases what prepare set up for them
+            with self._lock:
+                for job in jobs:
+                    try:
+                        self._finish(job, ERROR, "Submission failed")
+                    except OSError:
+                        logger.exception("Cannot end job %s", job.job_id)
+            raise
+        self.start()
+        with self._lock:
+            for job in jobs:
+                self.jobs[job.job_id] = job
+            heapq.heappush(self._queue, (-int(priority), next(self._seq),
+                                         tuple(job.job_id for job in jobs)))
+            self._dispatch()
+        return jobs
+
+    def add_finished(self, data: dict, hof_file: str, cached_from: str | None = None,
+                     search_key: str | None = None, fingerprint: str | None = None,
+                     message: str = "PySR complete!") -> Job:
+        """Record a job that is done without running, its hall of fame
+        copied from *hof_file* (a cached result of job *cached_from*)."""
+        job = Job(uuid.uuid4().hex[:12], data, 0, self.root, search_key, fingerprint)
+        job.cached_from = cached_from
+        os.makedirs(job.run_dir, exist_ok=True)
+        shutil.copyfile(hof_file, job.hof_file)
+        job.status = DONE
+        job.started = job.finished = time.time()
+        write_progress(job.progress_file, DONE, message, cached_from=cached_from)
+        job.save_meta()
+        with self._lock:
+            self.jobs[job.job_id] = job
+        return job
+
+    def workers(self) -> list[dict]:
+        with self._lock:
+            if isinstance(self.launcher, WarmPool):
+                return self.launcher.status()
+            return []
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def load_meta(self, job_id: str) -> dict | None:
+        """`job.json` of a job, also one from before a server restart."""
+        if not job_id or os.sep in job_id or job_id.startswith("."):
+            return None
+        try:
+            with open(os.path.join(self.root, job_id, "job.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def checkpoint_dir(self, job_id: str) -> str | None:
+        """Run directory of *job_id* if it holds a checkpoint.pkl."""
+        run_dir = os.path.join(self.root, job_id, "hall of fame")
+        if self.load_meta(job_id) is None or \
+                not os.path.exists(os.path.join(run_dir, "checkpoint.pkl")):
+            return None
+        return run_dir
+
+    def find_checkpoint(self, search_key: str) -> str | None:
+        """Newest earlier job with the same search key and a checkpoint."""
+        candidates = []
+        for job_id in os.listdir(self.root):
+            meta = self.load_meta(job_id)
+            if meta is not None and meta.get("search_key") == search_key \
+                    and self.checkpoint_dir(job_id) is not None:
+                candidates.append((meta.get("created", 0), job_id))
+        return max(candidates)[1] if candidates else None
+
+    def group(self, group_id: str) -> list[Job]:
+        """Jobs of one multi-target run, in submission order."""
+        with self._lock:
+            return sorted((j for j in self.jobs.values() if j.data.get("group_id") == group_id),
+                          key=lambda j: j.created)
+
+    def latest(self) -> Job | None:
+        with self._lock:
+            return max(self.jobs.values(), key=lambda j: j.created, default=None)
+
+    def list(self) -> list[Job]:
+        with self._lock:
+            return sorted(self.jobs.values(), key=lambda j: j.created)
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return sum(1 for j in self.jobs.values() if j.status == QUEUED)
+
+    def running(self) -> list[Job]:
+        with self._lock:
+            return [j for j in self.jobs.values() if j.status == RUNNING]
+
+    def cancel(self, job_id: str) -> bool:
+        """Stop a queued or running job; False if it had already finished."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            if job.status == RUNNING:
+                self.launcher.stop(job)
+            self._finish(job, STOPPED, "PySR stopped")
+            self._dispatch()
+            return True
+
+    # ------------------------------------------------------------------
+    #  Scheduling
+    # ------------------------------------------------------------------
+    def _dispatch(self) -> None:
+        """Start queued jobs (or groups) while there are enough free slots."""
+        while self._queue:
+            job_ids = self._queue[0][2]
+            jobs = [self.jobs[j] for j in job_ids if self.jobs[j].status == QUEUED]
+            if not jobs:                        # cancelled while waiting
+                heapq.heappop(self._queue)
+                continue
+            if self.launcher.free_slots() < min(len(jobs), self.max_workers):
+                return
+            heapq.heappop(self._queue)
+            # cores split between the jobs that start together, at most a slot's worth each
+            procs = max(1, min(self.cores_per_job, (os.cpu_count() or 1) // len(jobs)))
+            for job in jobs:
+                self._start(job, procs)
+
+    def _start(self, job: Job, procs: int) -> None:
+        job.data.setdefault("parameters", {}).setdefault("procs", procs)
+        write_progress(job.progress_file, RUNNING, "PySR starting...")
+        self.launcher.launch(job)
+        job.status = RUNNING
+        job.started = time.time()
+
+    def _finish(self, job: Job, status: str, message: str | None = None) -> None:
+        job.finished = time.time()
+        for path in job.scratch_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        job.scratch_files = []
+        # what on_finish records (e.g. the run cache entry) has to be in
+        # place before a client can see the job finished and resubmit; if
+        # it fails the job still ends (and the monitor thread lives on)
+        try:
+            if self.on_finish is not None:
+                self.on_finish(job, status)
+        except Exception:
+            logger.exception("on_finish failed for job %s", job.job_id)
+        finally:
+            if message is not None:
+                write_progress(job.progress_file, status, message)
+            job.status = status
+            job.save_meta()
+
+    def _reap(self) -> None:
+        with self._lock:
+            for job_id, error in self.launcher.poll():
+                job = self.jobs.get(job_id)
+                if job is None or job.status != RUNNING:
+                    continue
+                try:
+                    with open(job.progress_file) as f:
+                        progress = json.load(f)
+                except (OSError, ValueError):
+                    progress = {}
+                status = progress.get("result", progress.get("status"))
+                if status in (DONE, ERROR):
+                    self._finish(job, status, progress.get("result_message"))
+                else:
+                    self._finish(job, ERROR, error or "PySR exited without reporting a result")
+            self._dispatch()
+
+    def _ensure_monitor(self) -> None:
+        if self._monitor is not None and self._monitor.is_alive():
+            return
+
+        def monitor():
+            while True:
+                time.sleep(self.poll_interval)
+                self._reap()
+
+        self._monitor = threading.Thread(target=monitor, name="pysr-jobs", daemon=True)
+        self._monitor.start()
@@ -1,135 +1,633 @@
 # backend/app.py
-from flask import Flask, request, jsonify, send_file, current_app
+from flask import Flask, Response, request, jsonify, send_file, current_app, stream_with_context
 from flask_cors import CORS
-from multiprocessing import Process
 from pysr import PySRRegressor
-from sklearn.metrics import r2_score, mean_squared_error
 import pandas as pd
 import numpy as np
-from math import isnan
+from math import isfinite
 import os
+import re
 import json
+import hashlib
+import multiprocessing
 import shutil
+import tempfile
+import threading
+import time
+import uuid
+from evaluate_tree import (parse_expression, optimize_trees, compile_forest, free_variables,
+                           CHUNK_ROWS)
+from evaluator_cache import EvaluatorCache, eval_with_numexpr
+from metrics import MetricsCache, compute_metrics, compute_metrics_block, METRICS
+from dataset_store import DatasetStore, finite_rows, stratified_sample
+from hall_of_fame import HallOfFameFile, FileWatcher, file_signature, read_json
+from jobs import JobManager, report_result, write_progress
+from telemetry import Telemetry
+from refit import refit_constants, evaluate_dual, METHODS as REFIT_METHODS
+from dynamics import compile_system, simulate_ode, iterate_map, ensemble, state_names
+from equation_store import EquationStore, enabled_names
+from run_cache import RunCache
+from transport import (get_json, get_body, load_npz, binary_format, array_response,
+                       compress_response, EXPOSED_HEADERS, NPZ)
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=EXPOSED_HEADERS + ['ETag', 'X-HOF-Version'])
 
-current_process = None
 TEMP_DIR = os.path.abspath('./temp')
+# Single-run locations, still served until the first job is submitted
 hof_file_path = os.path.join(TEMP_DIR, 'hall of fame', 'hall_of_fame.csv')
 progress_file = os.path.abspath('progress.json')
 
-# Flask route to run PySR
+# Parsed hall-of-fame files (re-read only when they change) and a watcher
+# that wakes the /progress/stream connections
+hall_of_fame_files = {}
+file_watcher = FileWatcher([TEMP_DIR], files=[progress_file])
+
+# Uploaded datasets (memory-mapped columns), referenced by dataset_id. The
+# server sweeps the training matrices a previous run left behind; warm
+# workers import this module too and must not delete what is in use.
+dataset_store = DatasetStore(os.path.join(TEMP_DIR, 'datasets'),
+                             sweep=multiprocessing.parent_process() is None)
+DATASET_FIELDS = ('dataset_id', 'name', 'headers', 'n_rows', 'n_missing', 'n_invalid')
+
+# Above this many clean rows a search no longer fits on every row: PySR
+# mini-batches (row_sampling "batching", the default) or runs on a
+# stratified subsample of this many rows (row_sampling "subsample")
+ROW_THRESHOLD = int(os.environ.get('PYSR_ROW_THRESHOLD', 5000))
+BATCH_SIZE = int(os.environ.get('PYSR_BATCH_SIZE', 256))
+
+# Large evaluations split their rows over this many threads, in blocks of
+# this many rows (small ones stay serial, see Program.run_parallel)
+EVAL_WORKERS = int(os.environ.get('PYSR_EVAL_WORKERS', os.cpu_count() or 1))
+EVAL_CHUNK_ROWS = int(os.environ.get('PYSR_EVAL_CHUNK_ROWS', CHUNK_ROWS))
+
+# Compiled equations for /evaluate, keyed by equation and data headers
+evaluator_cache = EvaluatorCache(max_entries=256, max_bytes=256 * 2**20,
+                                 workers=EVAL_WORKERS, chunk_rows=EVAL_CHUNK_ROWS)
+
+# R²/RMSE/NRMSE per (dataset_id, output variable, equation)
+metrics_cache = MetricsCache(max_entries=4096)
+
+# Per-route and per-phase latency, byte counts and job durations for
+# /metrics (PYSR_GUI_TRACE_LOG=<file> also logs every request as JSON)
+telemetry = Telemetry(log_path=os.environ.get('PYSR_GUI_TRACE_LOG'))
+
+@app.before_request
+def start_timer():
+    telemetry.start_request()
+
+# Registered before `compress`, so it runs after it and counts the bytes sent
+@app.after_request
+def record_request(response):
+    return telemetry.finish_request(response)
+
+# Compress large responses (gzip, or zstd if installed) when the client accepts it
+@app.after_request
+def compress(response):
+    return compress_response(response, request)
+
+# Data frame for a request: a registered dataset or inline rows/headers
+def load_frame(data):
+    if data.get('dataset_id'):
+        return dataset_store.frame(data['dataset_id'])
+    return pd.DataFrame(data.get('rows', []), columns=data.get('headers', []))
+
+# Rows of df that are finite in the output and in every column one of the
+# equations reads (the names numexpr would bind, if the tree parser fails);
+# the other rows cannot be scored. Also returns the metrics cache id of
+# those rows of the dataset: its dataset_id if all rows are kept.
+def finite_frame(df, output_variable, equations, dataset_id=None):
+    used = {output_variable}
+    for equation in equations:
+        try:
+            used |= free_variables(parse_expression(equation))
+        except ValueError:
+            used |= set(re.findall(r'[A-Za-z_]\w*', equation))
+    columns = [pd.to_numeric(df[h], errors='coerce').to_numpy(dtype=float)
+               for h in df.columns if h in used]
+    keep = finite_rows(columns) if columns else np.ones(len(df), dtype=bool)
+    if keep.all():
+        return df, dataset_id
+    current_app.logger.warning("Dropping %d rows with NaN/inf", int((~keep).sum()))
+    if dataset_id:
+        dataset_id = f"{dataset_id}:{hashlib.sha256(np.packbits(keep).tobytes()).hexdigest()[:16]}"
+    return df[keep], dataset_id
+
+# Flask route to register a CSV once; later requests send its dataset_id
+@app.route('/datasets', methods=['POST'])
+def upload_dataset():
+    upload = request.files.get('file')
+    try:
+        name = upload.filename if upload is not None else request.args.get('name')
+        if request.mimetype == NPZ or (name or '').endswith('.npz'):
+            # columns as .npz (small enough to hold in memory)
+            raw = upload.read() if upload is not None else get_body(request)
+            if not raw:
+                return jsonify({'error': 'No data supplied'}), 400
+            meta = dataset_store.add_frame(pd.DataFrame(load_npz(raw), copy=False), name=name)
+        elif upload is not None:
+            with telemetry.span('ingest'):
+                meta = dataset_store.add_csv_stream(upload.stream, name=name)
+        elif request.headers.get('Content-Encoding'):
+            # gzip/zstd encoded CSV body
+            meta = dataset_store.add_csv(get_body(request), name=name)
+        else:
+            # plain CSV body, parsed in chunks as it is read
+            with telemetry.span('ingest'):
+                meta = dataset_store.add_csv_stream(request.stream, name=name)
+    except (OSError, ValueError, pd.errors.ParserError) as e:
+        return jsonify({'error': f'Cannot read dataset: {e}'}), 400
+    return jsonify({k: meta.get(k) for k in DATASET_FIELDS})
+
+@app.route('/datasets/<dataset_id>', methods=['GET'])
+def dataset_info(dataset_id):
+    try:
+        meta = dataset_store.meta(dataset_id)
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 404
+    return jsonify({k: meta.get(k) for k in DATASET_FIELDS})
+
+# Key of a search: dataset contents, variables and operator set. A saved
+# search state can only seed another search with the same key.
+def search_key(data):
+    if data.get('dataset_id'):
+        dataset = data['dataset_id']
+    else:
+        dataset = hashlib.sha256(json.dumps([data.get('headers'), data.get('rows')],
+                                            sort_keys=True).encode()).hexdigest()
+    key = {
+        'dataset': dataset,
+        'output': data.get('output_variable'),
+        'inputs': sorted(data.get('input_variables', [])),
+        'operators': sorted(enabled_names(data.get('operators'))),
+        'functions': sorted(enabled_names(data.get('functions'))),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:32]
+
+# PySRRegressor arguments of a search, apart from its output location:
+# our defaults, any batching decided for large data, then the request's
+# parameters (which overwrite both)
+def search_arguments(data, batching=None):
+    functions = enabled_names(data.get("functions", []))
+    return {
+        "binary_operators": enabled_names(data.get("operators", {})),
+        "unary_operators": functions,
+        "nested_constraints": {
+            fn: {inner: 0 for inner in functions}
+            for fn in functions
+        },
+        "verbosity": 0,
+        "maxsize": 30,
+        "niterations": 100,
+        "populations": 31,
+        "population_size": 27,
+        "ncycles_per_iteration": 380,
+        "elementwise_loss": 'L2DistLoss()',
+        "model_selection": 'best',
+        **(batching or {}),
+        **data.get("parameters", {}),
+    }
+
+# Fingerprint of a run's result: dataset contents, variable selection, row
+# handling and every PySRRegressor argument. A completed run with the same
+# fingerprint is replayed from the run cache instead of searching again.
+def run_fingerprint(data):
+    output = data.get('output_variable')
+    key = {
+        'dataset': data.get('dataset_id'),
+        'output': output,
+        'inputs': [v for v in data.get('input_variables', []) if v != output],
+        'rows': [data.get('row_threshold', ROW_THRESHOLD),
+                 data.get('row_sampling', 'batching'), BATCH_SIZE],
+        # the core count does not change the result
+        'arguments': {k: v for k, v in search_arguments(data).items() if k != 'procs'},
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+# Flask route to run PySR: queues a job and returns its id.
+#   resume_from: <job_id>  continue that job's search from its checkpoint
+#                          (its request is the default for this one)
+#   warm_start: true       seed a new run from the newest checkpoint of an
+#                          earlier run with the same dataset and operators
+#   force_rerun: true      search even if an identical run is in the run cache
+#   output_variables: [..] one search per target, run side by side on the
+#                          same stored dataset with the cores split between
+#                          them; returns a group_id and a job per target
 @app.route('/run_pysr', methods=['POST'])
 def run_pysr():
-    global current_process
-    data = request.get_json()
-    current_process = Process(target=run_pysr_task, args=(data,))
-    current_process.start()
-    return jsonify({'message': 'PySR started'})
+    with telemetry.span('decode'):
+        data = get_json(request)
+    warm_start_job = None
+    targets = data.pop('output_variables', None)
+
+    resume_id = data.pop('resume_from', None)
+    if resume_id and targets:
+        return jsonify({'error': 'Resume the jobs of a multi-target run one by one'}), 400
+    if resume_id:
+        source = job_manager.get(resume_id)
+        source_data = source.data if source else (job_manager.load_meta(resume_id) or {}).get('data')
+        if source_data is None or job_manager.checkpoint_dir(resume_id) is None:
+            return jsonify({'error': f'No checkpoint for job {resume_id!r}'}), 404
+        parameters = {**source_data.get('parameters', {}), **data.get('parameters', {})}
+        data = {**source_data, **data, 'parameters': parameters}
+        data.pop('matrix', None)        # the old job's matrix is gone with it
+        if search_key(data) != search_key(source_data):
+            return jsonify({'error': 'Cannot resume with a different dataset, variables or operators'}), 400
+        warm_start_job = resume_id
+
+    if not data.get('dataset_id') and 'rows' not in data:
+        return jsonify({'error': 'No dataset_id or rows supplied'}), 400
+    if data.get('dataset_id') and not dataset_store.exists(data['dataset_id']):
+        return jsonify({'error': f"Unknown dataset {data['dataset_id']!r}"}), 404
+    if not data.get('dataset_id'):
+        # inline rows: store them as columns once instead of keeping them
+        # in the job and rebuilding a data frame in the worker
+        with telemetry.span('ingest'):
+            meta = dataset_store.add_frame(load_frame(data))
+        data = {k: v for k, v in data.items() if k not in ('rows', 'headers')}
+        data['dataset_id'] = meta['dataset_id']
+
+    if targets:
+        # all searches read the same memory-mapped columns and are started
+        # together, each with an equal share of the cores (see jobs.py)
+        group_id = uuid.uuid4().hex[:12]
+        runs = [{**data, 'output_variable': target, 'group_id': group_id,
+                 'parameters': dict(data.get('parameters', {}))} for target in targets]
+        responses = submit_runs(runs)
+        return jsonify({'message': f'PySR started for {len(targets)} targets',
+                        'group_id': group_id, 'jobs': dict(zip(targets, responses))})
+
+    return jsonify(submit_runs([data], warm_start_job)[0])
+
+# Queue searches, or answer them from the run cache; the ones left to run
+# are submitted as one job group, so they start together. Returns the
+# /run_pysr response of each search.
+def submit_runs(runs, warm_start_job=None):
+    responses, pending = [None] * len(runs), []
+    for i, data in enumerate(runs):
+        force_rerun = data.pop('force_rerun', False)
+        key = search_key(data)
+        start_from = warm_start_job
+        if start_from is None and data.get('warm_start'):
+            start_from = job_manager.find_checkpoint(key)
+        if start_from is not None:
+            data['warm_start_from'] = job_manager.checkpoint_dir(start_from)
+
+        # Runs seeded from a checkpoint depend on it, so only fresh ones are
+        # looked up in (and later added to) the run cache
+        fingerprint = None
+        if start_from is None:
+            fingerprint = run_fingerprint(data)
+            cached = None if force_rerun else run_cache.get(fingerprint)
+            if cached is not None:
+                job = job_manager.add_finished(data, cached['hof_file'], cached_from=cached['job_id'],
+                                               search_key=key, fingerprint=fingerprint,
+                                               message='PySR complete! (cached result)')
+                responses[i] = {'message': 'PySR result from cache', 'job_id': job.job_id,
+                                'status': job.status, 'cached': True,
+                                'cached_from': cached['job_id'], 'fingerprint': fingerprint,
+                                'rows': [dict(row) for row in get_hall_of_fame(job.hof_file).refresh()]}
+                continue
+        pending.append((i, start_from, (data, key, fingerprint)))
 
-# Background function for PySR
-def run_pysr_task(data):
+    if pending:
+        with telemetry.span('submit'):
+            jobs = job_manager.submit_group([run for _, _, run in pending],
+                                            priority=runs[pending[0][0]].get('priority', 0))
+        for (i, start_from, (_, _, fingerprint)), job in zip(pending, jobs):
+            message = 'PySR started' if job.status == 'running' else 'PySR queued'
+            responses[i] = {'message': message, 'job_id': job.job_id, 'status': job.status,
+                            'warm_start_from': start_from, 'cached': False,
+                            'fingerprint': fingerprint}
+    return responses
+
+# Background function for PySR (runs in the job's own process)
+def run_pysr_task(data, output_dir=TEMP_DIR, progress_path=progress_file):
     try:
         # Update progress log text before PySR starts
-        with open('progress.json', 'w') as f:
-            json.dump({'status': 'running', 'message': 'PySR started...'}, f)
+        write_progress(progress_path, 'running', 'PySR started...')
 
         # Extract data from JSON
         output_variable = data['output_variable']
         input_variables = data['input_variables']
-        headers = data['headers']
         parameters = data.get("parameters", {})
-        operators  = data.get("operators", {})
-        functions  = data.get("functions", [])
-        rows = data['rows']
 
         # Make sure we never train on the output itself
         if output_variable in input_variables:
             input_variables = [v for v in input_variables if v != output_variable]
 
-        # Convert data rows into a pandas data frame
-        df = pd.DataFrame(rows, columns = headers)
+        matrix = data.get("matrix")
+        if matrix:
+            # Training data written by the server (see prepare_job): X is
+            # C-contiguous and memory-mapped, shared with the other targets
+            X = np.load(matrix["X"], mmap_mode="r")
+            y = np.load(matrix["y"], mmap_mode="r")
+            dropped = matrix["dropped_rows"]
+        else:
+            # Registered dataset (memory-mapped) or inline rows as a data frame
+            df = load_frame(data)
 
-        # Define output variable and input variables
-        X = df[input_variables]
-        y = df[output_variable]
+            # Keep only rows that are finite in every column used
+            used = [df[v].to_numpy(dtype=float) for v in input_variables + [output_variable]]
+            keep = finite_rows(used)
+            X = df[input_variables][keep].to_numpy(dtype=float)
+            y = df[output_variable][keep].to_numpy(dtype=float)
+            dropped = int((~keep).sum())
+        if dropped:
+            print(f"⚠️ Dropping {dropped} rows with NaN/inf")
 
-        # If last row is NaN, drop last row (occasionally happens)
-        if X.iloc[-1].isnull().any() or pd.isnull(y.iloc[-1]):
-            print("⚠️ Dropping last row due to NaN")
-            X = X.iloc[:-1]
-            y = y.iloc[:-1]
+        # Large datasets: mini-batches or a stratified subsample, unless
+        # the request set PySR's batching itself
+        threshold = int(data.get("row_threshold", ROW_THRESHOLD))
+        sampling = data.get("row_sampling", "batching")
+        batching, applied = {}, None
+        if len(y) > threshold and "batching" not in parameters:
+            if sampling == "subsample":
+                idx = stratified_sample(y, threshold)
+                X, y = X[idx], y[idx]
+                applied = sampling
+            elif sampling == "batching":
+                batching = {"batching": True, "batch_size": BATCH_SIZE}
+                applied = sampling
+        write_progress(progress_path, 'running', 'PySR started...',
+                       rows=len(y), dropped_rows=dropped, sampling=applied)
 
-        os.makedirs('./temp', exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
 
+        # Our defaults with the request's parameters merged in
         defaults = {
-            "binary_operators": operators,
-            "unary_operators": functions,
-            "nested_constraints": {
-                fn: {inner: 0 for inner in functions}
-                for fn in functions
-            },
-            "output_directory": os.path.abspath(TEMP_DIR),
+            "output_directory": os.path.abspath(output_dir),
             "run_id": "hall of fame",
-            "verbosity": 0,
-            "maxsize": 30,
-            "niterations": 100,
-            "populations": 31,
-            "population_size": 27,
-            "ncycles_per_iteration": 380,
-            "elementwise_loss": 'L2DistLoss()',
-            "model_selection": 'best'
+            **search_arguments(data, batching),
         }
 
-        # Merge in overrides (parameters keys will overwrite the above)
-        defaults.update(parameters)
-
-        # Instantiate with the merged kwargs
-        model = PySRRegressor(**defaults)
+        # Continue from a saved checkpoint (resume / warm start) or start fresh
+        if data.get("warm_start_from"):
+            model = PySRRegressor.from_file(run_directory=data["warm_start_from"])
+            model.set_params(**defaults, warm_start=True)
+            # write into this job's directory, not the one the checkpoint came from
+            model.output_directory_ = defaults["output_directory"]
+            model.run_id_ = defaults["run_id"]
+        else:
+            # Instantiate with the merged kwargs
+            model = PySRRegressor(**defaults)
 
         # Fit models
-        model.fit(X, y)
+        model.fit(X, y, variable_names=input_variables)
 
-        # Update progress log text after PySR is done
-        with open('progress.json', 'w') as f:
-            json.dump({'status': 'done', 'message': 'PySR complete!'}, f)
+        # Report the result; the server publishes "done" once it is saved
+        report_result(progress_path, 'done', 'PySR complete!')
 
     except Exception as e:
-        with open('progress.json', 'w') as f:
-            json.dump({'status': 'error', 'message': str(e)}, f)
+        write_progress(progress_path, 'error', str(e))
+
+# Warm-up for pre-started workers: a tiny fit that makes Julia compile
+# SymbolicRegression.jl and the operators the frontend offers
+def warm_up_pysr():
+    X = np.linspace(1.0, 2.0, 16).reshape(-1, 1)
+    y = 2.0 * X[:, 0] + 1.0
+    with tempfile.TemporaryDirectory() as tmp:
+        model = PySRRegressor(
+            binary_operators=["+", "-", "*", "/"],
+            unary_operators=["sin", "cos", "tan", "exp", "log"],
+            niterations=1,
+            populations=1,
+            population_size=20,
+            maxsize=7,
+            verbosity=0,
+            progress=False,
+            output_directory=tmp,
+        )
+        model.fit(X, y)
+
+# Keep PySR workers alive and pre-compiled between runs
+# (PYSR_WARM_WORKERS=0 falls back to one fresh process per run)
+WARM_WORKERS = os.environ.get('PYSR_WARM_WORKERS', '1') != '0'
+
+# Every equation of every finished run, indexed for queries across runs
+equation_store = EquationStore(os.path.join(TEMP_DIR, 'equations.sqlite'))
+
+# Hall of fame of completed runs by run fingerprint, least recently used
+# entries evicted beyond PYSR_RUN_CACHE_BYTES
+run_cache = RunCache(os.path.join(TEMP_DIR, 'run_cache'),
+                     max_bytes=int(os.environ.get('PYSR_RUN_CACHE_BYTES', 256 * 2**20)))
+
+# Write the job's training data (finite rows only) before it is queued: X
+# is shared by every job on the same inputs and rows (the targets of a
+# multi-target run) and deleted after the last of them ends, y goes next
+# to the job's output. The search process memory-maps both instead of
+# rebuilding them from the dataset.
+def prepare_job(job):
+    data = job.data
+    if not data.get('dataset_id'):
+        return
+    output_variable = data['output_variable']
+    inputs = [v for v in data.get('input_variables', []) if v != output_variable]
+    with telemetry.span('matrix'):
+        data['matrix'] = dataset_store.write_training_data(
+            data['dataset_id'], inputs, output_variable,
+            os.path.join(job.output_dir, 'y.npy'))
+    job.scratch_files.append(data['matrix']['y'])
 
-# Flask route to update progress.json
+def on_job_finish(job, status):
+    if job.data.get('matrix'):
+        dataset_store.release_matrix(job.data['matrix']['X'])
+    telemetry.observe_job(job, status)
+    equation_store.add_job({**job.meta(), 'status': status}, job.hof_file)
+    if status == 'done' and job.fingerprint:
+        run_cache.put(job.fingerprint, job.hof_file, job.job_id)
+
+# Per-job output directories, priority queue and bounded worker pool
+job_manager = JobManager(os.path.join(TEMP_DIR, 'jobs'), target=run_pysr_task,
+                         warm_up=warm_up_pysr if WARM_WORKERS else None,
+                         prepare=prepare_job, on_finish=on_job_finish)
+telemetry.gauge('pysr_gui_jobs_queued', 'PySR jobs waiting for a worker.',
+                job_manager.queue_depth)
+telemetry.gauge('pysr_gui_jobs_running', 'PySR jobs running.',
+                lambda: len(job_manager.running()))
+telemetry.gauge('pysr_gui_job_slots', 'PySR jobs that can run at once.',
+                lambda: job_manager.max_workers)
+telemetry.gauge('pysr_gui_evaluator_cache_bytes', 'Scratch memory of cached evaluators.',
+                lambda: evaluator_cache.stats()['bytes'])
+telemetry.gauge('pysr_gui_evaluator_cache_hit_ratio', 'Hit ratio of the evaluator cache.',
+                lambda: evaluator_cache.hits / max(1, evaluator_cache.hits + evaluator_cache.misses))
+
+# Hall-of-fame and progress files of a job (the latest one by default)
+def job_paths(job_id=None):
+    job = job_manager.get(job_id) if job_id else job_manager.latest()
+    if job_id and job is None:
+        raise KeyError(f"Unknown job {job_id!r}")
+    if job is None:
+        return hof_file_path, progress_file
+    return job.hof_file, job.progress_file
+
+def get_hall_of_fame(path):
+    if path not in hall_of_fame_files:
+        hall_of_fame_files[path] = HallOfFameFile(path)
+    return hall_of_fame_files[path]
+
+# Flask routes for the job list and a single job
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({
+        'jobs': [job.to_dict() for job in job_manager.list()],
+        'max_workers': job_manager.max_workers,
+        'queue_depth': job_manager.queue_depth(),
+        'workers': job_manager.workers(),
+    })
+
+# Flask route for the jobs of a multi-target run, with a combined status
+@app.route('/job_groups/<group_id>', methods=['GET'])
+def job_group(group_id):
+    jobs = job_manager.group(group_id)
+    if not jobs:
+        return jsonify({'error': f'Unknown job group {group_id!r}'}), 404
+    statuses = {job.status for job in jobs}
+    if statuses & {'queued', 'running'}:
+        status = 'running'
+    elif statuses & {'error', 'stopped'}:
+        status = 'error' if 'error' in statuses else 'stopped'
+    else:
+        status = 'done'
+    return jsonify({
+        'group_id': group_id,
+        'status': status,
+        'jobs': {job.data.get('output_variable'): {**job.to_dict(),
+                                                    'progress': read_json(job.progress_file)}
+                 for job in jobs},
+    })
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_info(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job {job_id!r}'}), 404
+    return jsonify({**job.to_dict(), 'progress': read_json(job.progress_file)})
+
+# Flask route to update progress.json (?job_id=, default latest job)
 @app.route('/progress', methods=['GET'])
 def progress():
     try:
-        with open(progress_file, 'r') as f:
-            return jsonify(json.load(f))
-    except FileNotFoundError:
-        return jsonify({'status': 'not started'})
+        _, path = job_paths(request.args.get('job_id'))
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 404
+    return jsonify(read_json(path) or {'status': 'not started'})
     
+# Server-Sent Events: pushes status transitions and only the new/changed
+# hall-of-fame rows, so the browser no longer polls /progress and
+# /models_output every second. Without ?job_id= the stream follows
+# whichever job was submitted last. The first models event of a stream,
+# and the first after it moved to a new job, has reset: true and carries
+# the whole table, which replaces what the client shows.
+@app.route('/progress/stream', methods=['GET'])
+def progress_stream():
+    job_id = request.args.get('job_id')
+    try:
+        job_paths(job_id)
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 404
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    def events():
+        status_sig, status = None, None
+        known, reset = {}, True
+        current = None
+        last_sent = time.monotonic()
+        while True:
+            sent = False
+
+            hof_path, status_path = job_paths(job_id)
+            if (hof_path, status_path) != current:
+                # a new job was submitted: start over with its files
+                current = (hof_path, status_path)
+                status_sig, known, reset = None, {}, True
+
+            sig = file_signature(status_path)
+            if sig != status_sig:
+                status_sig = sig
+                new_status = read_json(status_path) or {'status': 'not started'}
+                if new_status != status:
+                    status = new_status
+                    yield sse('status', status)
+                    sent = True
+
+            hall_of_fame = get_hall_of_fame(hof_path)
+            rows = hall_of_fame.refresh()
+            changed, removed = HallOfFameFile.diff(known, rows)
+            if changed or removed or reset:
+                known = HallOfFameFile.snapshot(rows)
+                yield sse('models', {'rows': changed, 'removed': removed, 'reset': reset,
+                                     'version': hall_of_fame.version})
+                reset, sent = False, True
+
+            # comment line every 15 s keeps proxies from closing the stream
+            if sent or time.monotonic() - last_sent >= 15:
+                if not sent:
+                    yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+            file_watcher.wait(timeout=1.0)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # Flask route to update model list
+# The parsed copy is refreshed only when the file changes. Clients can
+# revalidate with If-None-Match (304 if unchanged) and ask for
+# ?since=<version> to get only the rows changed after that version as JSON.
 @app.route('/models_output', methods=['GET'])
 def send_model_output():
-    if os.path.exists(hof_file_path):
-        return send_file(hof_file_path, mimetype='text/csv')
+    try:
+        path, _ = job_paths(request.args.get('job_id'))
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 404
+    hall_of_fame = get_hall_of_fame(path)
+    hall_of_fame.refresh()
+    if request.if_none_match.contains(hall_of_fame.etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(hall_of_fame.etag)
+        return response
+
+    since = request.args.get('since', type=int)
+    if since is not None:
+        version, rows, removed = hall_of_fame.changes_since(since)
+        response = jsonify({'version': version, 'rows': rows, 'removed': removed})
+    elif os.path.exists(path):
+        response = send_file(path, mimetype='text/csv', etag=False)
     else:
         return jsonify({'status': 'no file to send'})
+    response.set_etag(hall_of_fame.etag)
+    response.headers['X-HOF-Version'] = str(hall_of_fame.version)
+    return response
     
 @app.route('/models_output', methods=['DELETE'])
 def delete_model_output():
-    if os.path.exists(hof_file_path):
-        os.remove(hof_file_path)
+    try:
+        path, _ = job_paths(request.args.get('job_id'))
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 404
+    if os.path.exists(path):
+        os.remove(path)
         return jsonify({'status': 'deleted'}), 200
     return jsonify({'status': 'no file to delete'}), 404
     
+# JSON has no NaN/inf – send them as null
+def to_json_list(pred):
+    pred = np.asarray(pred, dtype=float)
+    return [x if isfinite(x) else None for x in pred.tolist()]
+
+def json_float(x):
+    if isinstance(x, int):
+        return x
+    return float(x) if isfinite(x) else None
+
 @app.route('/evaluate', methods=['POST'])
 def evaluate():
     try:
-        data = request.get_json(force=True)
+        with telemetry.span('decode'):
+            data = get_json(request)
         expr    = str(data.get("equation", "")).strip()
-        rows    = data.get("rows", [])
-        headers = data.get("headers", [])
         output_variable = data.get("output_variable", "").strip()
 
         current_app.logger.debug("Equation string received: %r", expr)
@@ -138,80 +636,500 @@ def evaluate():
         if not expr:
             return jsonify({"error": "No equation supplied"}), 400
 
-        df = pd.DataFrame(rows, columns=headers)
+        try:
+            with telemetry.span('load_frame'):
+                df = load_frame(data)
+        except KeyError as err:
+            return jsonify({"error": str(err)}), 404
         if df.empty:
             return jsonify({"error": "No data rows supplied"}), 400
-        if df.iloc[-1].isnull().any():
-            current_app.logger.warning("Dropping last row – it has NaNs")
-            df = df.iloc[:-1]
+        df, cache_id = finite_frame(df, output_variable, [expr], data.get("dataset_id"))
+
+        # Metrics of a registered dataset are cached; metrics_only skips the
+        # prediction entirely when they are
+        metrics = cache_id and metrics_cache.get(cache_id, output_variable, expr)
+        if metrics and data.get("metrics_only"):
+            return jsonify({k: json_float(v) for k, v in metrics.items()})
 
         try:
-            result = df.eval(expr,
-                            # local_dict=safe_locals,
-                            engine="numexpr")          # fast + safe
-            
-            if isinstance(result, pd.Series):          # usual case
-                pred = result.to_numpy(dtype=float)
+            with telemetry.span('compile'):
+                evaluator = evaluator_cache.get(expr, df.columns)
+            with telemetry.span('evaluate'):
+                pred = evaluator(df)
+            evaluator_cache.update_size(expr, df.columns, evaluator)
+        except (SyntaxError, KeyError, ValueError, ZeroDivisionError) as err:
+            current_app.logger.error(f"Expression evaluation failed: {err}")
+            return jsonify({"error": f"Cannot evaluate expression: {err}"}), 400
 
-            elif isinstance(result, pd.DataFrame):     # rare: multi-column result
-                # Flatten in column order so the downstream code still sees 1-D.
-                pred = result.to_numpy(dtype=float).ravel(order="F")
+        if not metrics:
+            with telemetry.span('metrics'):
+                y = df[output_variable].astype(float).to_numpy()
+                metrics = compute_metrics(y, pred)
+            if cache_id:
+                metrics_cache.put(cache_id, output_variable, expr, metrics)
+        metrics = {k: json_float(v) for k, v in metrics.items()}
+        if data.get("metrics_only"):
+            return jsonify(metrics)
 
-            else:                                      # scalar (numpy.float64, int, etc.)
-                # Broadcast the single value across the entire time series
-                pred = np.full(len(df), float(result), dtype=float)
+        # Binary prediction (raw float64 / npy) if the client asked for it
+        with telemetry.span('serialize'):
+            fmt = binary_format(request)
+            if fmt is not None:
+                return array_response(pred, metrics, fmt)
+            return jsonify({"prediction": to_json_list(pred), **metrics})
 
+    except Exception as e:
+        current_app.logger.exception("Evaluation failed")
+        return jsonify({"error": str(e)}), 500
 
+# Flask route to inspect the compiled-equation cache
+@app.route('/evaluate/cache', methods=['GET'])
+def evaluate_cache_stats():
+    return jsonify({**evaluator_cache.stats(), 'metrics': metrics_cache.stats()})
 
-        except (SyntaxError, KeyError, ValueError, ZeroDivisionError) as err:
-            current_app.logger.error(f"Expression evaluation failed: {err}")
-            return jsonify({"error": f"Cannot evaluate expression: {err}"}), 400
+@app.route('/evaluate/cache', methods=['DELETE'])
+def evaluate_cache_clear():
+    evaluator_cache.clear()
+    metrics_cache.clear()
+    return jsonify({'status': 'cleared'})
+
+# Equations to score: from the request, or the job's hall of fame rows
+def score_candidates(data):
+    hof_path, _ = job_paths(data.get("job_id"))
+    if data.get("equations") is not None:
+        return [{"Equation": str(eq)} for eq in data["equations"]]
+    if os.path.exists(hof_path):
+        return [dict(row) for row in get_hall_of_fame(hof_path).refresh()]
+    return None
 
-        pred = np.asarray(pred, dtype=float)
-        pred = np.where(np.isfinite(pred), pred, None).tolist()
+# Predictions and metrics of every candidate on the data frame.
+# All equations the tree engine can parse are optimised and merged into one
+# DAG (constants folded, shared subexpressions computed once; results may
+# differ from one-by-one evaluation in the last bit) and evaluated in a single pass; the
+# rest fall back to numexpr one by one. With a dataset_id (the cache id
+# from finite_frame), equations whose metrics are cached are only evaluated
+# if their predictions are wanted.
+def score_equations(df, output_variable, candidates, dataset_id=None, predictions=True):
+    columns = {h: pd.to_numeric(df[h], errors="coerce").to_numpy(dtype=float)
+               for h in df.columns}
+    y = columns[output_variable]
 
-        y = df[output_variable].astype(float).to_numpy()
+    metrics = [None] * len(candidates)
+    if dataset_id:
+        metrics = [metrics_cache.get(dataset_id, output_variable, str(c["Equation"]))
+                   for c in candidates]
+    todo = [i for i in range(len(candidates)) if predictions or metrics[i] is None]
 
-        # R²
-        r2   = float(r2_score(y, pred))
-        # RMSE
-        rmse = float(np.sqrt(mean_squared_error(y, pred)))
-        # normalized RMSE (by y range)
-        y_range = float(np.nanmax(y) - np.nanmin(y))
-        nrmse   = float(rmse / y_range) if y_range != 0 else float("nan")
+    # Native engine for every equation it can parse and bind
+    preds = [None] * len(candidates)
+    errors = [None] * len(candidates)
+    native_idx, trees = [], []
+    with telemetry.span('parse'):
+        for i in todo:
+            try:
+                tree = parse_expression(str(candidates[i]["Equation"]))
+            except ValueError:
+                continue
+            if free_variables(tree) <= columns.keys():
+                native_idx.append(i)
+                trees.append(tree)
+    if trees:
+        with telemetry.span('compile'):
+            program = compile_forest(optimize_trees(trees))
+        with telemetry.span('evaluate'):
+            block = program.run_parallel(columns, workers=EVAL_WORKERS,
+                                         chunk_rows=EVAL_CHUNK_ROWS)
+        if len(trees) == 1:                 # a single output is not stacked
+            block = [block]
+        for i, pred in zip(native_idx, block):
+            preds[i] = np.broadcast_to(pred, y.shape)
+
+    # numexpr fallback for the rest
+    for i in todo:
+        if preds[i] is not None:
+            continue
+        try:
+            with telemetry.span('evaluate_numexpr'):
+                preds[i] = np.broadcast_to(
+                    eval_with_numexpr(df, str(candidates[i]["Equation"])), y.shape)
+        except Exception as err:
+            errors[i] = f"Cannot evaluate expression: {err}"
+
+    # Metrics of everything evaluated, in one pass over the block
+    fresh = [i for i in todo if preds[i] is not None and metrics[i] is None]
+    if fresh:
+        with telemetry.span('metrics'):
+            block = compute_metrics_block(y, np.stack([preds[i] for i in fresh]))
+        for j, i in enumerate(fresh):
+            metrics[i] = {k: v[j].item() for k, v in block.items()}
+            if dataset_id:
+                metrics_cache.put(dataset_id, output_variable,
+                                  str(candidates[i]["Equation"]), metrics[i])
+    return preds, metrics, errors
+
+# Flask route to score every hall-of-fame equation in one request
+@app.route('/evaluate_all', methods=['POST'])
+def evaluate_all():
+    try:
+        with telemetry.span('decode'):
+            data = get_json(request)
+        output_variable = data.get("output_variable", "").strip()
+        include_prediction = bool(data.get("include_prediction", True))
+
+        # Equations come from the request or from the job's hall of fame
+        try:
+            candidates = score_candidates(data)
+        except KeyError as err:
+            return jsonify({"error": str(err)}), 404
+        if candidates is None:
+            return jsonify({"error": "No equations supplied and no hall of fame"}), 400
+
+        try:
+            with telemetry.span('load_frame'):
+                df = load_frame(data)
+        except KeyError as err:
+            return jsonify({"error": str(err)}), 404
+        if df.empty:
+            return jsonify({"error": "No data rows supplied"}), 400
+        df, cache_id = finite_frame(df, output_variable,
+                                    [str(cand["Equation"]) for cand in candidates],
+                                    data.get("dataset_id"))
+
+        preds, metrics, errors = score_equations(
+            df, output_variable, candidates, cache_id, include_prediction)
+
+        with telemetry.span('serialize'):
+            fmt = binary_format(request)
+            results = []
+            for cand, pred, m, err in zip(candidates, preds, metrics, errors):
+                entry = {k.lower(): v for k, v in cand.items()}
+                if err is not None:
+                    entry["error"] = err
+                else:
+                    entry.update({k: json_float(v) for k, v in m.items()})
+                    if include_prediction and fmt is None:
+                        entry["prediction"] = to_json_list(pred)
+                results.append(entry)
+
+            # Binary: one row of predictions per candidate (NaN where it failed)
+            if include_prediction and fmt is not None:
+                block = np.full((len(candidates), len(df)), np.nan)
+                for i, pred in enumerate(preds):
+                    if pred is not None:
+                        block[i] = pred
+                return array_response(block, {"results": results}, fmt)
+
+            return jsonify({"results": results})
+
+    except Exception as e:
+        current_app.logger.exception("Batch evaluation failed")
+        return jsonify({"error": str(e)}), 500
+
+# Flask route with the metrics of every hall-of-fame row of a job on a
+# registered dataset (?dataset_id=&output_variable=[&job_id=][&sort=r2]).
+# Cached metrics are reused, so re-sorting the models table is free.
+@app.route('/models_output/metrics', methods=['GET'])
+def model_output_metrics():
+    dataset_id = request.args.get('dataset_id')
+    output_variable = request.args.get('output_variable', '').strip()
+    sort = request.args.get('sort')
+    if sort is not None and sort not in METRICS:
+        return jsonify({'error': f'Cannot sort by {sort!r}'}), 400
+    try:
+        candidates = score_candidates({'job_id': request.args.get('job_id')})
+        df = dataset_store.frame(dataset_id)
+    except KeyError as err:
+        return jsonify({'error': str(err)}), 404
+    if candidates is None:
+        return jsonify({'rows': []})
+    if output_variable not in df.columns:
+        return jsonify({'error': f'Unknown output variable {output_variable!r}'}), 400
+
+    df, cache_id = finite_frame(df, output_variable,
+                                [str(cand['Equation']) for cand in candidates], dataset_id)
+    _, metrics, errors = score_equations(df, output_variable, candidates,
+                                         cache_id, predictions=False)
+    rows = []
+    for cand, m, err in zip(candidates, metrics, errors):
+        row = dict(cand)
+        if err is not None:
+            row['error'] = err
+        else:
+            row.update({k: json_float(v) for k, v in m.items()})
+        rows.append(row)
+    if sort is not None:
+        # best first: highest R², lowest (N)RMSE; failures last
+        sign = -1 if sort == 'r2' else 1
+        rows.sort(key=lambda r: (r.get(sort) is None, sign * (r.get(sort) or 0)))
+    return jsonify({'rows': rows})
+
+# Flask route to re-fit the constants of one equation to a dataset without a
+# new search (Levenberg–Marquardt or BFGS on forward-mode derivatives)
+@app.route('/refit', methods=['POST'])
+def refit():
+    try:
+        with telemetry.span('decode'):
+            data = get_json(request)
+        expr = str(data.get("equation", "")).strip()
+        output_variable = data.get("output_variable", "").strip()
+        method = data.get("method", "lm")
+        if not expr:
+            return jsonify({"error": "No equation supplied"}), 400
+        if method not in REFIT_METHODS:
+            return jsonify({"error": f"Unknown method {method!r}"}), 400
+
+        try:
+            with telemetry.span('load_frame'):
+                df = load_frame(data)
+        except KeyError as err:
+            return jsonify({"error": str(err)}), 404
+        if df.empty:
+            return jsonify({"error": "No data rows supplied"}), 400
+        if output_variable not in df.columns:
+            return jsonify({"error": f"Unknown output variable {output_variable!r}"}), 400
+
+        try:
+            with telemetry.span('parse'):
+                tree = parse_expression(expr)
+            columns = {h: pd.to_numeric(df[h], errors="coerce").to_numpy(dtype=float)
+                       for h in df.columns}
+            y = columns[output_variable]
+            with telemetry.span('refit'):
+                fit = refit_constants(tree, columns, y, method=method,
+                                      max_iter=int(data.get("max_iter", 100)))
+            with telemetry.span('metrics'):
+                pred, _ = evaluate_dual(fit["tree"], columns)
+                metrics = compute_metrics(y, pred)
+        except (KeyError, ValueError) as err:
+            return jsonify({"error": f"Cannot refit expression: {err}"}), 400
 
-        pred_list = [
-            None if (isnan(x) or x is None) else float(x)
-            for x in pred
-        ]
-        
         return jsonify({
-            "prediction": pred_list,
-            "r2":   r2,
-            "rmse": rmse,
-            "nrmse": nrmse
+            "equation": str(fit.pop("tree")),
+            **{k: json_float(v) if isinstance(v, float) else v for k, v in fit.items()},
+            **{k: json_float(v) for k, v in metrics.items()},
         })
 
     except Exception as e:
-        current_app.logger.exception("Evaluation failed")
+        current_app.logger.exception("Refit failed")
         return jsonify({"error": str(e)}), 500
 
-# Flask route to stop running PySR
-@app.route('/stop', methods=['POST'])
-def stop():
-    global current_process
+def to_json_array(arr):
+    arr = np.asarray(arr, dtype=float)
+    return np.where(np.isfinite(arr), arr, None).tolist()
+
+# Flask route to integrate discovered ODE equations (one per derivative) from
+# an ensemble of initial conditions around the first recorded state, and
+# report when the rollouts diverge from the recorded series
+@app.route('/simulate', methods=['POST'])
+def simulate():
+    try:
+        with telemetry.span('decode'):
+            data = get_json(request)
+        equations = data.get("equations") or {}
+        state = data.get("state") or state_names(equations)
+        time_column = data.get("time_column", "time")
+        if not equations:
+            return jsonify({"error": "No equations supplied"}), 400
+
+        try:
+            with telemetry.span('load_frame'):
+                df = load_frame(data)
+        except KeyError as err:
+            return jsonify({"error": str(err)}), 404
+        missing = [c for c in list(state) + [time_column] if c not in df.columns]
+        if missing:
+            return jsonify({"error": f"Unknown columns {missing}"}), 400
+        if data.get("steps"):
+            df = df.iloc[:int(data["steps"]) + 1]
+        if len(df) < 2:
+            return jsonify({"error": "Need at least two time points"}), 400
+
+        try:
+            with telemetry.span('compile'):
+                program = compile_system(equations, state, time_name=data.get("time_variable"))
+        except (KeyError, ValueError) as err:
+            return jsonify({"error": f"Cannot compile equations: {err}"}), 400
+
+        reference = df[state].to_numpy(dtype=float)
+        times = df[time_column].to_numpy(dtype=float)
+        scale = np.nanstd(reference, axis=0)
+        ics = ensemble(reference[0], int(data.get("n_ics", 100)),
+                       float(data.get("spread", 1e-3)), scale, int(data.get("seed", 0)))
+        with telemetry.span('simulate'):
+            result = simulate_ode(program, state, ics, times, reference=reference, scale=scale,
+                                  tolerance=float(data.get("tolerance", 0.5)),
+                                  substeps=int(data.get("substeps", 1)),
+                                  time_name=data.get("time_variable"),
+                                  record=bool(data.get("include_trajectories")))
+
+        with telemetry.span('serialize'):
+            trajectories = result.pop("trajectories", None)
+            fmt = binary_format(request)
+            if trajectories is not None and fmt is not None:
+                # steps × n_ics × state; the per-step curves stay out of the metadata
+                meta = {k: v for k, v in result.items() if k not in ("time", "error")}
+                return array_response(trajectories, {"state": state, **meta}, fmt)
+            response = {"state": state, **result,
+                        "time": result["time"].tolist(), "error": to_json_array(result["error"])}
+            if trajectories is not None:
+                response["trajectories"] = to_json_array(trajectories)
+            return jsonify(response)
+
+    except Exception as e:
+        current_app.logger.exception("Simulation failed")
+        return jsonify({"error": str(e)}), 500
+
+# Flask route to iterate a discovered discrete map (one equation per next-step
+# column, e.g. x_tt and y_tt of the Henon data) from an ensemble of initial
+# conditions in lockstep; reports divergence from the recorded orbit and how
+# well the iterates cover the recorded attractor
+@app.route('/iterate', methods=['POST'])
+def iterate():
+    try:
+        with telemetry.span('decode'):
+            data = get_json(request)
+        equations = data.get("equations") or {}
+        state = data.get("state") or state_names(equations)
+        if not equations:
+            return jsonify({"error": "No equations supplied"}), 400
+
+        try:
+            with telemetry.span('load_frame'):
+                df = load_frame(data)
+        except KeyError as err:
+            return jsonify({"error": str(err)}), 404
+        missing = [c for c in state if c not in df.columns]
+        if missing:
+            return jsonify({"error": f"Unknown columns {missing}"}), 400
+        if df.empty:
+            return jsonify({"error": "No data rows supplied"}), 400
+
+        try:
+            with telemetry.span('compile'):
+                program = compile_system(equations, state)
+        except (KeyError, ValueError) as err:
+            return jsonify({"error": f"Cannot compile equations: {err}"}), 400
 
-    # If there’s a live PySR process, terminate it
-    if current_process is not None and current_process.is_alive():
+        reference = df[state].to_numpy(dtype=float)
+        scale = np.nanstd(reference, axis=0)
+        ics = ensemble(reference[0], int(data.get("n_ics", 1000)),
+                       float(data.get("spread", 1e-3)), scale, int(data.get("seed", 0)))
+        with telemetry.span('simulate'):
+            result = iterate_map(program, state, ics, int(data.get("steps", len(df) - 1)),
+                                 reference=reference, scale=scale,
+                                 tolerance=float(data.get("tolerance", 0.5)),
+                                 burn_in=int(data.get("burn_in", 100)),
+                                 bins=int(data.get("bins", 64)),
+                                 record=bool(data.get("include_trajectories")))
 
-        # os.remove(hof_file_path)
+        with telemetry.span('serialize'):
+            trajectories = result.pop("trajectories", None)
+            fmt = binary_format(request)
+            if trajectories is not None and fmt is not None:
+                # steps × n_ics × state; the per-step curves stay out of the metadata
+                meta = {k: v for k, v in result.items() if k not in ("step", "error")}
+                return array_response(trajectories, {"state": state, **meta}, fmt)
+            response = {"state": state, **result,
+                        "step": result["step"].tolist(), "error": to_json_array(result["error"])}
+            if trajectories is not None:
+                response["trajectories"] = to_json_array(trajectories)
+            return jsonify(response)
+
+    except Exception as e:
+        current_app.logger.exception("Map iteration failed")
+        return jsonify({"error": str(e)}), 500
+
+# Flask routes to query the equation store across runs. Filters (query
+# string): dataset_id, output_variable, operators_key, job_id, max_complexity
+def equation_filters(args):
+    max_complexity = args.get('max_complexity')
+    return {
+        'dataset_id': args.get('dataset_id'),
+        'target': args.get('output_variable'),
+        'operators_key': args.get('operators_key'),
+        'max_complexity': int(max_complexity) if max_complexity else None,
+    }
+
+@app.route('/equations', methods=['GET'])
+def list_equations():
+    try:
+        filters = equation_filters(request.args)
+        limit = request.args.get('limit')
+        rows = equation_store.equations(run_id=request.args.get('job_id'),
+                                        order=request.args.get('order', 'loss'),
+                                        limit=int(limit) if limit else None, **filters)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    return jsonify({'rows': rows})
+
+# Cross-run Pareto front and best equation of one dataset and target
+@app.route('/equations/pareto', methods=['GET'])
+def equation_pareto():
+    try:
+        filters = equation_filters(request.args)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    if not filters['dataset_id'] or not filters['target']:
+        return jsonify({'error': 'dataset_id and output_variable are required'}), 400
+    return jsonify({'rows': equation_store.pareto(**filters)})
+
+@app.route('/equations/best', methods=['GET'])
+def equation_best():
+    try:
+        filters = equation_filters(request.args)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    if not filters['dataset_id'] or not filters['target']:
+        return jsonify({'error': 'dataset_id and output_variable are required'}), 400
+    best = equation_store.best(**filters)
+    if best is None:
+        return jsonify({'error': 'No stored equations for this dataset and target'}), 404
+    return jsonify(best)
+
+@app.route('/equations/runs', methods=['GET'])
+def equation_runs():
+    return jsonify({'runs': equation_store.runs(request.args.get('dataset_id'),
+                                                request.args.get('output_variable')),
+                    **equation_store.stats()})
+
+# Flask routes to inspect and clear the run cache (all of it, or one entry)
+@app.route('/run_cache', methods=['GET'])
+def run_cache_info():
+    return jsonify({**run_cache.stats(), 'entries': run_cache.entries()})
+
+@app.route('/run_cache', methods=['DELETE'])
+def run_cache_clear():
+    run_cache.clear()
+    return jsonify({'status': 'cleared'})
+
+@app.route('/run_cache/<fingerprint>', methods=['DELETE'])
+def run_cache_delete(fingerprint):
+    try:
+        deleted = run_cache.delete(fingerprint)
+    except KeyError as err:
+        return jsonify({'error': str(err)}), 400
+    if not deleted:
+        return jsonify({'error': f'No cached run {fingerprint!r}'}), 404
+    return jsonify({'status': 'deleted', 'fingerprint': fingerprint})
+
+# Prometheus scrape endpoint (text exposition format)
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(telemetry.render(), mimetype='text/plain; version=0.0.4')
+
+# Flask route to stop running PySR (the latest job, or /stop/<job_id>)
+@app.route('/stop', methods=['POST'])
+@app.route('/stop/<job_id>', methods=['POST'])
+def stop(job_id=None):
+    job = job_manager.get(job_id) if job_id else job_manager.latest()
+    if job_id and job is None:
+        return jsonify({'error': f'Unknown job {job_id!r}'}), 404
 
-        current_process.terminate()
-        current_process.join()
-        current_process = None
+    # If the job is queued or running, cancel it
+    if job is not None and job_manager.cancel(job.job_id):
 
         # Return to frontend
-        return jsonify({'status': 'stopped', 'message': 'PySR stopped'})
+        return jsonify({'status': 'stopped', 'message': 'PySR stopped', 'job_id': job.job_id})
 
     # No process was running
     return jsonify({
@@ -220,4 +1138,11 @@ def stop():
     }), 200
 
 if __name__ == '__main__':
+    # Warm the PySR workers before the first request. The debug reloader
+    # runs this file twice; only the process that serves requests starts them.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_manager.start()
+        # runs finished before the equation store existed
+        threading.Thread(target=equation_store.backfill, args=(job_manager.root,),
+                         daemon=True).start()
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,111 @@
+"""
+metrics.py
+
+Accuracy metrics of equation predictions and a cache of them.
+
+`compute_metrics` scores one prediction, `compute_metrics_block` a whole
+(k equations × n rows) block in the same vectorized pass.  Rows where the
+target is not finite are ignored; a prediction that is not finite on any
+other row makes SS_res infinite, so (like PySR's loss) such an equation
+scores worst instead of being judged on the rows where it happens to work.
+Reported are
+
+    r2      1 - SS_res / SS_tot
+    rmse    sqrt(SS_res / n)
+    nrmse   rmse / (max(y) - min(y))
+    n_rows  n, the number of rows scored
+
+Registered datasets never change (their id is the hash of their content),
+so `MetricsCache` keeps the result per (dataset_id, output variable,
+equation) and the bulk `/models_output/metrics` route can score a whole
+hall of fame without evaluating equations it has seen before.
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from evaluator_cache import normalise_equation
+
+METRICS = ("r2", "rmse", "nrmse")
+FIELDS = METRICS + ("n_rows",)
+
+
+def compute_metrics(y, pred) -> dict:
+    """R², RMSE, NRMSE (NaN where undefined) and rows scored of one
+    prediction."""
+    y = np.asarray(y, dtype=float)
+    pred = np.broadcast_to(np.asarray(pred, dtype=float), y.shape)
+    return {k: v[0].item() for k, v in compute_metrics_block(y, pred[None, :]).items()}
+
+
+def compute_metrics_block(y, preds) -> dict[str, np.ndarray]:
+    """Metrics of every row of *preds* (k × n) against *y* (n,), as arrays
+    of length k."""
+    y = np.asarray(y, dtype=float)
+    preds = np.asarray(preds, dtype=float)
+    ok = np.isfinite(y)
+    if not ok.all():
+        y, preds = y[ok], preds[:, ok]
+    k, n = preds.shape
+    failed = ~np.isfinite(preds).all(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        resid = np.where(failed[:, None], 0.0, preds - y[None, :])
+        ss_res = np.einsum("ij,ij->i", resid, resid)
+        ss_res[failed] = np.inf
+        dev = y - y.mean() if n else y
+        ss_tot = float(dev @ dev)
+        y_range = float(y.max() - y.min()) if n else 0.0
+
+        rmse = np.sqrt(ss_res / n) if n else np.full(k, np.nan)
+        r2 = 1.0 - ss_res / ss_tot if ss_tot != 0 else np.full(k, np.nan)
+        nrmse = rmse / y_range if y_range != 0 else np.full(k, np.nan)
+    return {"r2": r2, "rmse": rmse, "nrmse": nrmse, "n_rows": np.full(k, n)}
+
+
+class MetricsCache:
+    """LRU of metric dicts keyed by (dataset_id, output variable, equation)."""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(dataset_id: str, output_variable: str, expr: str) -> tuple:
+        return (dataset_id, output_variable, normalise_equation(expr))
+
+    def get(self, dataset_id: str, output_variable: str, expr: str) -> dict | None:
+        key = self.key(dataset_id, output_variable, expr)
+        with self._lock:
+            metrics = self._entries.get(key)
+            if metrics is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(metrics)
+
+    def put(self, dataset_id: str, output_variable: str, expr: str, metrics: dict) -> None:
+        key = self.key(dataset_id, output_variable, expr)
+        with self._lock:
+            self._entries[key] = {k: metrics[k] for k in FIELDS if k in metrics}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,323 @@
+"""
+refit.py
+
+Re-fitting the constants of a discovered equation without a new search.
+
+`evaluate_dual` evaluates an expression tree in forward mode: next to the
+value of every node it carries the derivatives of that value with respect
+to each constant of the tree (dual numbers, vectorised over the rows), so
+one pass gives the prediction and its full Jacobian.  Values come from the
+same kernels as `evaluate_tree`, so PySR's safe-operator semantics (NaN
+outside an operator's domain, plain IEEE division) are unchanged.
+
+`refit_constants` uses that Jacobian to minimise the mean squared error –
+PySR's default loss – over the constants with Levenberg–Marquardt
+(``method="lm"``, the default) or BFGS (``method="bfgs"``), starting from
+the constants the search found.  Equations of a hall of fame have a
+handful of constants, so a refit takes milliseconds:
+
+    fit = refit_constants(parse_expression("2.0 * x + 1.0"), {"x": x}, y)
+    fit["constants"], fit["loss"], str(fit["tree"])
+"""
+from __future__ import annotations
+import math
+
+import numpy as np
+
+from evaluate_tree import Node, _apply, _postorder, _is_constant
+
+METHODS = ("lm", "bfgs")
+
+
+# ------------------------------------------------------------
+#  1.  Constants of a tree
+# ------------------------------------------------------------
+def constant_nodes(root: Node) -> list[Node]:
+    """Constant leaves of *root*, children first – the order of the
+    parameter vector of `evaluate_dual` and `with_constants`."""
+    return [node for node in _postorder([root]) if _is_constant(node)]
+
+
+def with_constants(root: Node, values) -> Node:
+    """Copy of *root* with its constants (see `constant_nodes`) replaced
+    by *values*."""
+    replace = {id(node): float(v) for node, v in zip(constant_nodes(root), values)}
+    copies: dict[int, Node] = {}
+    for node in _postorder([root]):
+        if id(node) in replace:
+            copies[id(node)] = Node(replace[id(node)])
+        else:
+            copies[id(node)] = Node(node.value,
+                                    copies[id(node.left)] if node.left is not None else None,
+                                    copies[id(node.right)] if node.right is not None else None)
+    return copies[id(root)]
+
+
+# ------------------------------------------------------------
+#  2.  Local derivatives: op -> (d out/d a, d out/d b)
+# ------------------------------------------------------------
+# `a`, `b` are the operand values and `out` the operator's result.  Where
+# an operator is flat or not differentiable (sign, floor, sqrt at 0) the
+# derivative is 0, as in PySR's own optimiser.
+
+def _d_div(a, b, out):
+    return 1.0 / b, -out / b
+
+
+def _d_pow(a, b, out):
+    with np.errstate(all="ignore"):
+        da = b * np.power(a, b - 1.0)
+        db = np.where(a > 0, out * np.log(np.where(a > 0, a, 1.0)), 0.0)
+    return da, db
+
+
+def _d_sqrt(a, b, out):
+    return np.where(a > 0, 0.5 / np.where(out > 0, out, 1.0), 0.0), None
+
+
+def _d_inv(a, b, out):
+    return -out * out, None
+
+
+_ZERO = lambda a, b, out: (np.zeros_like(out), None)         # noqa: E731
+
+_DERIVATIVES = {
+    "+": lambda a, b, out: (1.0, 1.0),
+    "-": lambda a, b, out: (1.0, -1.0),
+    "*": lambda a, b, out: (b, a),
+    "/": _d_div,
+    "^": _d_pow,
+    "max": lambda a, b, out: ((a >= b) * 1.0, (a < b) * 1.0),
+    "min": lambda a, b, out: ((a <= b) * 1.0, (a > b) * 1.0),
+    "mod": lambda a, b, out: (1.0, -np.floor(np.divide(a, b))),
+    "neg": lambda a, b, out: (-1.0, None),
+    "square": lambda a, b, out: (2.0 * a, None),
+    "cube": lambda a, b, out: (3.0 * a * a, None),
+    "sqrt": _d_sqrt,
+    "abs": lambda a, b, out: (np.sign(a), None),
+    "sign": _ZERO,
+    "inv": _d_inv,
+    "relu": lambda a, b, out: ((a > 0) * 1.0, None),
+    "exp": lambda a, b, out: (out, None),
+    "log": lambda a, b, out: (1.0 / a, None),
+    "log2": lambda a, b, out: (1.0 / (a * math.log(2.0)), None),
+    "log10": lambda a, b, out: (1.0 / (a * math.log(10.0)), None),
+    "log1p": lambda a, b, out: (1.0 / (1.0 + a), None),
+    "sin": lambda a, b, out: (np.cos(a), None),
+    "cos": lambda a, b, out: (-np.sin(a), None),
+    "tan": lambda a, b, out: (1.0 + out * out, None),
+    "asin": lambda a, b, out: (1.0 / np.sqrt(1.0 - a * a), None),
+    "acos": lambda a, b, out: (-1.0 / np.sqrt(1.0 - a * a), None),
+    "atan": lambda a, b, out: (1.0 / (1.0 + a * a), None),
+    "sinh": lambda a, b, out: (np.cosh(a), None),
+    "cosh": lambda a, b, out: (np.sinh(a), None),
+    "tanh": lambda a, b, out: (1.0 - out * out, None),
+    "asinh": lambda a, b, out: (1.0 / np.sqrt(a * a + 1.0), None),
+    "acosh": lambda a, b, out: (1.0 / np.sqrt(a * a - 1.0), None),
+    "atanh": lambda a, b, out: (1.0 / (1.0 - a * a), None),
+    "atanh_clip": lambda a, b, out: (np.cosh(out) ** 2, None),
+    "floor": _ZERO,
+    "ceil": _ZERO,
+    "round": _ZERO,
+}
+
+
+# ------------------------------------------------------------
+#  3.  Forward-mode evaluation
+# ------------------------------------------------------------
+def _chain(partial, tangent):
+    """partial (rows) × tangent (params × rows); None is a zero tangent."""
+    if tangent is None or partial is None:
+        return None
+    return partial * tangent
+
+
+def evaluate_dual(root: Node, variables: dict, params=None) -> tuple[np.ndarray, np.ndarray]:
+    """Value of *root* and its derivatives w.r.t. its constants.
+
+    *params* replaces the constants (in `constant_nodes` order; default:
+    the values in the tree).  Returns ``(value, jacobian)`` with *value*
+    broadcast to the rows of *variables* and *jacobian* of shape
+    ``(n_constants, *rows)``.
+    """
+    consts = constant_nodes(root)
+    params = np.array([n.value for n in consts] if params is None else params, dtype=float)
+    if len(params) != len(consts):
+        raise ValueError(f"Expected {len(consts)} constants, got {len(params)}")
+    index = {id(node): i for i, node in enumerate(consts)}
+    columns = {k: np.asarray(v, dtype=float) for k, v in variables.items()}
+
+    values: dict[int, np.ndarray] = {}
+    tangents: dict[int, np.ndarray | None] = {}
+    for node in _postorder([root]):
+        key = id(node)
+        if key in index:                        # constant: d c_i / d c = e_i
+            i = index[key]
+            values[key] = params[i]
+            tangent = np.zeros((len(params),))
+            tangent[i] = 1.0
+            tangents[key] = tangent
+            continue
+        if node.left is None and node.right is None:
+            if node.value not in columns:
+                raise KeyError(f"Variable {node.value!r} not provided")
+            values[key], tangents[key] = columns[node.value], None
+            continue
+        if node.value not in _DERIVATIVES:
+            raise ValueError(f"Unknown node {node.value!r}")
+
+        a = values[id(node.left)]
+        b = values[id(node.right)] if node.right is not None else None
+        out = _apply(node.value, a, b)
+        with np.errstate(all="ignore"):
+            da, db = _DERIVATIVES[node.value](a, b, out)
+            ta = _chain(da, _expand(tangents[id(node.left)], np.ndim(out)))
+            tb = None if b is None else _chain(db, _expand(tangents[id(node.right)], np.ndim(out)))
+        values[key] = out
+        tangents[key] = ta if tb is None else tb if ta is None else ta + tb
+
+    shape = np.broadcast_shapes(*(np.shape(v) for v in values.values()))
+    value = np.broadcast_to(values[id(root)], shape)
+    tangent = tangents[id(root)]
+    if tangent is None:
+        jacobian = np.zeros((len(params),) + shape)
+    else:
+        jacobian = np.broadcast_to(_expand(tangent, len(shape)), (len(params),) + shape)
+    return value, jacobian
+
+
+def _expand(tangent, ndim: int):
+    """(params, *shape) tangent with trailing axes for broadcasting against
+    a value of *ndim* dimensions."""
+    if tangent is None:
+        return None
+    missing = ndim - (tangent.ndim - 1)
+    return tangent.reshape(tangent.shape + (1,) * missing) if missing > 0 else tangent
+
+
+# ------------------------------------------------------------
+#  4.  Least-squares refit
+# ------------------------------------------------------------
+def refit_constants(root: Node, variables: dict, y, method: str = "lm",
+                    max_iter: int = 100, tol: float = 1e-10) -> dict:
+    """Minimise the mean squared error of *root* against *y* over its
+    constants, starting from their current values.
+
+    Rows where *y* or the initial prediction is not finite are ignored; a
+    step that makes any remaining prediction non-finite is rejected.
+    Returns the fitted ``constants``, the refitted ``tree``, ``loss`` and
+    ``initial_loss`` (MSE), the ``iterations`` taken and whether the
+    optimiser ``converged``.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r} (expected one of {', '.join(METHODS)})")
+    y = np.asarray(y, dtype=float)
+    start = np.array([n.value for n in constant_nodes(root)], dtype=float)
+
+    value, _ = evaluate_dual(root, variables, start)
+    rows = np.isfinite(y) & np.isfinite(np.broadcast_to(value, y.shape))
+    if not rows.any():
+        raise ValueError("No rows where the equation and the target are finite")
+    target = y[rows]
+
+    def residuals(params):
+        value, jacobian = evaluate_dual(root, variables, params)
+        r = np.broadcast_to(value, y.shape)[rows] - target
+        return r, np.broadcast_to(jacobian, (len(params),) + y.shape)[:, rows]
+
+    def loss(r):
+        return float(r @ r) / len(r) if np.isfinite(r).all() else math.inf
+
+    r, jac = residuals(start)
+    initial = loss(r)
+    if len(start) == 0:
+        params, final, iterations, converged = start, initial, 0, True
+    elif method == "lm":
+        params, final, iterations, converged = _levenberg_marquardt(
+            residuals, loss, start, r, jac, max_iter, tol)
+    else:
+        params, final, iterations, converged = _bfgs(
+            residuals, loss, start, r, jac, max_iter, tol)
+
+    return {
+        "constants": params.tolist(),
+        "initial_constants": start.tolist(),
+        "tree": with_constants(root, params),
+        "loss": final,
+        "initial_loss": initial,
+        "iterations": iterations,
+        "converged": converged,
+        "rows": int(rows.sum()),
+    }
+
+
+def _levenberg_marquardt(residuals, loss, params, r, jac, max_iter, tol):
+    current, damping = loss(r), 1e-3
+    for iteration in range(1, max_iter + 1):
+        jtj = jac @ jac.T
+        jtr = jac @ r
+        if not np.isfinite(jtj).all() or not np.isfinite(jtr).all():
+            return params, current, iteration, False
+        scale = np.diag(jtj).copy()
+        scale[scale <= 0] = 1.0
+        while True:
+            try:
+                step = np.linalg.solve(jtj + damping * np.diag(scale), -jtr)
+            except np.linalg.LinAlgError:
+                step = None
+            if step is not None:
+                trial = params + step
+                r_new, jac_new = residuals(trial)
+                new = loss(r_new)
+                if new <= current:
+                    break
+            damping *= 10.0
+            if damping > 1e16:                  # no step lowers the loss
+                return params, current, iteration, True
+        improvement = current - new
+        params, r, jac, current = trial, r_new, jac_new, new
+        damping = max(damping / 10.0, 1e-12)
+        if improvement <= tol * max(current, tol) or \
+                np.abs(step).max() <= tol * (1.0 + np.abs(params).max()):
+            return params, current, iteration, True
+    return params, current, max_iter, False
+
+
+def _bfgs(residuals, loss, params, r, jac, max_iter, tol):
+    n = len(r)
+    current = loss(r)
+    grad = 2.0 / n * (jac @ r)
+    inverse = np.eye(len(params))
+    for iteration in range(1, max_iter + 1):
+        if not np.isfinite(grad).all():
+            return params, current, iteration, False
+        if np.abs(grad).max() <= tol * (1.0 + current):
+            return params, current, iteration, True
+        direction = -inverse @ grad
+        if direction @ grad >= 0:               # not a descent direction: reset
+            inverse = np.eye(len(params))
+            direction = -grad
+        # backtracking line search (Armijo)
+        step = 1.0
+        while True:
+            trial = params + step * direction
+            r_new, jac_new = residuals(trial)
+            new = loss(r_new)
+            if new <= current + 1e-4 * step * (direction @ grad):
+                break
+            step *= 0.5
+            if step < 1e-12:
+                return params, current, iteration, True
+        grad_new = 2.0 / n * (jac_new @ r_new)
+        s, g = trial - params, grad_new - grad
+        sg = s @ g
+        if sg > 1e-16:
+            rho = 1.0 / sg
+            eye = np.eye(len(params))
+            inverse = (eye - rho * np.outer(s, g)) @ inverse @ (eye - rho * np.outer(g, s)) \
+                + rho * np.outer(s, s)
+        improvement = current - new
+        params, grad, current = trial, grad_new, new
+        if improvement <= tol * max(current, tol):
+            return params, current, iteration, True
+    return params, current, max_iter, False
@@ -0,0 +1,136 @@
+"""
+run_cache.py
+
+Results of completed PySR runs, keyed by a fingerprint of everything that
+determines them (dataset contents, variable selection and every
+`PySRRegressor` argument – see `main.run_fingerprint`).
+
+When a run finishes its hall of fame is copied to
+``<root>/<fingerprint>/hall_of_fame.csv`` next to an ``entry.json``
+(source job, creation and last-use time, size).  A request with the same
+fingerprint is answered from here instead of searching again.  The cache
+is bounded by the bytes it holds: the least recently used entries are
+removed first.
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+_FINGERPRINT = re.compile(r"^[0-9a-f]{16,64}$")
+
+
+class RunCache:
+    """Directory of cached hall-of-fame files (see module docstring)."""
+
+    def __init__(self, root: str, max_bytes: int = 256 * 2**20):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, fingerprint: str) -> str:
+        if not _FINGERPRINT.match(fingerprint or ""):
+            raise KeyError(f"Invalid fingerprint {fingerprint!r}")
+        return os.path.join(self.root, fingerprint)
+
+    @staticmethod
+    def _read_entry(path: str) -> dict | None:
+        try:
+            with open(os.path.join(path, "entry.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_entry(path: str, entry: dict) -> None:
+        tmp = os.path.join(path, "entry.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, os.path.join(path, "entry.json"))
+
+    def get(self, fingerprint: str) -> dict | None:
+        """Entry of *fingerprint* (with its ``hof_file``), or None."""
+        path = self._dir(fingerprint)
+        with self._lock:
+            entry = self._read_entry(path)
+            hof_file = os.path.join(path, "hall_of_fame.csv")
+            if entry is None or not os.path.exists(hof_file):
+                self.misses += 1
+                return None
+            entry["last_used"] = time.time()
+            self._write_entry(path, entry)
+            self.hits += 1
+        return {**entry, "hof_file": hof_file}
+
+    def put(self, fingerprint: str, hof_file: str, job_id: str | None = None) -> dict | None:
+        """Cache the hall of fame *hof_file* of a completed run (replacing
+        an older entry) and evict old entries beyond the size limit."""
+        path = self._dir(fingerprint)
+        if not os.path.exists(hof_file):
+            return None
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            tmp = os.path.join(path, "hall_of_fame.csv.tmp")
+            shutil.copyfile(hof_file, tmp)
+            os.replace(tmp, os.path.join(path, "hall_of_fame.csv"))
+            now = time.time()
+            entry = {
+                "fingerprint": fingerprint,
+                "job_id": job_id,
+                "created": now,
+                "last_used": now,
+                "bytes": os.path.getsize(os.path.join(path, "hall_of_fame.csv")),
+            }
+            self._write_entry(path, entry)
+            self._evict(keep=fingerprint)
+        return entry
+
+    def entries(self) -> list[dict]:
+        """All entries, most recently used first."""
+        entries = []
+        for name in os.listdir(self.root):
+            entry = self._read_entry(os.path.join(self.root, name))
+            if entry is not None:
+                entries.append(entry)
+        return sorted(entries, key=lambda e: e.get("last_used", 0), reverse=True)
+
+    def _evict(self, keep: str | None = None) -> None:
+        entries = self.entries()
+        total = sum(e.get("bytes", 0) for e in entries)
+        for entry in reversed(entries):                 # least recently used first
+            if total <= self.max_bytes:
+                break
+            if entry["fingerprint"] == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, entry["fingerprint"]), ignore_errors=True)
+            total -= entry.get("bytes", 0)
+            self.evictions += 1
+
+    def delete(self, fingerprint: str) -> bool:
+        path = self._dir(fingerprint)
+        with self._lock:
+            if not os.path.isdir(path):
+                return False
+            shutil.rmtree(path, ignore_errors=True)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            for name in os.listdir(self.root):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(e.get("bytes", 0) for e in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,213 @@
+"""
+telemetry.py
+
+Latency instrumentation for the Flask backend, exported in the Prometheus
+text format by the `/metrics` route.
+
+* Every request is timed as a whole and per phase: code wraps its phases
+  in ``with telemetry.span("evaluate"):`` and the time lands in a
+  histogram labelled with the route and the phase (JSON decoding, frame
+  construction, parsing, compiling, evaluation, serialization, …).
+* Request and response bodies are counted in bytes per route.
+* PySR jobs report their queue wait and run time when they finish; gauges
+  such as the queue depth are read from callbacks when `/metrics` is
+  scraped.
+* If a log path is given, every request is also written to it as one JSON
+  line with its phases, status and byte counts.
+
+No third-party client library is needed; histograms use fixed buckets.
+"""
+from __future__ import annotations
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# Latency buckets in seconds (upper bounds, +Inf is implicit)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, *values) -> None:
+        self._values[values] = self._values.get(values, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, values)} {total:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series: dict[tuple, list] = {}    # values -> [counts..., sum, count]
+
+    def observe(self, value: float, *values) -> None:
+        series = self._series.get(values)
+        if series is None:
+            series = self._series[values] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        for values, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(names, values + (f'{bound:g}',))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(names, values + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {series[-2]:.6g}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value read from *fn* at scrape time."""
+
+    def __init__(self, name: str, help: str, fn):
+        self.name, self.help, self.fn = name, help, fn
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {float(self.fn()):g}"]
+
+
+class Telemetry:
+    """Request/phase/job metrics of the app (see module docstring)."""
+
+    def __init__(self, prefix: str = "pysr_gui", log_path: str | None = None):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self.requests = Counter(f"{prefix}_requests_total", "Requests served.",
+                                ("route", "method", "status"))
+        self.request_seconds = Histogram(f"{prefix}_request_seconds",
+                                         "Time to produce the response.", ("route",))
+        self.phase_seconds = Histogram(f"{prefix}_phase_seconds",
+                                       "Time spent per phase of a request.", ("route", "phase"))
+        self.request_bytes = Counter(f"{prefix}_request_bytes_total",
+                                     "Request body bytes received.", ("route",))
+        self.response_bytes = Counter(f"{prefix}_response_bytes_total",
+                                      "Response body bytes sent (after compression).", ("route",))
+        self.job_wait_seconds = Histogram(f"{prefix}_job_wait_seconds",
+                                          "Time PySR jobs spent queued.", (), JOB_BUCKETS)
+        self.job_run_seconds = Histogram(f"{prefix}_job_run_seconds",
+                                         "Run time of finished PySR jobs.", ("status",), JOB_BUCKETS)
+        self.gauges: list[Gauge] = []
+
+    def gauge(self, name: str, help: str, fn) -> None:
+        self.gauges.append(Gauge(name, help, fn))
+
+    # ------------------------------------------------------------------
+    #  Requests
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _route() -> str:
+        return request.endpoint or "unmatched"
+
+    def start_request(self) -> None:
+        g.telemetry_start = time.perf_counter()
+        g.telemetry_phases = []
+
+    @contextmanager
+    def span(self, phase: str):
+        """Time the enclosed block as *phase* of the current request."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            if has_request_context():
+                g.setdefault("telemetry_phases", []).append((phase, elapsed))
+                with self._lock:
+                    self.phase_seconds.observe(elapsed, self._route(), phase)
+
+    def finish_request(self, response):
+        start = g.get("telemetry_start")
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = self._route()
+        phases = {}
+        for phase, seconds in g.get("telemetry_phases", []):
+            phases[phase] = phases.get(phase, 0.0) + seconds
+        received = request.content_length or 0
+        sent = None if response.is_streamed else response.calculate_content_length()
+        with self._lock:
+            self.requests.inc(1, route, request.method, response.status_code)
+            self.request_seconds.observe(elapsed, route)
+            self.request_bytes.inc(received, route)
+            if sent is not None:
+                self.response_bytes.inc(sent, route)
+        self._log({
+            "event": "request",
+            "route": route,
+            "method": request.method,
+            "status": response.status_code,
+            "seconds": round(elapsed, 6),
+            "request_bytes": received,
+            "response_bytes": sent,
+            "phases": {phase: round(seconds, 6) for phase, seconds in phases.items()},
+        })
+        return response
+
+    # ------------------------------------------------------------------
+    #  Jobs
+    # ------------------------------------------------------------------
+    def observe_job(self, job, status: str) -> None:
+        """Record a `jobs.Job` that ended with *status* (wait and run time)."""
+        with self._lock:
+            if job.started is not None:
+                self.job_wait_seconds.observe(job.started - job.created)
+                self.job_run_seconds.observe(job.finished - job.started, status)
+        self._log({
+            "event": "job",
+            "job_id": job.job_id,
+            "status": status,
+            "wait_seconds": None if job.started is None else round(job.started - job.created, 3),
+            "run_seconds": None if job.started is None else round(job.finished - job.started, 3),
+        })
+
+    # ------------------------------------------------------------------
+    #  Export
+    # ------------------------------------------------------------------
+    def _log(self, record: dict) -> None:
+        if not self.log_path:
+            return
+        line = json.dumps({"ts": time.time(), **record})
+        with self._lock, open(self.log_path, "a") as f:
+            f.write(line + "\n")
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.request_seconds, self.phase_seconds,
+                           self.request_bytes, self.response_bytes,
+                           self.job_wait_seconds, self.job_run_seconds):
+                lines += metric.render()
+        for gauge in self.gauges:
+            lines += gauge.render()
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,167 @@
+"""
+Shared fixtures of the backend tests.
+
+The backend modules are imported from the directory above.  `server`
+imports `main` once per session inside a scratch working directory (its
+`temp/` and `progress.json` end up there) with one fresh process per
+job.  Jobs never start a real search: `FakeRegressor` stands in for
+`PySRRegressor` (and for the whole `pysr` package when it is not
+installed), since a real search takes minutes.
+"""
+from __future__ import annotations
+import importlib.util
+import json
+import os
+import pickle
+import sys
+import time
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO = os.path.dirname(os.path.dirname(BACKEND))
+sys.path.insert(0, BACKEND)
+
+# Hall of fame of a real search on `n` (the Hick/Hyman/Merkel data sets)
+STORED_HOF = os.path.join(BACKEND, "temp", "hall of fame", "hall_of_fame.csv")
+
+
+class FakeRegressor:
+    """Stand-in for `pysr.PySRRegressor`.
+
+    `fit` writes a fixed hall of fame in the first variable (and a
+    checkpoint) where PySR would, plus a `fit.json` that describes the
+    data it was given.  `fit_seconds` keeps the "search" running a while.
+    """
+    fit_seconds = 0.0
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.warm_start_from = None
+
+    @classmethod
+    def from_file(cls, run_directory):
+        with open(os.path.join(run_directory, "checkpoint.pkl"), "rb") as f:
+            model = pickle.load(f)
+        model.warm_start_from = run_directory
+        return model
+
+    def set_params(self, **kwargs):
+        self.kwargs.update(kwargs)
+        return self
+
+    def fit(self, X, y, variable_names=None):
+        out = getattr(self, "output_directory_", self.kwargs["output_directory"])
+        run_id = getattr(self, "run_id_", self.kwargs["run_id"])
+        run_dir = os.path.join(out, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        time.sleep(self.fit_seconds)
+        x = (variable_names or ["x0"])[0]
+        with open(os.path.join(run_dir, "hall_of_fame.csv"), "w") as f:
+            f.write("Complexity,Loss,Equation\n")
+            f.write(f'1,4.0,"{x}"\n3,0.25,"{x} * 2.0"\n5,0.0,"({x} * 2.0) + 1.0"\n')
+        base = X
+        while isinstance(base, np.ndarray) and base.base is not None:
+            base = base.base
+        with open(os.path.join(run_dir, "fit.json"), "w") as f:
+            json.dump({
+                "shape": list(np.shape(X)),
+                "c_contiguous": bool(getattr(X, "flags", None) and X.flags.c_contiguous),
+                "memory_mapped": isinstance(base, np.memmap) or type(base).__name__ == "mmap",
+                "variable_names": variable_names,
+                "procs": self.kwargs.get("procs"),
+                "batch_size": self.kwargs.get("batch_size") if self.kwargs.get("batching") else None,
+                "warm_start_from": self.warm_start_from,
+                "y": np.asarray(y, dtype=float).tolist(),
+            }, f)
+        self.output_directory_, self.run_id_ = out, run_id
+        with open(os.path.join(run_dir, "checkpoint.pkl"), "wb") as f:
+            pickle.dump(self, f)
+        return self
+
+
+@pytest.fixture
+def data_path():
+    """Path of a file in the repository's `data/` folder."""
+    return lambda name: os.path.join(REPO, "data", name)
+
+
+@pytest.fixture
+def hick(data_path):
+    """The Hick (1952) reaction-time data (columns n, RT)."""
+    return pd.read_csv(data_path("Hick_1952.csv"), encoding="utf-8-sig")
+
+
+@pytest.fixture
+def stored_hof():
+    return pd.read_csv(STORED_HOF)
+
+
+@pytest.fixture
+def wait_until():
+    """Poll *predicate* until it holds (or fail after *timeout* seconds)."""
+    def wait(predicate, timeout=20.0, interval=0.05):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return
+            time.sleep(interval)
+        raise AssertionError("condition not met in time")
+    return wait
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    """The `main` module, imported in a scratch working directory."""
+    workdir = tmp_path_factory.mktemp("server")
+    os.environ["PYSR_WARM_WORKERS"] = "0"
+    if importlib.util.find_spec("pysr") is None:
+        sys.modules["pysr"] = types.SimpleNamespace(PySRRegressor=FakeRegressor)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import main
+    finally:
+        os.chdir(cwd)
+    main.PySRRegressor = FakeRegressor
+    return main
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.fixture
+def upload(client):
+    """Register a dataset ({column: values}) through /datasets; returns its id."""
+    def upload(columns):
+        frame = pd.DataFrame(columns)
+        response = client.post("/datasets", data=frame.to_csv(index=False).encode(),
+                               content_type="text/csv")
+        return response.get_json()["dataset_id"]
+    return upload
+
+
+@pytest.fixture
+def finished(client, wait_until):
+    """Wait for a job to end; returns its /jobs/<id> entry."""
+    def finished(job_id, timeout=20.0):
+        wait_until(lambda: client.get(f"/jobs/{job_id}").get_json()["status"]
+                   in ("done", "error", "stopped"), timeout)
+        return client.get(f"/jobs/{job_id}").get_json()
+    return finished
+
+
+def fit_info(server, job_id):
+    """What `FakeRegressor.fit` was given in a job (its fit.json)."""
+    with open(os.path.join(server.job_manager.get(job_id).run_dir, "fit.json")) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def fit_of(server):
+    return lambda job_id: fit_info(server, job_id)
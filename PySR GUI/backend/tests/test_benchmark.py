@@ -0,0 +1,56 @@
+"""Benchmark harness of the expression evaluators."""
+import numpy as np
+import pandas as pd
+
+from conftest import STORED_HOF
+from benchmark import (ENGINES, bind, equation_variables, load_datasets, load_equations,
+                       regressions, run_benchmarks)
+from evaluate_tree import compile_expression
+
+
+def test_equation_variables_and_binding():
+    assert equation_variables("sqrt(n * 1.5e-3) + log(n) - x1") == ["n", "x1"]
+    # every function the evaluator knows, not only the common ones
+    assert equation_variables("relu(floor(x) + round(y)) * atanh_clip(asinh(x))") == ["x", "y"]
+    columns = {"a": [1.0], "b": [2.0]}
+    # unknown names take the columns in order of their position
+    assert bind(["b", "x", "y"], columns) == {"b": [2.0], "x": [2.0], "y": [1.0]}
+
+
+def test_every_engine_runs_the_stored_hall_of_fame(data_path):
+    equations = load_equations([STORED_HOF])
+    assert [e["complexity"] for e in equations] == sorted(e["complexity"] for e in equations)
+    datasets = [d for d in load_datasets(data_path(""), [100]) if d[0] == "synthetic-100"]
+    results = run_benchmarks(list(ENGINES), equations, datasets, repeat=1, budget_s=0.1)
+    assert len(results) == len(ENGINES) * len(equations)
+    for case in results:
+        if case["engine"] != "numexpr":
+            assert "error" not in case, case
+            assert case["rows"] == 100 and case["rows_per_s"] > 0
+
+
+def test_regressions_against_a_baseline():
+    case = {"engine": "tree", "dataset": "d", "rows": 10, "equation": "x"}
+    baseline = [{**case, "rows_per_s": 100.0}]
+    assert regressions([{**case, "rows_per_s": 80.0}], baseline, 0.25) == []
+    (slower,) = regressions([{**case, "rows_per_s": 50.0}], baseline, 0.25)
+    assert slower["ratio"] == 0.5 and slower["baseline_rows_per_s"] == 100.0
+
+
+def test_engines_agree(stored_hof, hick):
+    columns = {"n": np.tile(hick["n"].to_numpy(dtype=float), 50)}
+    frame = pd.DataFrame(columns)
+    for equation in stored_hof["Equation"]:
+        expected = np.broadcast_to(ENGINES["tree"](equation)[2](columns, frame),
+                                   columns["n"].shape)
+        for engine in ("compiled", "chunked", "parallel", "optimized"):
+            np.testing.assert_allclose(ENGINES[engine](equation)[2](columns, frame), expected,
+                                       rtol=4e-16, err_msg=f"{engine}: {equation}")
+
+
+def test_run_parallel_matches_run(hick):
+    program = compile_expression("sqrt(n) * log(n + 1.0) - n / 3.0")
+    n = np.tile(hick["n"].to_numpy(dtype=float), 1000)
+    np.testing.assert_array_equal(
+        program.run_parallel({"n": n}, workers=3, chunk_rows=100, min_rows=0),
+        program.run({"n": n}))
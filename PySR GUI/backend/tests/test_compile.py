@@ -0,0 +1,68 @@
+"""Compiled postfix programs against the tree walker."""
+import numpy as np
+import pytest
+
+from evaluate_tree import (compile_expression, compile_tree, evaluate_expression,
+                           evaluate_tree, parse_expression)
+
+
+def test_program_matches_evaluate_tree_on_stored_hall_of_fame(stored_hof, hick):
+    n = hick["n"].to_numpy(dtype=float)
+    for equation in stored_hof["Equation"]:
+        tree = parse_expression(equation)
+        expected = np.broadcast_to(evaluate_tree(tree, {"n": n}), n.shape)
+        np.testing.assert_array_equal(compile_tree(tree).run({"n": n}), expected,
+                                      err_msg=equation)
+
+
+def test_scalar_inputs_give_a_float():
+    result = compile_expression("sqrt(x) + y/2").run({"x": 9, "y": 4})
+    assert isinstance(result, float)
+    assert result == evaluate_expression("sqrt(x) + y/2", {"x": 9, "y": 4}) == 5.0
+
+
+def test_buffers_are_reused_between_runs():
+    program = compile_tree(parse_expression("(x * 2.0 + y) * (x - y) + sin(x)"))
+    x, y = np.linspace(0, 1, 100), np.linspace(1, 2, 100)
+    first = program.run({"x": x, "y": y}).copy()
+    workspace = program._workspace
+    np.testing.assert_array_equal(program.run({"x": x, "y": y}), first)
+    assert program._workspace is workspace
+    program.run({"x": x[:10], "y": y[:10]})           # new row count: new buffers
+    assert program._workspace is not workspace
+
+
+def test_registers_are_recycled():
+    # a left-leaning chain needs one register however long it is
+    program = compile_tree(parse_expression("((((x + 1.0) * 2.0) - 3.0) / 4.0) + x"))
+    assert program.n_registers == 1
+
+
+def test_writes_into_out():
+    x = np.arange(5.0)
+    out = np.empty(5)
+    result = compile_expression("x * x + 1.0").run({"x": x}, out=out)
+    assert result is out
+    np.testing.assert_array_equal(out, x * x + 1.0)
+
+
+def test_missing_variable():
+    with pytest.raises(KeyError):
+        compile_expression("x + y").run({"x": 1.0})
+
+
+@pytest.mark.parametrize("equation, x, expected", [
+    ("sqrt(x)", [-4.0, 0.0, 4.0], [np.nan, 0.0, 2.0]),
+    ("1.0 / x", [-2.0, 0.0, 1e-12], [-0.5, np.inf, 1e12]),
+    ("x / 0.0", [1.0, -1.0, 0.0], [np.inf, -np.inf, np.nan]),
+    ("inv(x)", [0.0, 4.0, 1e-12], [np.inf, 0.25, 1e12]),
+    ("log(x)", [-1.0, 0.0, 1.0], [np.nan, np.nan, 0.0]),
+    ("x ^ 0.5", [-4.0, 4.0, 0.0], [np.nan, 2.0, 0.0]),
+    ("round(x)", [0.5, 1.5, -2.5], [0.0, 2.0, -2.0]),
+])
+def test_pysr_operator_semantics(equation, x, expected):
+    # same results as PySR's safe operators, in both engines
+    x = np.array(x)
+    tree = parse_expression(equation)
+    np.testing.assert_array_equal(evaluate_tree(tree, {"x": x}), expected)
+    np.testing.assert_array_equal(compile_tree(tree).run({"x": x}), expected)
@@ -0,0 +1,161 @@
+"""Upload-once dataset store with memory-mapped columns."""
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from dataset_store import DatasetStore, clean_headers, finite_rows, stratified_sample
+
+CSV = b"x,y\n1,3\n2,5\n3,7\n"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DatasetStore(str(tmp_path / "datasets"))
+
+
+def test_columns_are_read_only_memory_maps(store):
+    meta = store.add_csv(CSV, name="line.csv")
+    assert meta["headers"] == ["x", "y"] and meta["n_rows"] == 3
+    cols = store.columns(meta["dataset_id"])
+    assert isinstance(cols["x"], np.memmap) and not cols["x"].flags.writeable
+    np.testing.assert_array_equal(cols["y"], [3.0, 5.0, 7.0])
+    assert list(store.frame(meta["dataset_id"], ["y"]).columns) == ["y"]
+
+
+def test_same_upload_is_stored_once(store):
+    first = store.add_csv(CSV)
+    assert store.add_csv(CSV)["dataset_id"] == first["dataset_id"]
+    # a second dataset that shares column x reuses its file
+    other = store.add_csv(b"x,z\n1,0\n2,0\n3,0\n")
+    assert other["columns"]["x"] == first["columns"]["x"]
+    assert len(os.listdir(store.column_dir)) == 3
+
+
+def test_headerless_csv():
+    assert clean_headers(["1", "2.5", "-3"]) == ["v1", "v2", "v3"]
+    assert clean_headers([" a ", "1"]) == ["a", "1"]
+
+
+def test_unknown_and_invalid_ids(store):
+    assert not store.exists("../etc")
+    with pytest.raises(KeyError):
+        store.meta("0" * 32)
+    with pytest.raises(KeyError):
+        store.columns(store.add_csv(CSV)["dataset_id"], ["nope"])
+
+
+def test_upload_route_and_evaluate_by_id(client):
+    response = client.post("/datasets?name=line.csv", data=CSV, content_type="text/csv")
+    meta = response.get_json()
+    assert meta["headers"] == ["x", "y"] and meta["n_rows"] == 3
+    assert client.get(f"/datasets/{meta['dataset_id']}").get_json() == meta
+    result = client.post("/evaluate", json={"dataset_id": meta["dataset_id"],
+                                            "equation": "(x * 2.0) + 1.0",
+                                            "output_variable": "y"}).get_json()
+    assert result["prediction"] == [3.0, 5.0, 7.0] and result["r2"] == 1.0
+    assert client.get("/datasets/" + "0" * 32).status_code == 404
+
+
+def test_stream_is_parsed_in_chunks(store, monkeypatch):
+    monkeypatch.setattr("dataset_store.CHUNK_ROWS", 2)
+    raw = b"x,y\n" + b"".join(b"%d,%s\n" % (i, b"" if i == 1 else b"abc" if i == 3 else b"1")
+                              for i in range(5))
+    meta = store.add_csv(raw)
+    assert meta["n_rows"] == 5
+    assert meta["n_missing"] == {"x": 0, "y": 1} and meta["n_invalid"] == {"x": 0, "y": 1}
+    y = store.columns(meta["dataset_id"])["y"]
+    np.testing.assert_array_equal(np.isnan(y), [False, True, False, True, False])
+
+
+def test_finite_rows_and_stratified_sample():
+    mask = finite_rows([np.array([1.0, np.nan, 3.0, 4.0]), np.array([1.0, 2.0, np.inf, 4.0])])
+    assert mask.tolist() == [True, False, False, True]
+    y = np.random.default_rng(1).permutation(1000).astype(float)
+    idx = stratified_sample(y, 10)
+    assert len(idx) == 10 and (np.diff(idx) > 0).all()
+    # one row from each tenth of the range of y
+    assert sorted(y[idx] // 100) == list(range(10))
+    np.testing.assert_array_equal(stratified_sample(y[:5], 10), np.arange(5))
+
+
+def test_targets_share_one_training_matrix(store, tmp_path, monkeypatch):
+    monkeypatch.setattr("dataset_store.CHUNK_ROWS", 2)
+    meta = store.add_csv(b"a,b,u,v\n1,2,3,4\n5,6,,8\n9,10,11,12\n13,,15,16\n17,18,19,20\n")
+    u = store.write_training_data(meta["dataset_id"], ["a", "b"], "u", str(tmp_path / "u.npy"))
+    v = store.write_training_data(meta["dataset_id"], ["a", "b"], "v", str(tmp_path / "v.npy"))
+    # u drops row 1 as well: same columns, other rows, another file
+    assert u["X"] != v["X"] and (u["dropped_rows"], v["dropped_rows"]) == (2, 1)
+    again = store.write_training_data(meta["dataset_id"], ["a", "b"], "v", str(tmp_path / "w.npy"))
+    assert again["X"] == v["X"] and len(os.listdir(store.matrix_dir)) == 2
+    X = np.load(v["X"], mmap_mode="r")
+    assert isinstance(X, np.memmap) and X.flags.c_contiguous
+    np.testing.assert_array_equal(X, [[1, 2], [5, 6], [9, 10], [17, 18]])
+    np.testing.assert_array_equal(np.load(v["y"]), [4, 8, 12, 20])
+    np.testing.assert_array_equal(np.load(u["y"]), [3, 11, 19])
+    del X
+    store.release_matrix(v["X"])
+    assert os.path.exists(v["X"])
+    store.release_matrix(again["X"])
+    store.release_matrix(u["X"])
+    assert os.listdir(store.matrix_dir) == []
+
+
+def test_training_matrix_is_written_once_outside_the_lock(store, tmp_path, monkeypatch):
+    meta = store.add_csv(CSV)
+    other = store.add_csv(b"z\n1\n")
+    started, release = threading.Event(), threading.Event()
+    writes = []
+    write_rows = DatasetStore._write_rows
+
+    def slow_write(cols, keep, path):
+        writes.append(path)
+        started.set()
+        release.wait(5)
+        write_rows(cols, keep, path)
+
+    monkeypatch.setattr(DatasetStore, "_write_rows", staticmethod(slow_write))
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(store.write_training_data(
+        meta["dataset_id"], ["x"], "y", str(tmp_path / f"y{i}.npy")))) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+    # reads of the store go on while the matrix is written
+    read = []
+    reader = threading.Thread(target=lambda: read.append(store.columns(other["dataset_id"])))
+    reader.start()
+    reader.join(2)
+    assert read and read[0]["z"].tolist() == [1.0]
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(writes) == 1 and results[0]["X"] == results[1]["X"]
+    np.testing.assert_array_equal(np.load(results[0]["X"]), [[1.0], [2.0], [3.0]])
+
+
+def test_training_matrix_is_released_on_failure_and_swept(store, tmp_path):
+    meta = store.add_csv(CSV)
+    with pytest.raises(OSError):
+        store.write_training_data(meta["dataset_id"], ["x"], "y", str(tmp_path / "no" / "y.npy"))
+    assert os.listdir(store.matrix_dir) == []
+    # the users of X files are only known in memory: a new store sweeps them
+    store.write_training_data(meta["dataset_id"], ["x"], "y", str(tmp_path / "y.npy"))
+    assert len(os.listdir(DatasetStore(store.root, sweep=False).matrix_dir)) == 1
+    assert os.listdir(DatasetStore(store.root).matrix_dir) == []
+
+
+@pytest.mark.parametrize("sampling, rows, batch_size", [
+    ("subsample", 10, None), ("batching", 40, 256), ("none", 40, None)])
+def test_large_runs_are_sampled(client, server, upload, finished, fit_of, sampling, rows, batch_size):
+    x = np.random.default_rng().random(41)
+    x[0] = np.nan
+    dataset_id = upload({"x": x, "y": 2.0 * x})
+    job_id = client.post("/run_pysr", json={
+        "dataset_id": dataset_id, "input_variables": ["x"], "output_variable": "y",
+        "operators": {"+": True}, "functions": {}, "force_rerun": True,
+        "row_threshold": 10, "row_sampling": sampling}).get_json()["job_id"]
+    assert finished(job_id)["status"] == "done"
+    fit = fit_of(job_id)
+    assert fit["shape"] == [rows, 1] and fit["batch_size"] == batch_size
@@ -0,0 +1,63 @@
+"""ODE rollouts of discovered equations (/simulate)."""
+import numpy as np
+import pytest
+
+from dynamics import compile_system, ensemble, simulate_ode, state_names
+from transport import NPY, RAW_FLOAT64, read_array_body
+
+
+def decay(times, x0=1.0):
+    return {"headers": ["time", "x"], "rows": [[t, x0 * np.exp(-t)] for t in times]}
+
+
+def test_systems_are_keyed_like_the_datasets():
+    assert state_names({"dx": "", "dy": ""}) == ["x", "y"]
+    assert state_names({"x_tt": "", "y_tt": ""}) == ["x_t", "y_t"]
+    program = compile_system({"dy": "x", "dx": "neg(y)"}, ["x", "y"])
+    np.testing.assert_array_equal(program.run({"x": 2.0, "y": 3.0}), [-3.0, 2.0])
+    with pytest.raises(KeyError):
+        compile_system({"dx": "x * z"}, ["x"])
+    ics = ensemble([1.0, 2.0], 5, spread=0.1, scale=[1.0, 10.0])
+    assert ics.shape == (5, 2) and ics[0].tolist() == [1.0, 2.0]
+
+
+def test_rk4_matches_the_exact_solution():
+    times = np.linspace(0.0, 2.0, 41)
+    program = compile_system({"dx": "neg(x)"}, ["x"])
+    result = simulate_ode(program, ["x"], [[1.0]], times, record=True)
+    np.testing.assert_allclose(result["trajectories"][:, 0, 0], np.exp(-times), rtol=1e-6)
+
+
+def test_blown_up_trajectories_are_dropped():
+    times = np.linspace(0.0, 5.0, 51)
+    program = compile_system({"dx": "x * x"}, ["x"])
+    result = simulate_ode(program, ["x"], [[0.0], [2.0]], times, reference=np.zeros((51, 1)),
+                          scale=[1.0], record=True)
+    assert result["n_blown_up"] == 1 and result["divergence_times"][0] is None
+    assert np.isnan(result["trajectories"][-1, 1, 0])
+
+
+def test_simulate_route(client):
+    times = np.linspace(0.0, 1.0, 21)
+    request = {**decay(times), "equations": {"dx": "neg(x)"}, "n_ics": 10}
+    result = client.post("/simulate", json=request).get_json()
+    assert result["state"] == ["x"] and result["n_diverged"] == 0
+    assert len(result["time"]) == len(result["error"]) == 21
+    wrong = client.post("/simulate", json={**request, "equations": {"dx": "x * 3.0"}}).get_json()
+    assert wrong["n_diverged"] == 10 and wrong["divergence_time"]["max"] < 1.0
+    assert client.post("/simulate", json={**request, "equations": {"dx": "z"}}).status_code == 400
+
+
+@pytest.mark.parametrize("fmt", [RAW_FLOAT64, NPY])
+def test_binary_trajectories_with_large_metadata(client, fmt):
+    # thousands of per-IC divergence times travel ahead of the array
+    times = np.linspace(0.0, 1.0, 11)
+    response = client.post("/simulate", headers={"Accept": fmt}, json={
+        **decay(times), "equations": {"dx": "neg(x)"}, "n_ics": 3000,
+        "include_trajectories": True})
+    assert response.status_code == 200 and response.mimetype == fmt
+    shape = tuple(int(n) for n in response.headers["X-Shape"].split(","))
+    arr, meta = read_array_body(response.data, fmt, shape)
+    assert arr.shape == (11, 3000, 1) and len(meta["divergence_times"]) == 3000
+    assert meta["state"] == ["x"] and int(response.headers["X-Data-Offset"]) % 8 == 0
+    np.testing.assert_allclose(arr[:, 0, 0], np.exp(-times), rtol=1e-6)
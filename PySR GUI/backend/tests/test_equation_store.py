@@ -0,0 +1,73 @@
+"""Cross-run equation store (SQLite) and the /equations routes."""
+import json
+
+import numpy as np
+import pytest
+
+from equation_store import EquationStore, operators_key, pareto_front
+
+
+def hof(*rows):
+    return [{"Complexity": c, "Loss": loss, "Equation": eq} for c, loss, eq in rows]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EquationStore(str(tmp_path / "equations.sqlite"))
+    store.add_run("a", hof((1, 4.0, "x"), (3, 1.0, "x * 2.0"), (5, 0.5, "x * 2.1")),
+                  dataset_id="d", target="y", operators=["*", "+"])
+    store.add_run("b", hof((3, 2.0, "x + 1.0"), (4, 0.1, "(x * 2.0) + 1.0")),
+                  dataset_id="d", target="y", operators=["+", "*"])
+    store.add_run("c", hof((1, 0.0, "z")), dataset_id="d", target="z")
+    return store
+
+
+def test_operators_key_ignores_order():
+    assert operators_key(["+", "*"], ["sin"]) == operators_key(["*", "+"], ["sin"])
+    assert operators_key(["+"], []) != operators_key([], ["+"])
+
+
+def test_pareto_front_across_runs(store):
+    front = store.pareto("d", "y")
+    assert [(r["complexity"], r["equation"]) for r in front] == [
+        (1, "x"), (3, "x * 2.0"), (4, "(x * 2.0) + 1.0")]
+    assert store.best("d", "y")["run_id"] == "b"
+    assert store.best("d", "y", max_complexity=3)["equation"] == "x * 2.0"
+    assert pareto_front([{"complexity": 1, "loss": None}]) == []
+
+
+def test_filters_and_deletion(store):
+    assert len(store.equations(dataset_id="d", target="y")) == 5
+    assert [r["complexity"] for r in store.equations(run_id="a", order="complexity")] == [1, 3, 5]
+    key = operators_key(["+", "*"], [])
+    assert {r["run_id"] for r in store.equations(operators_key=key)} == {"a", "b"}
+    assert store.delete_run("a") and not store.delete_run("a")
+    assert store.equations(run_id="a") == []
+    assert store.stats()["n_runs"] == 2 and store.stats()["n_equations"] == 3
+
+
+def test_backfill_from_job_directories(tmp_path):
+    run_dir = tmp_path / "jobs" / "j1" / "hall of fame"
+    run_dir.mkdir(parents=True)
+    (run_dir / "hall_of_fame.csv").write_text('Complexity,Loss,Equation\n1,2.0,"x"\n')
+    meta = {"job_id": "j1", "status": "done", "data": {"output_variable": "y"}}
+    (tmp_path / "jobs" / "j1" / "job.json").write_text(json.dumps(meta))
+    store = EquationStore(str(tmp_path / "equations.sqlite"))
+    assert store.backfill(str(tmp_path / "jobs")) == 1
+    assert store.backfill(str(tmp_path / "jobs")) == 0
+    assert store.runs()[0]["run_id"] == "j1"
+
+
+def test_finished_jobs_are_stored(client, upload, finished):
+    x = np.random.default_rng().random(10)
+    dataset_id = upload({"x": x, "y": 2.0 * x + 1.0})
+    job_id = client.post("/run_pysr", json={
+        "dataset_id": dataset_id, "input_variables": ["x"], "output_variable": "y",
+        "operators": {"+": True, "*": True}, "functions": {}}).get_json()["job_id"]
+    assert finished(job_id)["status"] == "done"
+    rows = client.get(f"/equations?job_id={job_id}&order=complexity").get_json()["rows"]
+    assert [r["equation"] for r in rows] == ["x", "x * 2.0", "(x * 2.0) + 1.0"]
+    best = client.get(f"/equations/best?dataset_id={dataset_id}&output_variable=y").get_json()
+    assert best["loss"] == 0.0
+    assert client.get("/equations/pareto").status_code == 400
+    assert client.get("/equations/best?dataset_id=nope&output_variable=y").status_code == 404
@@ -0,0 +1,104 @@
+"""Scoring a whole hall of fame in one merged program (/evaluate_all)."""
+import numpy as np
+import pytest
+
+from evaluate_tree import (compile_expressions, evaluate_expression, evaluate_many,
+                           evaluate_tree, optimize_tree, parse_expression)
+
+
+def test_forest_matches_one_by_one(stored_hof, hick):
+    n = hick["n"].to_numpy(dtype=float)
+    equations = list(stored_hof["Equation"])
+    block = compile_expressions(equations).run({"n": n})
+    assert block.shape == (len(equations), len(n))
+    for row, equation in zip(block, equations):
+        np.testing.assert_allclose(row, np.broadcast_to(
+            evaluate_expression(equation, {"n": n}), n.shape), rtol=1e-12, err_msg=equation)
+
+
+def test_shared_subexpressions_are_computed_once():
+    program = compile_expressions(["sin(x) * 2.0", "sin(x) + 1.0"])
+    assert sum(op == "sin" for op, *_ in program.code) == 1
+
+
+def test_evaluate_many_of_constants():
+    np.testing.assert_array_equal(evaluate_many(["1.0", "2.0"], {}), [1.0, 2.0])
+
+
+@pytest.mark.parametrize("equation, optimized", [
+    ("x + 0.0", {"x"}),
+    # operands of + and * come out in either order (see merge_trees)
+    ("(2.0 * 3.0) * x", {"(6.0 * x)", "(x * 6.0)"}),
+    ("x ^ 2.0", {"square(x)"}),
+    ("x - -y", {"(x + y)", "(y + x)"}),
+    ("abs(square(x))", {"square(x)"}),
+])
+def test_optimize_tree_rewrites(equation, optimized):
+    assert str(optimize_tree(parse_expression(equation))) in optimized
+
+
+def test_optimized_trees_agree_to_an_ulp(stored_hof, hick):
+    n = hick["n"].to_numpy(dtype=float)
+    x = np.linspace(-3.0, 3.0, 101)
+    cases = [(e, {"n": n}) for e in stored_hof["Equation"]]
+    cases += [(e, {"x": x}) for e in ("x ^ 2.0", "log(x) * 1.0", "sqrt(2.0 ^ 0.5) / x")]
+    for equation, columns in cases:
+        tree = parse_expression(equation)
+        np.testing.assert_allclose(evaluate_tree(optimize_tree(tree), columns),
+                                   evaluate_tree(tree, columns), rtol=4e-16, atol=0,
+                                   equal_nan=True, err_msg=equation)
+
+
+def frame(x):
+    return {"headers": ["x", "y"], "rows": [[v, 2.0 * v + 1.0] for v in x]}
+
+
+@pytest.mark.parametrize("equations", [["x * 2.0"], ["3.0"]])
+def test_single_equation(client, equations):
+    # a program with one output returns a plain array (or float), not a
+    # stack of them
+    x = [1.0, 2.0, 3.0]
+    response = client.post("/evaluate_all", json={
+        **frame(x), "output_variable": "y", "equations": equations})
+    assert response.status_code == 200, response.get_json()
+    (result,) = response.get_json()["results"]
+    expected = np.broadcast_to(evaluate_expression(equations[0], {"x": np.array(x)}), (3,))
+    assert result["prediction"] == expected.tolist()
+
+
+def test_native_and_fallback_equations(client):
+    x = [1.0, 2.0, 3.0]
+    response = client.post("/evaluate_all", json={
+        **frame(x), "output_variable": "y",
+        "equations": ["(x * 2.0) + 1.0", "x ** 2", "x +* 1"]})
+    results = response.get_json()["results"]
+    assert results[0]["prediction"] == [3.0, 5.0, 7.0]
+    assert results[0]["r2"] == 1.0
+    assert results[1]["prediction"] == [1.0, 4.0, 9.0]
+    assert "error" in results[2]
+
+
+def test_rows_that_cannot_be_scored_are_dropped(client, upload):
+    # x is missing in a middle row, z (used by one equation only) in another
+    x = [1.0, None, 3.0, 4.0]
+    z = [0.0, 0.0, None, 0.0]
+    body = {"headers": ["x", "z", "y"],
+            "rows": [[a, b, 2.0 * a + 1.0 if a else 0.0] for a, b in zip(x, z)],
+            "output_variable": "y"}
+    one = client.post("/evaluate", json={**body, "equation": "(x * 2.0) + 1.0"}).get_json()
+    assert one["prediction"] == [3.0, 7.0, 9.0] and one["r2"] == 1.0 and one["n_rows"] == 3
+    (result,) = client.post("/evaluate_all", json={**body, "equations": ["(x * 2.0) + 1.0"]}
+                            ).get_json()["results"]
+    assert result["prediction"] == one["prediction"]
+    both = client.post("/evaluate_all", json={
+        **body, "equations": ["(x * 2.0) + 1.0", "(x * 2.0) + (z + 1.0)"]}).get_json()["results"]
+    assert [r["n_rows"] for r in both] == [2, 2] and [r["r2"] for r in both] == [1.0, 1.0]
+
+    # metrics cached for a registered dataset are those of the rows scored
+    dataset_id = upload({"x": [1.0, 2.0, 3.0, 4.0], "z": [0.0, 0.0, np.nan, 0.0],
+                         "y": [3.0, 5.0, 7.0, 9.0]})
+    body = {"dataset_id": dataset_id, "output_variable": "y"}
+    client.post("/evaluate_all", json={**body, "equations": ["(x * 2.0) + 1.0", "z"]})
+    metrics = client.post("/evaluate", json={**body, "equation": "(x * 2.0) + 1.0",
+                                             "metrics_only": True}).get_json()
+    assert metrics["n_rows"] == 4
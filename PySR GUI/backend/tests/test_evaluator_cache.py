@@ -0,0 +1,63 @@
+"""Cached compiled evaluators for /evaluate."""
+import numpy as np
+import pandas as pd
+
+from evaluator_cache import EvaluatorCache, normalise_equation
+
+
+def test_hit_after_miss_ignores_whitespace():
+    cache = EvaluatorCache()
+    first = cache.get("x * 2.0", ["x"])
+    assert cache.get(" x*2.0 ", ["x"]) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert normalise_equation("x *  2.0") == "x*2.0"
+
+
+def test_key_includes_columns():
+    cache = EvaluatorCache()
+    assert cache.get("x", ["x"]) is not cache.get("x", ["x", "y"])
+
+
+def test_evicts_least_recently_used():
+    cache = EvaluatorCache(max_entries=2)
+    a = cache.get("x + 1.0", ["x"])
+    cache.get("x + 2.0", ["x"])
+    cache.get("x + 1.0", ["x"])                 # a is now the most recent
+    cache.get("x + 3.0", ["x"])
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1
+    assert cache.get("x + 1.0", ["x"]) is a
+
+
+def test_bounded_by_bytes():
+    df = pd.DataFrame({"x": np.arange(1000.0)})
+    cache = EvaluatorCache(max_bytes=1)
+    for expr in ("sin(x) + cos(x)", "sin(x) * cos(x)"):
+        evaluator = cache.get(expr, df.columns)
+        evaluator(df)
+        cache.update_size(expr, df.columns, evaluator)
+    # the entry in use is kept even though it is over the limit
+    assert cache.stats()["entries"] == 1
+
+
+def test_native_and_numexpr_results():
+    df = pd.DataFrame({"x": [1.0, 4.0, 9.0]})
+    cache = EvaluatorCache()
+    native = cache.get("sqrt(x) + 1.0", df.columns)
+    assert native.program is not None
+    np.testing.assert_array_equal(native(df), [2.0, 3.0, 4.0])
+    fallback = cache.get("(x > 2.0) * 1.0", df.columns)     # numexpr only
+    assert fallback.program is None
+    np.testing.assert_array_equal(fallback(df), [0.0, 1.0, 1.0])
+    constant = cache.get("2.5", df.columns)
+    np.testing.assert_array_equal(constant(df), [2.5, 2.5, 2.5])
+
+
+def test_evaluate_route_reuses_the_compiled_equation(client, server):
+    server.evaluator_cache.clear()
+    body = {"headers": ["x", "y"], "rows": [[1.0, 3.0], [2.0, 5.0]],
+            "equation": "(x * 2.0) + 1.0", "output_variable": "y"}
+    for _ in range(2):
+        response = client.post("/evaluate", json=body)
+        assert response.get_json()["prediction"] == [3.0, 5.0]
+    stats = client.get("/evaluate/cache").get_json()
+    assert stats["entries"] == 1 and stats["hits"] >= 1
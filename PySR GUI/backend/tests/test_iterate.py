@@ -0,0 +1,40 @@
+"""Lockstep iteration of discovered maps (/iterate) on the Henon data."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dynamics import compile_system, iterate_map
+
+HENON = {"x_tt": "(1.0 - (1.4 * square(x_t))) + y_t", "y_tt": "0.3 * x_t"}
+
+
+@pytest.fixture
+def henon(data_path):
+    return pd.read_csv(data_path("henon map.csv"), encoding="utf-8-sig")
+
+
+def test_iterates_reproduce_the_recorded_orbit(henon):
+    state = ["x_t", "y_t"]
+    reference = henon[state].to_numpy(dtype=float)
+    program = compile_system(HENON, state)
+    result = iterate_map(program, state, reference[:1], 20, reference=reference, burn_in=0,
+                         record=True)
+    np.testing.assert_allclose(result["trajectories"][:, 0, :], reference[:21], atol=1e-9)
+    assert result["n_diverged"] == 0 and result["outside_fraction"] == 0.0
+
+
+def test_iterate_route(client, henon):
+    frame = {"headers": list(henon.columns), "rows": henon.to_numpy().tolist()}
+    result = client.post("/iterate", json={**frame, "equations": HENON, "n_ics": 200,
+                                           "steps": 2000}).get_json()
+    assert result["state"] == ["x_t", "y_t"] and result["n_blown_up"] == 0
+    # chaotic: nearby orbits separate (all but the recorded start itself),
+    # but stay on the same attractor
+    assert result["n_diverged"] == 199 and result["divergence_time"]["min"] > 5
+    assert result["attractor_overlap"] > 0.5 and result["outside_fraction"] < 0.01
+
+    wrong = client.post("/iterate", json={**frame, "n_ics": 20, "steps": 200, "equations": {
+        "x_tt": "(1.0 - (2.4 * square(x_t))) + y_t", "y_tt": "0.3 * x_t"}}).get_json()
+    assert wrong["n_blown_up"] == 20
+    assert client.post("/iterate", json={**frame, "equations": {"x_tt": "x_t"},
+                                         "state": ["x_t", "z"]}).status_code == 400
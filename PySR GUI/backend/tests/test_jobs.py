@@ -0,0 +1,145 @@
+"""Multi-job scheduler: queueing, priorities, cancellation and reaping."""
+import json
+import os
+import time
+
+import pytest
+
+from jobs import (DONE, ERROR, QUEUED, RUNNING, STOPPED, JobManager, report_result,
+                  write_progress)
+
+
+def search(data, output_dir, progress_file):
+    """Job target: "searches" for data['seconds'] and reports done."""
+    time.sleep(data.get("seconds", 0))
+    if data.get("silent"):
+        return
+    if data.get("report"):
+        report_result(progress_file, DONE, "all done")
+        return
+    write_progress(progress_file, DONE, "done")
+
+
+@pytest.fixture
+def manager(tmp_path):
+    finished = []
+    manager = JobManager(str(tmp_path / "jobs"), target=search, max_workers=1,
+                         poll_interval=0.02, on_finish=lambda job, status: finished.append(job))
+    manager.finished = finished
+    yield manager
+    for job in manager.list():
+        manager.cancel(job.job_id)
+
+
+def test_job_runs_in_its_own_directory(manager, wait_until):
+    job = manager.submit({"output_variable": "y", "rows": [[1, 2]]})
+    assert os.path.dirname(job.output_dir) == manager.root
+    with open(job.meta_file) as f:
+        meta = json.load(f)
+    assert meta["job_id"] == job.job_id and "rows" not in meta["data"]
+    wait_until(lambda: job.status == DONE)
+    assert manager.finished == [job]
+    assert job.created <= job.started <= job.finished
+    assert manager.load_meta(job.job_id)["status"] == DONE
+
+
+def test_bounded_workers_and_priority(manager, wait_until):
+    first = manager.submit({"seconds": 0.5})
+    low = manager.submit({"seconds": 0.2}, priority=0)
+    high = manager.submit({"seconds": 0.2}, priority=5)
+    assert first.status == RUNNING and low.status == high.status == QUEUED
+    assert manager.queue_depth() == 2
+    wait_until(lambda: high.status == RUNNING)
+    assert low.status == QUEUED
+    wait_until(lambda: low.status == DONE)
+    assert high.finished <= low.started
+
+
+def test_group_starts_together(manager, wait_until):
+    first = manager.submit({"seconds": 0.3})
+    group = manager.submit_group([({"seconds": 0.3}, None, None) for _ in range(3)])
+    later = manager.submit({})
+    # one slot: the group waits for it, then all of its jobs run at once
+    assert [job.status for job in group] == [QUEUED] * 3
+    wait_until(lambda: group[0].status == RUNNING)
+    assert all(job.status == RUNNING for job in group) and first.status == DONE
+    assert later.status == QUEUED
+    wait_until(lambda: later.status == DONE)
+    assert later.started >= max(job.finished for job in group)
+    procs = max(1, min(manager.cores_per_job, (os.cpu_count() or 1) // 3))
+    assert {job.data["parameters"]["procs"] for job in group} == {procs}
+
+
+def test_failed_group_submission_ends_the_prepared_jobs(tmp_path):
+    ended = []
+
+    def prepare(job):
+        if job.data.get("fail"):
+            raise OSError("disk full")
+
+    manager = JobManager(str(tmp_path / "jobs"), target=search, max_workers=1,
+                         poll_interval=0.02, prepare=prepare,
+                         on_finish=lambda job, status: ended.append((job.data, status)))
+    with pytest.raises(OSError):
+        manager.submit_group([({"n": 1}, None, None), ({"fail": True}, None, None)])
+    assert ended == [({"n": 1}, ERROR)]
+    assert manager.queue_depth() == 0 and manager.list() == []
+
+
+def test_cancel_queued_and_running(manager, wait_until):
+    running = manager.submit({"seconds": 5})
+    queued = manager.submit({})
+    assert manager.cancel(queued.job_id) and queued.status == STOPPED
+    assert manager.cancel(running.job_id) and running.status == STOPPED
+    assert not manager.cancel(running.job_id)
+    with open(running.progress_file) as f:
+        assert json.load(f)["status"] == STOPPED
+    assert set(manager.finished) == {running, queued}
+
+
+def test_exit_without_result_is_an_error(manager, wait_until):
+    job = manager.submit({"silent": True})
+    wait_until(lambda: job.status == ERROR)
+    with open(job.progress_file) as f:
+        assert "without reporting" in json.load(f)["message"]
+
+
+def test_result_is_published_after_on_finish(tmp_path, wait_until):
+    seen = []
+
+    def on_finish(job, status):
+        with open(job.progress_file) as f:
+            seen.append((status, job.status, json.load(f)["status"]))
+
+    manager = JobManager(str(tmp_path / "jobs"), target=search, max_workers=1,
+                         poll_interval=0.02, on_finish=on_finish)
+    job = manager.submit({"report": True})
+    wait_until(lambda: job.status == DONE)
+    assert seen == [(DONE, RUNNING, RUNNING)]
+    with open(job.progress_file) as f:
+        assert json.load(f) == {"status": DONE, "message": "all done"}
+    assert manager.load_meta(job.job_id)["status"] == DONE
+
+
+def test_failing_on_finish_still_ends_the_job(tmp_path, wait_until, caplog):
+    def on_finish(job, status):
+        raise ValueError("malformed hall of fame")
+
+    manager = JobManager(str(tmp_path / "jobs"), target=search, max_workers=1,
+                         poll_interval=0.02, on_finish=on_finish)
+    first = manager.submit({"report": True})
+    running = manager.submit({"seconds": 5})
+    # the monitor thread survives and starts the next job
+    wait_until(lambda: first.status == DONE and running.status == RUNNING)
+    assert manager.load_meta(first.job_id)["status"] == DONE
+    assert manager.cancel(running.job_id) and running.status == STOPPED
+    assert "on_finish failed" in caplog.text
+
+
+def test_jobs_routes(client, server, wait_until):
+    job = server.job_manager.add_finished({"output_variable": "y"}, os.devnull)
+    listing = client.get("/jobs").get_json()
+    assert job.job_id in [j["job_id"] for j in listing["jobs"]]
+    assert client.get(f"/jobs/{job.job_id}").get_json()["status"] == DONE
+    assert client.get("/jobs/nope").status_code == 404
+    assert client.post(f"/stop/{job.job_id}").get_json()["status"] == "no process running"
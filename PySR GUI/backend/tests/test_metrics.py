@@ -0,0 +1,70 @@
+"""Accuracy metrics, their cache and /models_output/metrics."""
+import numpy as np
+import pytest
+
+from metrics import MetricsCache, compute_metrics, compute_metrics_block
+
+HOF = ('Complexity,Loss,Equation\n1,4.0,"x"\n3,0.25,"x * 2.0"\n5,0.0,"(x * 2.0) + 1.0"\n'
+       '7,0.0,"sqrt(x - 0.5) * 0.0 + ((x * 2.0) + 1.0)"\n')
+
+
+def test_metrics_of_one_prediction():
+    y = np.array([1.0, 2.0, 3.0, 4.0])
+    assert compute_metrics(y, y) == {"r2": 1.0, "rmse": 0.0, "nrmse": 0.0, "n_rows": 4}
+    m = compute_metrics(y, y + 1.0)
+    assert m["rmse"] == 1.0 and m["nrmse"] == pytest.approx(1 / 3)
+    assert m["r2"] == pytest.approx(1 - 4 / 5)
+    # rows without a finite target are ignored
+    assert compute_metrics([1.0, np.nan, 3.0, np.inf], [1.0, 5.0, 3.0, 6.0]) == {
+        "r2": 1.0, "rmse": 0.0, "nrmse": 0.0, "n_rows": 2}
+    # a prediction that is not finite where the target is scores worst
+    for pred in ([1.0, np.nan, 3.0, 4.0], [1.0, 2.0, 3.0, np.inf], np.full(4, np.nan)):
+        assert compute_metrics(y, pred) == {"r2": -np.inf, "rmse": np.inf,
+                                            "nrmse": np.inf, "n_rows": 4}
+    # a constant target has no R²
+    assert np.isnan(compute_metrics([2.0, 2.0], [2.0, 2.0])["r2"])
+
+
+def test_block_matches_one_at_a_time():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=50)
+    preds = y + rng.normal(size=(4, 50))
+    preds[1, 3] = np.nan
+    block = compute_metrics_block(y, preds)
+    for i, pred in enumerate(preds):
+        for k, v in compute_metrics(y, pred).items():
+            assert block[k][i] == pytest.approx(v)
+
+
+def test_cache_is_keyed_by_normalised_equation():
+    cache = MetricsCache(max_entries=2)
+    cache.put("d", "y", "x * 2.0", {"r2": 1.0, "rmse": 0.0, "nrmse": 0.0, "n_rows": 3, "extra": 1})
+    assert cache.get("d", "y", "x*2.0") == {"r2": 1.0, "rmse": 0.0, "nrmse": 0.0, "n_rows": 3}
+    assert cache.get("d", "z", "x * 2.0") is None
+    cache.put("d", "y", "a", {"r2": 0, "rmse": 0, "nrmse": 0})
+    cache.put("d", "y", "b", {"r2": 0, "rmse": 0, "nrmse": 0})
+    assert cache.get("d", "y", "x * 2.0") is None
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "hits": 1, "misses": 2}
+
+
+def test_models_output_metrics(client, server, upload, tmp_path):
+    hof_file = tmp_path / "hall_of_fame.csv"
+    hof_file.write_text(HOF)
+    job = server.job_manager.add_finished({"output_variable": "y"}, str(hof_file))
+    x = np.linspace(0.0, 1.0, 20)
+    dataset_id = upload({"x": x, "y": 2.0 * x + 1.0})
+    url = f"/models_output/metrics?job_id={job.job_id}&dataset_id={dataset_id}&output_variable=y"
+
+    rows = client.get(url + "&sort=r2").get_json()["rows"]
+    # exact where x >= 0.5, NaN elsewhere: ranked last, not first
+    assert [r["Complexity"] for r in rows] == [5, 3, 1, 7]
+    assert rows[3]["r2"] is None and rows[3]["rmse"] is None
+    assert rows[0]["r2"] == pytest.approx(1.0) and rows[0]["rmse"] == pytest.approx(0.0, abs=1e-12)
+    assert rows[0]["n_rows"] == 20
+    hits = server.metrics_cache.stats()["hits"]
+    assert client.get(url).get_json()["rows"][2]["r2"] == pytest.approx(1.0)
+    assert server.metrics_cache.stats()["hits"] == hits + 4
+
+    assert client.get(url + "&sort=loss").status_code == 400
+    assert client.get(url.replace("=y", "=z")).status_code == 400
+    assert client.get(url.replace(dataset_id, "0" * 32)).status_code == 404
@@ -0,0 +1,22 @@
+"""/models_output revalidation with ETags and ?since= queries."""
+
+HOF = 'Complexity,Loss,Equation\n1,4.0,"x"\n3,0.25,"x * 2.0"\n'
+
+
+def test_models_output_etag_and_since(client, server, tmp_path):
+    hof_file = tmp_path / "hall_of_fame.csv"
+    hof_file.write_text(HOF)
+    job = server.job_manager.add_finished({"output_variable": "y"}, str(hof_file))
+    first = client.get(f"/models_output?job_id={job.job_id}")
+    assert first.status_code == 200 and first.data.decode() == HOF
+    etag = first.headers["ETag"]
+    again = client.get(f"/models_output?job_id={job.job_id}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    version = int(first.headers["X-HOF-Version"])
+    since = client.get(f"/models_output?job_id={job.job_id}&since={version}").get_json()
+    assert since["rows"] == [] and since["version"] == version
+    assert len(client.get(f"/models_output?job_id={job.job_id}&since=0").get_json()["rows"]) == 2
+
+
+def test_unknown_job(client):
+    assert client.get("/models_output?job_id=nope").status_code == 404
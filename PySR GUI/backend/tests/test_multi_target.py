@@ -0,0 +1,32 @@
+"""Multi-target runs: one search per target, started together."""
+import os
+
+import numpy as np
+
+from conftest import FakeRegressor
+
+
+def test_targets_run_concurrently(client, server, upload, finished, fit_of, monkeypatch):
+    monkeypatch.setattr(FakeRegressor, "fit_seconds", 1.0)
+    x = np.random.default_rng().random(10)
+    response = client.post("/run_pysr", json={
+        "dataset_id": upload({"x": x, "dx": -x, "dy": 2.0 * x}), "input_variables": ["x"],
+        "output_variables": ["dx", "dy"], "operators": {"*": True}, "functions": {},
+        "force_rerun": True}).get_json()
+    jobs = response["jobs"]
+    assert set(jobs) == {"dx", "dy"} and all(j["status"] == "running" for j in jobs.values())
+    group = client.get(f"/job_groups/{response['group_id']}").get_json()
+    assert group["status"] == "running"
+    ended = [finished(j["job_id"]) for j in jobs.values()]
+    assert all(e["status"] == "done" for e in ended)
+    assert max(e["started"] for e in ended) < min(e["finished"] for e in ended)
+    # the targets share one X file, deleted when both are done
+    matrices = [server.job_manager.get(j["job_id"]).data["matrix"] for j in jobs.values()]
+    assert matrices[0]["X"] == matrices[1]["X"] and not os.path.exists(matrices[0]["X"])
+
+    cores = server.job_manager.cores_per_job
+    for target, job in jobs.items():
+        fit = fit_of(job["job_id"])
+        assert fit["procs"] == max(1, min(cores, (server.os.cpu_count() or 1) // 2))
+        assert fit["c_contiguous"] and fit["memory_mapped"]
+        np.testing.assert_allclose(fit["y"], -x if target == "dx" else 2.0 * x)
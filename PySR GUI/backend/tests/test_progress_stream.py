@@ -0,0 +1,102 @@
+"""Hall-of-fame change tracking and the /progress/stream events."""
+import json
+import os
+import threading
+
+import pytest
+
+from hall_of_fame import FileWatcher, HallOfFameFile, file_signature
+
+HOF = 'Complexity,Loss,Equation\n1,4.0,"x"\n3,0.25,"x * 2.0"\n'
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    # make the change visible to the (mtime, size) signature
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_refresh_and_diff(tmp_path):
+    path = str(tmp_path / "hall_of_fame.csv")
+    hof = HallOfFameFile(path)
+    assert hof.refresh() == [] and file_signature(path) is None
+    write(path, HOF)
+    rows = hof.refresh()
+    assert hof.refresh() is rows                       # unchanged: not re-read
+    known = HallOfFameFile.snapshot(rows)
+
+    write(path, HOF.replace('3,0.25,"x * 2.0"', '3,0.2,"x * 2.1"') + '5,0.0,"x * 2.0 + 1.0"\n')
+    changed, removed = HallOfFameFile.diff(known, hof.refresh())
+    assert [r["Complexity"] for r in changed] == [3, 5] and removed == []
+
+    version = hof.version
+    write(path, 'Complexity,Loss,Equation\n5,0.0,"x * 2.0 + 1.0"\n')
+    _, rows, removed = hof.changes_since(version)
+    assert rows == [] and sorted(removed) == [1, 3]
+    assert hof.etag == f"hof-{hof.version}"
+
+
+def test_watcher_wakes_on_its_directory_and_file_only(tmp_path):
+    pytest.importorskip("watchdog")
+    temp, other = tmp_path / "temp", tmp_path / "other"
+    other.mkdir()
+    watcher = FileWatcher([str(temp)], files=[str(tmp_path / "progress.json")])
+
+    def wakes(change):
+        woken = threading.Event()
+        generation = watcher._generation
+        waiter = threading.Thread(target=lambda: (watcher.wait(2.0), woken.set()))
+        waiter.start()
+        while watcher._observer is None:
+            pass
+        change()
+        waiter.join()
+        return watcher._generation != generation
+
+    # first, before events of the other writes can arrive late
+    assert not wakes(lambda: write(str(other / "b.csv"), HOF))
+    assert wakes(lambda: write(str(temp / "a.csv"), HOF))
+    assert wakes(lambda: (write(str(tmp_path / "p.tmp"), "{}"),
+                          os.replace(tmp_path / "p.tmp", tmp_path / "progress.json")))
+
+
+def read_events(response, count):
+    """First *count* events of an SSE response as (event, data)."""
+    events, buffer = [], ""
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while "\n\n" in buffer:
+            block, buffer = buffer.split("\n\n", 1)
+            if block.startswith(":"):
+                continue
+            lines = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((lines["event"], json.loads(lines["data"])))
+            if len(events) == count:
+                response.close()
+                return events
+    return events
+
+
+def test_stream_starts_with_the_whole_table(client, server, tmp_path):
+    hof_file = tmp_path / "hall_of_fame.csv"
+    hof_file.write_text(HOF)
+    job = server.job_manager.add_finished({"output_variable": "y"}, str(hof_file))
+    response = client.get(f"/progress/stream?job_id={job.job_id}")
+    assert response.mimetype == "text/event-stream"
+    (_, status), (event, models) = read_events(response, 2)
+    assert status["status"] == "done"
+    assert event == "models" and models["reset"] is True
+    assert [row["Complexity"] for row in models["rows"]] == [1, 3]
+
+
+def test_stream_resets_an_empty_table(client, server, tmp_path):
+    # a job without a hall of fame yet still clears what the client shows
+    hof_file = tmp_path / "hall_of_fame.csv"
+    hof_file.write_text(HOF)
+    job = server.job_manager.add_finished({"output_variable": "y"}, str(hof_file))
+    os.remove(job.hof_file)
+    (_, _), (event, models) = read_events(client.get(f"/progress/stream?job_id={job.job_id}"), 2)
+    assert event == "models" and models["reset"] is True
+    assert models["rows"] == [] and models["removed"] == []
@@ -0,0 +1,56 @@
+"""Re-fitting the constants of an equation (forward-mode derivatives)."""
+import numpy as np
+import pytest
+
+from evaluate_tree import evaluate_tree, parse_expression
+from refit import constant_nodes, evaluate_dual, refit_constants, with_constants
+
+
+@pytest.mark.parametrize("equation", [
+    "2.0 * x + 1.0", "x / 1.5", "inv(x + 0.5)", "sqrt(x * 3.0)", "x ^ 1.7",
+    "log(x * 2.0) - exp(0.3 * x)", "sin(1.2 * x) * cube(0.8 - x)",
+])
+def test_jacobian_matches_finite_differences(equation):
+    x = np.linspace(0.2, 3.0, 25)
+    tree = parse_expression(equation)
+    params = np.array([n.value for n in constant_nodes(tree)])
+    value, jacobian = evaluate_dual(tree, {"x": x}, params)
+    np.testing.assert_array_equal(value, evaluate_tree(tree, {"x": x}))
+    for i in range(len(params)):
+        step = 1e-6 * max(1.0, abs(params[i]))
+        up, down = params.copy(), params.copy()
+        up[i] += step
+        down[i] -= step
+        numeric = (evaluate_tree(with_constants(tree, up), {"x": x})
+                   - evaluate_tree(with_constants(tree, down), {"x": x})) / (2 * step)
+        np.testing.assert_allclose(jacobian[i], numeric, rtol=1e-5, atol=1e-7)
+
+
+@pytest.mark.parametrize("method", ["lm", "bfgs"])
+def test_refit_recovers_the_constants(hick, method):
+    n = hick["n"].to_numpy(dtype=float)
+    y = 0.2 * np.log(n) + 0.15
+    fit = refit_constants(parse_expression("0.5 * log(n) + 0.1"), {"n": n}, y, method=method)
+    np.testing.assert_allclose(fit["constants"], [0.2, 0.15], rtol=1e-5)
+    assert fit["loss"] < 1e-10 < fit["initial_loss"] and fit["converged"]
+
+
+def test_rows_outside_the_domain_are_ignored():
+    x = np.array([-1.0, 1.0, 4.0, 9.0])
+    y = np.array([0.0, 2.0, 4.0, 6.0])
+    fit = refit_constants(parse_expression("1.0 * sqrt(x)"), {"x": x}, y)
+    np.testing.assert_allclose(fit["constants"], [2.0])
+    with pytest.raises(ValueError):
+        refit_constants(parse_expression("sqrt(x)"), {"x": -x[1:]}, y[1:])
+
+
+def test_refit_route(client):
+    x = np.linspace(1.0, 5.0, 20)
+    response = client.post("/refit", json={
+        "equation": "(x * 1.0) + 0.0", "output_variable": "y",
+        "headers": ["x", "y"], "rows": [[v, 2.0 * v + 1.0] for v in x]})
+    result = response.get_json()
+    assert response.status_code == 200, result
+    np.testing.assert_allclose(result["constants"], [2.0, 1.0])
+    assert result["r2"] == pytest.approx(1.0)
+    assert client.post("/refit", json={"equation": "x", "method": "nope"}).status_code == 400
@@ -0,0 +1,43 @@
+"""Resuming and warm-starting searches from saved checkpoints."""
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def first_run(client, upload, finished):
+    x = np.random.default_rng().random(20)
+    dataset_id = upload({"x": x, "y": 2.0 * x + 1.0})
+    request = {"dataset_id": dataset_id, "input_variables": ["x"], "output_variable": "y",
+               "operators": {"+": True, "*": True}, "functions": {}, "force_rerun": True}
+    job_id = client.post("/run_pysr", json=request).get_json()["job_id"]
+    assert finished(job_id)["status"] == "done"
+    return request, job_id
+
+
+def test_resume_continues_from_the_checkpoint(client, server, first_run, finished, fit_of):
+    request, job_id = first_run
+    response = client.post("/run_pysr", json={"resume_from": job_id,
+                                              "parameters": {"niterations": 5}}).get_json()
+    assert response["warm_start_from"] == job_id
+    assert finished(response["job_id"])["status"] == "done"
+    assert fit_of(response["job_id"])["warm_start_from"] == server.job_manager.checkpoint_dir(job_id)
+    # the resumed job keeps the original request
+    assert server.job_manager.get(response["job_id"]).data["input_variables"] == ["x"]
+
+
+def test_warm_start_finds_a_run_with_the_same_key(client, server, first_run, finished, fit_of):
+    request, job_id = first_run
+    response = client.post("/run_pysr", json={**request, "warm_start": True}).get_json()
+    assert response["warm_start_from"] == job_id
+    finished(response["job_id"])
+    other = client.post("/run_pysr", json={**request, "operators": {"-": True},
+                                           "warm_start": True}).get_json()
+    assert other["warm_start_from"] is None
+    finished(other["job_id"])
+
+
+def test_resume_errors(client, first_run):
+    _, job_id = first_run
+    assert client.post("/run_pysr", json={"resume_from": "nope"}).status_code == 404
+    response = client.post("/run_pysr", json={"resume_from": job_id, "input_variables": ["y"]})
+    assert response.status_code == 400
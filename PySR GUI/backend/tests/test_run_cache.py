@@ -0,0 +1,34 @@
+"""Run-level cache of finished searches."""
+import numpy as np
+
+from run_cache import RunCache
+
+HOF = 'Complexity,Loss,Equation\n1,4.0,"x"\n'
+
+
+def test_put_get_and_eviction(tmp_path):
+    hof = tmp_path / "hall_of_fame.csv"
+    hof.write_text(HOF)
+    cache = RunCache(str(tmp_path / "cache"), max_bytes=2 * hof.stat().st_size)
+    assert cache.get("a" * 64) is None
+    for fingerprint in ("a" * 64, "b" * 64, "c" * 64):
+        cache.put(fingerprint, str(hof), job_id=fingerprint[0])
+    assert cache.get("a" * 64) is None                  # least recently used went first
+    assert cache.get("c" * 64)["job_id"] == "c"
+    assert cache.delete("c" * 64) and not cache.delete("c" * 64)
+
+
+def test_rerun_right_after_finishing_is_a_cache_hit(client, upload, finished):
+    x = np.random.default_rng().random(10)
+    request = {"dataset_id": upload({"x": x, "y": 2.0 * x}), "input_variables": ["x"],
+               "output_variable": "y", "operators": {"+": True}, "functions": {}}
+    first = client.post("/run_pysr", json=request).get_json()
+    assert first["cached"] is False
+    assert finished(first["job_id"])["status"] == "done"
+    # resubmitted the moment the job shows as done
+    again = client.post("/run_pysr", json=request).get_json()
+    assert again["cached"] is True and again["cached_from"] == first["job_id"]
+    assert [row["Complexity"] for row in again["rows"]] == [1, 3, 5]
+    forced = client.post("/run_pysr", json={**request, "force_rerun": True}).get_json()
+    assert forced["cached"] is False
+    finished(forced["job_id"])
@@ -0,0 +1,51 @@
+"""Block-wise evaluation with bounded memory (Program.run_chunked)."""
+import numpy as np
+import pytest
+
+from evaluate_tree import compile_expression, compile_expressions
+
+EQUATION = "sqrt(abs(x)) * log(y + 3.0) - cube(x) / 7.0"
+
+
+@pytest.fixture
+def columns():
+    rng = np.random.default_rng(0)
+    return {"x": rng.normal(size=1001), "y": rng.random(1001)}
+
+
+def test_blocks_match_one_pass(columns):
+    program = compile_expression(EQUATION)
+    expected = program.run(columns)
+    for chunk_rows in (1, 7, 1000, 5000):
+        np.testing.assert_array_equal(program.run_chunked(columns, chunk_rows=chunk_rows),
+                                      expected)
+
+
+def test_memory_mapped_inputs_and_output(columns, tmp_path):
+    program = compile_expression(EQUATION)
+    mapped = {}
+    for name, values in columns.items():
+        np.save(tmp_path / f"{name}.npy", values)
+        mapped[name] = np.load(tmp_path / f"{name}.npy", mmap_mode="r")
+    out = np.lib.format.open_memmap(str(tmp_path / "out.npy"), mode="w+",
+                                    dtype=float, shape=(1001,))
+    assert program.run_chunked(mapped, out=out, chunk_rows=64) is out
+    out.flush()
+    np.testing.assert_array_equal(np.load(tmp_path / "out.npy"), program.run(columns))
+
+
+def test_single_precision(columns):
+    program = compile_expression(EQUATION)
+    result = program.run_chunked(columns, dtype=np.float32, chunk_rows=100)
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, program.run(columns), rtol=1e-5, atol=1e-6)
+
+
+def test_forest_and_broadcast_inputs(columns):
+    forest = compile_expressions(["x * 2.0", EQUATION])
+    np.testing.assert_array_equal(forest.run_chunked(columns, chunk_rows=50),
+                                  forest.run(columns))
+    # scalar inputs fall back to `run`
+    assert compile_expression("x + 1.0").run_chunked({"x": 2.0}) == 3.0
+    with pytest.raises(ValueError):
+        compile_expression("x + y").run_chunked({"x": np.ones(3), "y": np.ones(4)})
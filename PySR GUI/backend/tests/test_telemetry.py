@@ -0,0 +1,62 @@
+"""Request/phase latency metrics and the /metrics export."""
+import json
+import types
+
+from flask import Flask
+
+from telemetry import Histogram, Telemetry
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("h", "help", ("route",), buckets=(1, 5))
+    for value in (0.5, 2, 7):
+        hist.observe(value, "r")
+    lines = hist.render()
+    assert 'h_bucket{route="r",le="1"} 1' in lines
+    assert 'h_bucket{route="r",le="5"} 2' in lines
+    assert 'h_bucket{route="r",le="+Inf"} 3' in lines
+    assert 'h_sum{route="r"} 9.5' in lines and 'h_count{route="r"} 3' in lines
+
+
+def test_requests_phases_and_log(tmp_path):
+    log = tmp_path / "trace.jsonl"
+    telemetry = Telemetry(prefix="t", log_path=str(log))
+    telemetry.gauge("t_answer", "A gauge.", lambda: 42)
+    app = Flask(__name__)
+    app.before_request(telemetry.start_request)
+    app.after_request(telemetry.finish_request)
+
+    @app.route("/work", methods=["POST"])
+    def work():
+        with telemetry.span("parse"):
+            pass
+        with telemetry.span("parse"):
+            pass
+        return "done"
+
+    assert app.test_client().post("/work", data=b"12345").status_code == 200
+    text = telemetry.render()
+    assert 't_requests_total{route="work",method="POST",status="200"} 1' in text
+    assert 't_phase_seconds_count{route="work",phase="parse"} 2' in text
+    assert 't_request_bytes_total{route="work"} 5' in text
+    assert 't_response_bytes_total{route="work"} 4' in text
+    assert "t_answer 42" in text
+
+    telemetry.observe_job(types.SimpleNamespace(job_id="j", created=0.0, started=2.0,
+                                                finished=12.0), "done")
+    assert 't_job_run_seconds_count{status="done"} 1' in telemetry.render()
+    request, job = [json.loads(line) for line in log.read_text().splitlines()]
+    assert request["route"] == "work" and set(request["phases"]) == {"parse"}
+    assert job["wait_seconds"] == 2.0 and job["run_seconds"] == 10.0
+
+
+def test_metrics_route(client):
+    response = client.post("/evaluate", json={
+        "equation": "x * 2.0", "output_variable": "y",
+        "headers": ["x", "y"], "rows": [[1.0, 2.0], [2.0, 4.0]]})
+    assert response.status_code == 200
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert 'pysr_gui_phase_seconds_count{route="evaluate",phase="evaluate"}' in text
+    assert "# TYPE pysr_gui_jobs_queued gauge" in text
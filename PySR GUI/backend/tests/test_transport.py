@@ -0,0 +1,70 @@
+"""Compressed requests, binary arrays and compressed responses."""
+import gzip
+import io
+import json
+
+import numpy as np
+from flask import Flask
+
+from transport import NPY, RAW_FLOAT64, array_response, decode_body, read_array_body
+
+BODY = {"headers": ["x", "y"], "rows": [[1.0, 3.0], [2.0, 5.0], [3.0, 7.0]],
+        "equation": "(x * 2.0) + 1.0", "output_variable": "y"}
+
+
+def test_array_body_round_trip():
+    arr = np.arange(12.0).reshape(3, 4)
+    meta = {"name": "é", "values": list(range(5000))}       # far beyond a header limit
+    with Flask(__name__).app_context():
+        for fmt in (RAW_FLOAT64, NPY):
+            response = array_response(arr, meta, fmt)
+            assert "X-Meta" not in response.headers
+            body = response.get_data()
+            offset = int(response.headers["X-Data-Offset"])
+            assert offset % 8 == 0
+            shape = tuple(int(n) for n in response.headers["X-Shape"].split(","))
+            got, got_meta = read_array_body(body, fmt, shape)
+            np.testing.assert_array_equal(got, arr)
+            assert got_meta == meta
+    raw = array_response(arr, meta, RAW_FLOAT64).get_data()
+    np.testing.assert_array_equal(np.frombuffer(raw, "<f8", offset=offset), arr.ravel())
+
+
+def test_decode_body():
+    assert decode_body(gzip.compress(b"abc"), "gzip") == b"abc"
+    assert decode_body(b"abc", None) == b"abc"
+
+
+def test_gzip_request_and_binary_prediction(client):
+    response = client.post("/evaluate", data=gzip.compress(json.dumps(BODY).encode()),
+                           headers={"Content-Encoding": "gzip",
+                                    "Content-Type": "application/json",
+                                    "Accept": RAW_FLOAT64})
+    assert response.status_code == 200 and response.mimetype == RAW_FLOAT64
+    pred, metrics = read_array_body(response.get_data(), RAW_FLOAT64)
+    np.testing.assert_array_equal(pred, [3.0, 5.0, 7.0])
+    assert metrics["r2"] == 1.0
+
+
+def test_npy_prediction(client):
+    response = client.post("/evaluate", json=BODY, headers={"Accept": NPY})
+    pred, metrics = read_array_body(response.get_data(), NPY)
+    np.testing.assert_array_equal(pred, [3.0, 5.0, 7.0])
+    assert set(metrics) == {"r2", "rmse", "nrmse", "n_rows"}
+
+
+def test_npz_upload(client):
+    buf = io.BytesIO()
+    np.savez(buf, x=np.array([1.0, 2.0]), y=np.array([3.0, 5.0]))
+    meta = client.post("/datasets?name=cols.npz", data=buf.getvalue(),
+                       content_type="application/x-npz").get_json()
+    assert meta["headers"] == ["x", "y"] and meta["n_rows"] == 2
+
+
+def test_large_responses_are_compressed(client):
+    rows = [[float(i), 2.0 * i + 1.0] for i in range(2000)]
+    response = client.post("/evaluate", json={**BODY, "rows": rows},
+                           headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    data = json.loads(gzip.decompress(response.get_data()))
+    assert len(data["prediction"]) == 2000
@@ -0,0 +1,70 @@
+"""Long-lived, pre-warmed worker processes."""
+import json
+import os
+
+import pytest
+
+from jobs import DONE, ERROR, JobManager, write_progress
+
+
+def warm_up():
+    with open(os.environ["WARM_UP_LOG"], "a") as f:
+        f.write(f"{os.getpid()}\n")
+
+
+def search(data, output_dir, progress_file):
+    if data.get("crash"):
+        os._exit(3)
+    write_progress(progress_file, DONE, "done", pid=os.getpid())
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("WARM_UP_LOG", str(tmp_path / "warm_up.log"))
+    manager = JobManager(str(tmp_path / "jobs"), target=search, max_workers=1,
+                         poll_interval=0.02, warm_up=warm_up)
+    manager.log = tmp_path / "warm_up.log"
+    yield manager
+    manager.launcher.shutdown()
+
+
+def pid_of(job):
+    with open(job.progress_file) as f:
+        return json.load(f)["pid"]
+
+
+def test_workers_warm_up_once_and_are_reused(manager, wait_until):
+    manager.start()
+    wait_until(lambda: all(w["ready"] for w in manager.workers()))
+    jobs = [manager.submit({}) for _ in range(3)]
+    wait_until(lambda: all(job.status == DONE for job in jobs))
+    pids = {pid_of(job) for job in jobs}
+    assert len(pids) == 1 and pids != {os.getpid()}
+    assert manager.log.read_text().split() == [str(pids.pop())]
+    assert manager.workers()[0]["jobs_done"] == 3
+
+
+def test_crashed_worker_is_replaced(manager, wait_until):
+    crash = manager.submit({"crash": True})
+    wait_until(lambda: crash.status == ERROR)
+    with open(crash.progress_file) as f:
+        assert "crashed" in json.load(f)["message"]
+    job = manager.submit({})
+    wait_until(lambda: job.status == DONE)
+    assert len(manager.log.read_text().split()) == 2
+
+
+def test_workers_are_recycled(manager, wait_until):
+    manager.launcher.max_jobs_per_worker = 2
+    jobs = []
+    for _ in range(3):
+        jobs.append(manager.submit({}))
+        wait_until(lambda: jobs[-1].status == DONE)
+    assert pid_of(jobs[0]) == pid_of(jobs[1]) != pid_of(jobs[2])
+
+
+def test_group_larger_than_the_pool_gets_extra_workers(manager, wait_until):
+    jobs = manager.submit_group([({}, None, None), ({}, None, None)])
+    wait_until(lambda: all(job.status == DONE for job in jobs))
+    assert pid_of(jobs[0]) != pid_of(jobs[1])
+    wait_until(lambda: len(manager.workers()) == 1)
@@ -0,0 +1,150 @@
+"""
+transport.py
+
+Content negotiation for the Flask routes that move whole columns around.
+
+* Request bodies may be sent with ``Content-Encoding: gzip`` (or ``zstd``
+  when the optional *zstandard* package is installed); `get_json` and
+  `get_body` undo it transparently.
+* Prediction arrays are sent as binary when the client asks for it in its
+  ``Accept`` header:
+
+    ``application/octet-stream``  raw little-endian float64 (``<f8``),
+                                  shape in ``X-Shape``
+    ``application/x-npy``         a ``.npy`` file (shape and dtype inside)
+
+  Everything that is not the array itself (metrics, equations, …) is sent
+  as JSON ahead of it in the body – it can grow with the request (e.g.
+  per-trajectory results), more than proxies accept in a header::
+
+    <u4 n> | n bytes of JSON (space-padded) | the array
+
+  ``n`` is little-endian and the array starts at byte ``4 + n`` (also in
+  ``X-Data-Offset``), a multiple of 8, so ``new Float64Array(body, 4 + n)``
+  reads it in place.  `read_array_body` splits such a body again.  JSON
+  stays the fallback.
+* `compress_response` (registered as an ``after_request`` hook) compresses
+  any large enough response the client accepts gzip/zstd for.
+"""
+from __future__ import annotations
+import gzip
+import io
+import json
+
+import numpy as np
+from flask import Response
+
+try:                                    # optional, gzip is always available
+    import zstandard
+except ImportError:
+    zstandard = None
+
+RAW_FLOAT64 = "application/octet-stream"
+NPY = "application/x-npy"
+NPZ = "application/x-npz"
+EXPOSED_HEADERS = ["X-Shape", "X-Dtype", "X-Data-Offset"]
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+# ------------------------------------------------------------
+#  Request side
+# ------------------------------------------------------------
+def decode_body(raw: bytes, encoding: str | None) -> bytes:
+    """Undo a ``Content-Encoding`` of *raw*."""
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("identity", ""):
+        return raw
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.decompress(raw)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd request bodies need the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+    raise ValueError(f"Unsupported Content-Encoding {encoding!r}")
+
+
+def get_body(request) -> bytes:
+    return decode_body(request.get_data(), request.headers.get("Content-Encoding"))
+
+
+def get_json(request) -> dict:
+    """`request.get_json(force=True)` that also accepts compressed bodies."""
+    if not request.headers.get("Content-Encoding"):
+        return request.get_json(force=True)
+    return json.loads(get_body(request))
+
+
+def load_npz(raw: bytes) -> dict[str, np.ndarray]:
+    """Columns of a ``.npz`` upload (one 1-D array per column)."""
+    with np.load(io.BytesIO(raw), allow_pickle=False) as npz:
+        return {name: np.asarray(npz[name], dtype=float) for name in npz.files}
+
+
+# ------------------------------------------------------------
+#  Response side
+# ------------------------------------------------------------
+def binary_format(request) -> str | None:
+    """Binary media type the client prefers over JSON, if any."""
+    best = request.accept_mimetypes.best_match([RAW_FLOAT64, NPY, "application/json"])
+    return best if best in (RAW_FLOAT64, NPY) else None
+
+
+def array_response(arr, meta: dict, fmt: str) -> Response:
+    """Send *arr* as *fmt* with *meta* ahead of it (see module docstring)."""
+    arr = np.ascontiguousarray(arr, dtype="<f8")
+    if fmt == NPY:
+        buf = io.BytesIO()
+        np.save(buf, arr, allow_pickle=False)
+        data = buf.getvalue()
+    else:
+        data = arr.tobytes()
+    header = json.dumps(meta, allow_nan=False).encode()
+    header += b" " * (-(4 + len(header)) % 8)
+    response = Response(len(header).to_bytes(4, "little") + header + data, mimetype=fmt)
+    response.headers["X-Shape"] = ",".join(str(n) for n in arr.shape)
+    response.headers["X-Dtype"] = "<f8"
+    response.headers["X-Data-Offset"] = str(4 + len(header))
+    return response
+
+
+def read_array_body(body: bytes, fmt: str, shape=None) -> tuple[np.ndarray, dict]:
+    """Array and metadata of an `array_response` body; *shape* (from
+    ``X-Shape``) is needed for the raw format only."""
+    n = int.from_bytes(body[:4], "little")
+    meta = json.loads(body[4:4 + n])
+    data = body[4 + n:]
+    if fmt == NPY:
+        return np.load(io.BytesIO(data), allow_pickle=False), meta
+    arr = np.frombuffer(data, dtype="<f8")
+    return (arr if shape is None else arr.reshape(shape)), meta
+
+
+def _pick_encoding(request) -> str | None:
+    offered = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def compress_response(response: Response, request) -> Response:
+    """Compress *response* with the best encoding the client accepts."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or "Content-Encoding" in response.headers):
+        return response
+    encoding = _pick_encoding(request)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+
+    if encoding == "zstd":
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    else:
+        body = gzip.compress(body, compresslevel=5)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Content-Length"] = str(len(body))
+    response.vary.add("Accept-Encoding")
+    return response
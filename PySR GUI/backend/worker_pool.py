@@ -0,0 +1,165 @@
+"""
+worker_pool.py
+
+Pool of long-lived, pre-warmed worker processes for PySR jobs.
+
+Starting a fresh process per search means importing PySR and compiling
+SymbolicRegression.jl before the first iteration, every time.  Here each
+worker pays that once: it runs the *warm_up* callable (a tiny fit) right
+after it starts and then takes jobs from its own queue.  Workers are
+started with the "spawn" method, so no Julia runtime is ever inherited
+through fork().
+
+The pool implements the launcher interface of `jobs.JobManager`
+(`start`, `free_slots`, `launch`, `stop`, `poll`).  `poll` also does the
+health checks: a worker that died is replaced (its job is reported as
+failed), a stopped job's worker is terminated and replaced, and workers
+are recycled after `max_jobs_per_worker` jobs to bound memory growth.
+A job launched while every worker is busy (a job group larger than the
+pool) gets an extra worker, which is retired when its job ends.
+"""
+from __future__ import annotations
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import time
+
+
+def _worker_main(worker_id, target, warm_up, inbox, events):
+    if warm_up is not None:
+        try:
+            warm_up()
+        except Exception as e:                      # still usable, just cold
+            events.put(("warm_up_failed", worker_id, repr(e)))
+    events.put(("ready", worker_id, os.getpid()))
+    while True:
+        message = inbox.get()
+        if message is None:
+            return
+        job_id, args = message
+        events.put(("started", worker_id, job_id))
+        error = None
+        try:
+            target(*args)
+        except BaseException as e:
+            error = repr(e)
+        events.put(("finished", worker_id, job_id, error))
+
+
+class _Worker:
+    def __init__(self, worker_id: int, process, inbox):
+        self.worker_id = worker_id
+        self.process = process
+        self.inbox = inbox
+        self.ready = False
+        self.job_id: str | None = None
+        self.jobs_done = 0
+        self.started = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "pid": self.process.pid,
+            "ready": self.ready,
+            "job_id": self.job_id,
+            "jobs_done": self.jobs_done,
+            "uptime": time.time() - self.started,
+        }
+
+
+class WarmPool:
+    """*size* warm worker processes running ``target(*args)`` per job."""
+
+    def __init__(self, target, size: int, warm_up=None, max_jobs_per_worker: int = 25):
+        self.target = target
+        self.size = size
+        self.warm_up = warm_up
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._ctx = mp.get_context("spawn")
+        self._events = self._ctx.Queue()
+        self._ids = itertools.count()
+        self.workers: dict[int, _Worker] = {}
+
+    def _spawn(self) -> _Worker:
+        worker_id = next(self._ids)
+        inbox = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main, name=f"pysr-worker-{worker_id}", daemon=True,
+            args=(worker_id, self.target, self.warm_up, inbox, self._events))
+        process.start()
+        worker = self.workers[worker_id] = _Worker(worker_id, process, inbox)
+        return worker
+
+    def _retire(self, worker: _Worker, graceful: bool) -> None:
+        del self.workers[worker.worker_id]
+        if graceful:
+            worker.inbox.put(None)
+            worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join()
+
+    # ------------------------------------------------------------------
+    #  Launcher interface (see jobs.JobManager)
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        while len(self.workers) < self.size:
+            self._spawn()
+
+    def free_slots(self) -> int:
+        return sum(1 for w in self.workers.values() if w.job_id is None)
+
+    def launch(self, job) -> None:
+        # prefer a worker that has finished warming up
+        idle = [w for w in self.workers.values() if w.job_id is None]
+        worker = max(idle, key=lambda w: (w.ready, -w.worker_id)) if idle else self._spawn()
+        worker.job_id = job.job_id
+        worker.inbox.put((job.job_id, (job.data, job.output_dir, job.progress_file)))
+
+    def stop(self, job) -> None:
+        """Kill the worker running *job* and start a fresh one."""
+        for worker in list(self.workers.values()):
+            if worker.job_id == job.job_id:
+                self._retire(worker, graceful=False)
+                self.start()
+
+    def poll(self) -> list[tuple[str, str | None]]:
+        """Drain worker events and replace dead workers; returns the jobs
+        that ended as ``(job_id, error or None)``."""
+        finished = []
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            kind, worker_id, *rest = event
+            worker = self.workers.get(worker_id)
+            if worker is None:                  # already retired
+                continue
+            if kind == "ready":
+                worker.ready = True
+            elif kind == "finished":
+                job_id, error = rest
+                finished.append((job_id, error))
+                worker.job_id = None
+                worker.jobs_done += 1
+                if worker.jobs_done >= self.max_jobs_per_worker or len(self.workers) > self.size:
+                    self._retire(worker, graceful=True)
+
+        # health check: replace crashed workers
+        for worker in list(self.workers.values()):
+            if not worker.process.is_alive():
+                if worker.job_id is not None:
+                    finished.append((worker.job_id,
+                                     f"PySR worker crashed (exit code {worker.process.exitcode})"))
+                self._retire(worker, graceful=False)
+        self.start()
+        return finished
+
+    def status(self) -> list[dict]:
+        return [w.to_dict() for w in self.workers.values()]
+
+    def shutdown(self) -> None:
+        for worker in list(self.workers.values()):
+            self._retire(worker, graceful=worker.job_id is None)
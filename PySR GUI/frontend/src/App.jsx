@@ -11,6 +11,7 @@ function App() {
   const fileInputRef = useRef(null); // Input file reference
   const [rows, setRows] = useState([]); // Data in rows
   const [headers, setHeaders] = useState([]); // Data headers
+  const [datasetId, setDatasetId] = useState(null); // Dataset registered on the backend
   const [selectedOutput, setSelectedOutput] = useState(''); // Output variable
   const [selectedInputs, setSelectedInputs] = useState([]); // Input variable
   const [progress, setProgress] = useState({status: 'not started', message: ''}); // Progress log text
@@ -40,6 +41,7 @@ function App() {
     log: true
   });
   const [isRunning, setIsRunning] = useState(false); // Flag indicating if backend is running
+  const [runJobId, setRunJobId] = useState(null); // Job whose progress is streamed
   const [plotData, setPlotData] = useState([]); // Plot
   const [modelsTable, setModelsTable] = useState([]); // Data to populate model table
   const [logMessages, setLogMessages] = useState([]); // Extended log text
@@ -85,6 +87,14 @@ function App() {
   const handleFileChange = (event) => {
     const file = event.target.files[0]; // Grabs selected file
     if (file) { // If file was selected
+      // Upload the CSV once; later requests only send its dataset_id
+      setDatasetId(null);
+      const form = new FormData();
+      form.append('file', file);
+      axios.post('http://localhost:5000/datasets', form)
+        .then(res => setDatasetId(res.data.dataset_id))
+        .catch(err => console.error('Dataset upload failed, sending rows instead:', err));
+
       Papa.parse(file, { // Parse CSV file
         header: true, // Treats first row as column header
         dynamicTyping: true, // Automatically converts values to numbers or booleans when possible
@@ -202,78 +212,74 @@ function App() {
       parameters: parameters,
       operators: operators,
       functions: functions,
-      rows: rows
+      // Registered dataset if the upload succeeded, raw rows otherwise
+      ...(datasetId ? { dataset_id: datasetId } : { rows: rows })
     };
 
+    // Rows of the previous run are not this run's
+    setModelsTable([]);
+    setSelectedRowIndex(null);
     setIsRunning(true);
     appendLog('Started execution and polling...');
 
     try {
       const response = await axios.post('http://localhost:5000/run_pysr', payload); // Wait until run_pysr is completed
       console.log('PySR results:', response.data);
+      // Follow this run's job only (a multi-target run: its first target),
+      // never whatever ran before it
+      const { job_id, jobs } = response.data;
+      setRunJobId(job_id ?? Object.values(jobs)[0].job_id);
 
     } catch (error) {
       console.error('Error running PySR:', error);
       appendLog(`Error: ${error.message}`);
+      setIsRunning(false);
     }
   };
 
-  // Progress Log Update
+  // Progress Log and Models Table Update
+  // The backend pushes status changes and only the new/changed hall-of-fame
+  // rows over Server-Sent Events, so nothing is polled while a run is active
   useEffect(() => {
-    if (!isRunning) return;
+    if (!runJobId) return;
 
-    const interval = setInterval(async () => { // If run_pysr is running, set up a repeating task every 1 second
-      try {
-        const res = await axios.get('http://localhost:5000/progress'); // Send request to progress to chceck progress
+    const source = new EventSource(`http://localhost:5000/progress/stream?job_id=${runJobId}`);
 
-        setProgress(res.data); // Updates progress log text
+    source.addEventListener('status', (event) => {
+      const status = JSON.parse(event.data);
+      setProgress(status); // Updates progress log text
 
-        // Stop polling automatically if complete
-        if (res.data.status === 'done') {
-          setIsRunning(false);
-        }
-      } catch (err) {
-        console.error('Progress fetch error', err);
+      // Stop listening automatically if complete
+      if (status.status === 'done' || status.status === 'error') {
         setIsRunning(false);
+        setRunJobId(null);
       }
-    }, 1000); // Set up time interval for the repeating task
-    
-    return () => clearInterval(interval);
-  }, [isRunning]);
+    });
+
+    source.addEventListener('models', (event) => {
+      // reset: the stream (re)started or moved to a new job and sends the
+      // whole table, so nothing from before is kept
+      const { rows: changed, removed, reset } = JSON.parse(event.data);
+      setModelsTable(prev => {
+        const byComplexity = new Map(reset ? [] : prev.map(row => [row.Complexity, row]));
+        removed.forEach(c => byComplexity.delete(c));
+        changed.forEach(row => byComplexity.set(row.Complexity, row));
+        return [...byComplexity.values()].sort((a, b) => a.Complexity - b.Complexity);
+      });
+    });
+
+    source.onerror = (err) => {
+      console.error('Progress stream error', err); // EventSource reconnects by itself
+    };
+
+    return () => source.close();
+  }, [runJobId]);
 
   // Extended Log Update
   const appendLog = useCallback((message) => {
     setLogMessages(prev => [...prev, `[${new Date().toLocaleTimeString()}] ${message}`]);
   }, []);
 
-  // Models Table Update
-  useEffect(() => {
-    if (!isRunning) return;
-
-    const interval = setInterval(async () => {
-      try {
-        const res = await axios.get('http://localhost:5000/models_output');
-        // appendLog('Polling backend for model output...');
-
-        Papa.parse(res.data, {
-          header: true,
-          dynamicTyping: true,
-          complete: (results) => {
-            // appendLog(`Parsed ${results.data.length} rows from CSV`);
-            setModelsTable(results.data);
-          },
-          error: (err) => {
-            console.error('CSV parse error:', err);
-          }
-        });
-      } catch (err) {
-        console.error('CSV fetch error', err);
-      }
-    }, 1000);
-
-    return () => clearInterval(interval);
-  }, [isRunning]);
-
   // Evaluation Update
   const handleAccuracyChange = (metric, value) => {
     setAccuracyMetrics(prev => ({ ...prev, [metric]: value }));
@@ -343,6 +349,7 @@ function App() {
       // Stop the server process
       await axios.post('http://localhost:5000/stop');
       setIsRunning(false);
+      setRunJobId(null);
   
       // Grab the CSV from the server
       const csvRes = await fetch('http://localhost:5000/models_output');
@@ -696,24 +703,31 @@ function App() {
                         output_variable: selectedOutput,
                         input_variables: selectedInputs,
                         headers: headers,
-                        rows: rows
+                        ...(datasetId ? { dataset_id: datasetId } : { rows: rows })
                       };
                     
                       try {
-                        const response = await axios.post('http://localhost:5000/evaluate', payload);
-
-                        appendLog(`Received predicted values from backend: ${response.data.prediction}`);
-
-                        const predicted = response.data.prediction;
+                        // Ask for raw little-endian float64 instead of a JSON number list;
+                        // the body starts with the metrics as JSON (4-byte length first)
+                        const response = await axios.post('http://localhost:5000/evaluate', payload, {
+                          responseType: 'arraybuffer',
+                          headers: { Accept: 'application/octet-stream' }
+                        });
+                        const metaLength = new DataView(response.data).getUint32(0, true);
+                        const metrics = JSON.parse(new TextDecoder().decode(
+                          new Uint8Array(response.data, 4, metaLength)));
+
+                        const predicted = Array.from(new Float64Array(response.data, 4 + metaLength));
+                        appendLog(`Received ${predicted.length} predicted values from backend`);
                         // const predictedArr = Array.isArray(predicted) ? predicted : [predicted];
 
                         setPredictedValues(predicted);
                         setAccuracyMetrics({
-                          r2:    response.data.r2,
-                          rmse:  response.data.rmse,
-                          nrmse: response.data.nrmse,
+                          r2:    metrics.r2,
+                          rmse:  metrics.rmse,
+                          nrmse: metrics.nrmse,
                         });                    
-                        appendLog(`r2: ${response.data.r2}`);
+                        appendLog(`r2: ${metrics.r2}`);
                         // appendLog(`Received ${predicted.length} predicted values from backend`);
                       } catch (err) {
                         console.error('Backend evaluation error:', err);